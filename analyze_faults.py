@@ -1,27 +1,497 @@
-from nathan_parser import Netlist, parse_netlist, GraphWire
-from gen_testbench import gen_testbench
-import random
+from nathan_parser import Netlist
+from gen_testbench import gen_testbench, MONITOR_STYLES
+from event_sim import run_campaign, campaign_outcomes
+from logic_masking import logic_masking_probabilities, logic_masking_counts
+from compiled_netlist import compile_netlist
+from fault_sampling import FaultList, sample_faults, shard_sizes, shard_seeds, batch_seed, DEFAULT_SEED
+from timing_prescreen import TimingPrescreen, LOGIC_MASKED, screened_counts, prescreen_report
+from sdf_parser import load_sdf
+from checkpoint import CampaignCheckpoint
+from fault_log import FaultLogSummary, FAULT_LOG_FILE, MASKED_LOGIC, read_outcomes
+from site_sampling import SiteSampler
+from fault_collapsing import collapse_fault_sites
+from gen_testbench import net_list_lines
+from simulators import SIMULATORS, CompileError
+from timing_window import TimingWindowModel, WindowEstimate
+import profiling
+import re
+import hashlib
+import fcntl
+import multiprocessing
 import numpy as np
 import subprocess
 import os
-from typing import List, Tuple
-from nathan_types import TimingInfo
-
-VCS = "vcs"
-VCS_FLAGS = "-sverilog -xprop=tmerge +vc -Mupdate -Mdir=build/csrc -line \
-             -full64 -kdb -lca -nc -debug_access+all+reverse +warn=noTFIPC \
-             +warn=noDEBUG_DEP +warn=noENUMASSIGN +warn=noLCA_FEATURES_ENABLED \
-             -timescale=1ps/1ps +vpi +sdfverbose  +transport_path_delays +pulse_e/0 +pulse_r/0 +transport_int_delays +pulse_int_e/0 +pulse_int_r/0"
-GATE_LIB = "/usr/caen/misc/class/eecs470/lib/verilog/lec25dscc25.v"
-VCS_SRC = f"{GATE_LIB} generated/testbench/testbench.sv net_force.c"
-SIM_EXE_NAME = "build/simv"
-
-def analyze_faults(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str):
-    # generate a testbench
-    gen_testbench(netlist, timing_info, num_faults, sdf_filename)
-
-    # run simulation
-    vcs_cmd = f"{VCS} {VCS_FLAGS} {VCS_SRC} {netlist.filepath} -o {SIM_EXE_NAME}"
-    os.makedirs("build", exist_ok=True)
-    subprocess.run(vcs_cmd, shell=True)
-    subprocess.run(f"./{SIM_EXE_NAME}")
\ No newline at end of file
+import time
+from typing import List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from nathan_types import TimingInfo, FaultCounts, WeightedRates
+
+# compiled simulators, one directory per content hash (see simv_cache_key)
+SIMV_CACHE_DIR = "build/simv_cache"
+# bump whenever gen_testbench output changes, so cached simulators are rebuilt
+TESTBENCH_VERSION = 8
+
+# "vcs" and "iverilog" compile the generated testbench (see simulators), "python" runs the in-process event-driven simulator
+BACKENDS = [*SIMULATORS, "python"]
+
+FAULT_LIST_FILE = "generated/testbench/faults.txt"
+
+# trials per batch of a sequential (target precision) campaign
+DEFAULT_BATCH_SIZE = 1000
+
+_SUMMARY_PATTERNS = {
+    "num_faults":    r"summary \((\d+) trials\)",
+    "masked_timing": r"1\) timing.masked\s*:\s*(\d+)",
+    "meta_hit":      r"2\) setup/hold violation\s*:\s*(\d+)",
+    "masked_logic":  r"3\) logic.masked\s*:\s*(\d+)",
+    "observed":      r"4\) observed\s*:\s*(\d+)",
+}
+
+def parse_summary(output: str) -> Optional[FaultCounts]:
+    """Read the four counters back from the summary the testbench prints at $finish."""
+    values = {}
+    for field, pattern in _SUMMARY_PATTERNS.items():
+        match = re.search(pattern, output)
+        if match is None:
+            return None
+        values[field] = int(match.group(1))
+    return FaultCounts(**values)
+
+##################################################
+#                 SHARDED CAMPAIGNS              #
+##################################################
+
+# netlist of the campaign, inherited by forked shard workers (the object graph is too deep to pickle)
+_shard_netlist: Optional[Netlist] = None
+
+def _init_shard_worker(netlist: Netlist) -> None:
+    global _shard_netlist
+    _shard_netlist = netlist
+
+def _shard_pool(jobs: int, netlist: Optional[Netlist] = None) -> ProcessPoolExecutor:
+    # fork start method: initargs are inherited rather than pickled
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("fork"),
+                               initializer=_init_shard_worker, initargs=(netlist,))
+
+def _run_simv_shard(command: List[str]) -> str:
+    result = subprocess.run(command, capture_output=True, text=True)
+    return result.stdout
+
+def _run_python_shard(timing_info: TimingInfo, num_faults: int, sdf_filename: Optional[str], seed: int,
+                      faults: Optional[FaultList]) -> FaultCounts:
+    return run_campaign(_shard_netlist, timing_info, num_faults, sdf_filename, seed, faults)
+
+def _run_python_outcomes_shard(timing_info: TimingInfo, sdf_filename: Optional[str], seed: int, faults: FaultList) -> np.ndarray:
+    return campaign_outcomes(_shard_netlist, timing_info, faults, sdf_filename, seed)
+
+def _shard_file(filename: str, shard: int, num_shards: int, log_dir: Optional[str] = None) -> str:
+    """
+    filename for a single shard, filename_<shard> otherwise (directory created). With log_dir
+    the file goes there instead of its default directory, so concurrent campaigns do not share it.
+    """
+    if log_dir is not None:
+        filename = os.path.join(log_dir, os.path.basename(filename))
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    if num_shards == 1:
+        return filename
+    root, ext = os.path.splitext(filename)
+    return f"{root}_{shard}{ext}"
+
+def _split_faults(faults: FaultList, sizes: List[int]) -> List[FaultList]:
+    offsets = np.cumsum([0] + sizes)
+    return [faults.subset(slice(offsets[i], offsets[i + 1])) for i in range(len(sizes))]
+
+def simv_cache_key(netlist: Netlist, sdf_filename: Optional[str], monitor: str = "event", site_positions: Optional[np.ndarray] = None,
+                   instances: int = 1, simulator: str = "vcs") -> str:
+    """
+    Hash of everything compiled into simv: netlist, SDF, simulator with its flags, gate library
+    and net hooks, monitor style, fault-site subset, number of faulty copies and generator version.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{TESTBENCH_VERSION} {monitor} {instances} {simulator} {netlist.name}".encode())
+    if site_positions is not None:
+        digest.update(np.asarray(site_positions, dtype=np.int64).tobytes())
+    # flags are hashed as they are, files with their content
+    for filename in [netlist.filepath, sdf_filename, *SIMULATORS[simulator].cache_inputs()]:
+        digest.update(str(filename).encode())
+        if filename and os.path.exists(filename):
+            with open(filename, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def simv_path(netlist: Netlist, sdf_filename: Optional[str], monitor: str = "event", site_positions: Optional[np.ndarray] = None,
+              instances: int = 1, simulator: str = "vcs") -> str:
+    """Where the compiled testbench for these inputs is cached (simv, or simv.vvp for iverilog)."""
+    cache_key = simv_cache_key(netlist, sdf_filename, monitor, site_positions, instances, simulator)
+    return os.path.join(SIMV_CACHE_DIR, cache_key, SIMULATORS[simulator].executable)
+
+def simv_net_list(simv: str) -> str:
+    """Fault-site list loaded by a compiled testbench, kept next to it so cached builds never share one."""
+    return os.path.join(os.path.dirname(simv), "nets.txt")
+
+def simv_testbench(simv: str) -> str:
+    """Generated testbench source a simv was compiled from."""
+    return os.path.join(os.path.dirname(simv), "testbench.sv")
+
+def simv_cone_list(simv: str) -> str:
+    """Output-bit cones of the fault sites of a compiled testbench (see gen_testbench.write_cone_list)."""
+    return os.path.join(os.path.dirname(simv), "cones.txt")
+
+def build_simv(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str, monitor: str = "event",
+               site_positions: Optional[np.ndarray] = None, instances: int = 1, simulator: str = "vcs") -> Optional[str]:
+    """
+    Path of the compiled testbench for this netlist and SDF, compiling it with the simulator
+    (see simulators) only if the cache has no build for the same content. Returns None if the
+    compile failed. Concurrent callers (e.g. batch campaigns) wait for each other's build of
+    the same entry.
+    """
+    backend = SIMULATORS[simulator]
+    simv = simv_path(netlist, sdf_filename, monitor, site_positions, instances, simulator)
+    cache_dir = os.path.dirname(simv)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, "build.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(simv) and os.path.exists(simv_net_list(simv)) and os.path.exists(simv_cone_list(simv)):
+            print(f"Reusing compiled testbench {simv}")
+            profiling.count("simv_cache_hits")
+            return simv
+
+        missing = backend.missing_tools()
+        if missing:
+            print(f"Warning: {', '.join(missing)} not found on PATH, cannot compile the {simulator} testbench")
+            return None
+
+        # timing_info and num_faults are only the testbench defaults, every run passes them as plusargs
+        with profiling.stage("gen_testbench"):
+            gen_testbench(netlist, timing_info, num_faults, sdf_filename, monitor=monitor, net_list_filename=simv_net_list(simv),
+                          site_positions=site_positions, instances=instances, cone_list_filename=simv_cone_list(simv),
+                          testbench_filename=simv_testbench(simv), dialect=backend.dialect)
+        print(f"Compiling the {simulator} testbench in {cache_dir}")
+        with profiling.stage(f"{simulator}_compile"):
+            try:
+                backend.compile(cache_dir, simv_testbench(simv), netlist.filepath)
+            except CompileError as e:
+                print(f"Warning: {e}")
+                return None
+    if not os.path.exists(simv):
+        print(f"Warning: {simulator} did not produce {simv}")
+        return None
+    return simv
+
+def run_simulator(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str, faults: Optional[FaultList] = None,
+                  jobs: int = 1, seed: int = DEFAULT_SEED, monitor: str = "event", quiet: bool = False,
+                  site_positions: Optional[np.ndarray] = None, instances: int = 1, log_dir: Optional[str] = None,
+                  simulator: str = "vcs") -> Optional[FaultCounts]:
+    """
+    Run the campaign on the (cached) testbench compiled by simulator, as jobs concurrent shards
+    when jobs > 1. Returns None if the compile failed or a shard printed no summary.
+    site_positions (sorted) restricts the testbench to those fault sites, faults must then
+    be given and only use them. instances faulty copies of the DUT run a trial each per cycle.
+    The fault lists and logs go to log_dir if given, generated/testbench otherwise.
+    """
+    if faults is not None:
+        num_faults = len(faults)
+    if site_positions is not None:
+        # fault lists index the testbench's own (restricted) net list
+        faults = FaultList(np.searchsorted(site_positions, faults.sites), faults.starts, faults.widths)
+    simv = build_simv(netlist, timing_info, num_faults, sdf_filename, monitor, site_positions, instances, simulator)
+    if simv is None:
+        return None
+
+    sizes = shard_sizes(num_faults, jobs)
+    seeds = shard_seeds(seed, len(sizes))
+    shard_faults = _split_faults(faults, sizes) if faults is not None else [None] * len(sizes)
+    commands = []
+    logs = []
+    for shard, (size, shard_seed) in enumerate(zip(sizes, seeds)):
+        # +seed drives the fault sampling, the simulator adds the seed of the random inputs
+        plusargs = [f"+num_faults={size}", f"+seed={shard_seed}",
+                    f"+clock_period={int(timing_info.clock_period_ps)}", f"+t_su={int(timing_info.setup_time_ps)}",
+                    f"+t_hd={int(timing_info.hold_time_ps)}", f"+pulse_mean={int(timing_info.pulse_width_mean_ps)}",
+                    f"+pulse_sigma={int(timing_info.pulse_width_sigma_ps)}", f"+net_list={simv_net_list(simv)}",
+                    f"+cone_list={simv_cone_list(simv)}"]
+        logs.append(_shard_file(FAULT_LOG_FILE, shard, len(sizes), log_dir))
+        plusargs.append(f"+fault_log={logs[-1]}")
+        if shard_faults[shard] is not None:
+            shard_list = _shard_file(FAULT_LIST_FILE, shard, len(sizes), log_dir)
+            shard_faults[shard].write(shard_list)
+            plusargs.append(f"+fault_list={shard_list}")
+        commands.append(SIMULATORS[simulator].command(simv, plusargs, shard_seed))
+
+    with profiling.stage("simv_run"):
+        if len(commands) == 1:
+            outputs = [_run_simv_shard(commands[0])]
+        else:
+            with _shard_pool(jobs) as pool:
+                outputs = list(pool.map(_run_simv_shard, commands))
+    profiling.count("faults_simulated", num_faults)
+    if len(outputs) == 1 and not quiet:
+        print(outputs[0], end="")
+
+    counts = FaultCounts()
+    log_summary = FaultLogSummary(timing_info.clock_period_ps)
+    for shard, stdout in enumerate(outputs):
+        shard_log = FaultLogSummary(timing_info.clock_period_ps)
+        if os.path.exists(logs[shard]):
+            with profiling.stage("fault_logs"):
+                shard_log.add_file(logs[shard])
+        log_summary.merge(shard_log)
+        shard_counts = parse_summary(stdout)
+        if shard_counts is None:
+            if shard_log.num_records == 0:
+                print(f"Warning: no fault-injection summary in the output of {' '.join(commands[shard])}")
+                return None
+            # crashed or killed, keep the trials it finished
+            print(f"Warning: no fault-injection summary in the output of {' '.join(commands[shard])}, "
+                  f"counting the {shard_log.num_records} trials of {logs[shard]}")
+            shard_counts = shard_log.counts()
+            if len(outputs) == 1 and not quiet:
+                print(shard_counts.summary())
+        counts += shard_counts
+    if not quiet:
+        print(log_summary.report(net_list_lines(netlist, site_positions)))
+    return counts
+
+def run_python(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: Optional[str], faults: Optional[FaultList] = None,
+               jobs: int = 1, seed: int = DEFAULT_SEED) -> FaultCounts:
+    """In-process campaign, split over jobs worker processes when jobs > 1."""
+    if faults is not None:
+        num_faults = len(faults)
+    profiling.count("faults_simulated", num_faults)
+    sizes = shard_sizes(num_faults, jobs)
+    seeds = shard_seeds(seed, len(sizes))
+    with profiling.stage("python_sim"):
+        if len(sizes) == 1:
+            return run_campaign(netlist, timing_info, num_faults, sdf_filename, seed, faults)
+
+        shard_faults = _split_faults(faults, sizes) if faults is not None else [None] * len(sizes)
+        counts = FaultCounts()
+        with _shard_pool(jobs, netlist) as pool:
+            futures = [pool.submit(_run_python_shard, timing_info, size, sdf_filename, shard_seed, shard_faults[shard])
+                       for shard, (size, shard_seed) in enumerate(zip(sizes, seeds))]
+            for future in futures:
+                counts += future.result()
+        return counts
+
+def analyze_faults(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str, backend: str = "vcs",
+                   prescreen: bool = False, jobs: int = 1, monitor: str = "event", seed: int = DEFAULT_SEED,
+                   quiet: bool = False, collapse: bool = False, instances: int = 1, log_dir: Optional[str] = None) -> Optional[FaultCounts]:
+    """
+    Run one campaign and print its summary (quiet only prints warnings). With collapse, every
+    trial is moved to the representative of its fault site (see fault_collapsing), and the
+    compiled testbench only holds the representatives. instances sets the number of faulty copies
+    in the compiled testbench, log_dir the directory of its fault lists and logs (see run_simulator).
+    """
+    faults = None
+    counts = FaultCounts()
+    rng = np.random.default_rng(seed)
+    if prescreen or collapse:
+        with profiling.stage("sample_faults"):
+            faults = sample_faults(num_faults, len(compile_netlist(netlist).fault_sites), timing_info, rng)
+    if prescreen:
+        # provably logic-masked faults never reach the simulator
+        with profiling.stage("prescreen"):
+            screen = TimingPrescreen(netlist, timing_info, load_sdf(sdf_filename) if sdf_filename else None)
+            codes = screen.classify(faults)
+        if not quiet:
+            print(prescreen_report(codes))
+        counts = screened_counts(codes)
+        faults = faults.subset(codes != LOGIC_MASKED)
+
+    site_positions = None
+    if collapse:
+        with profiling.stage("collapse"):
+            collapsed = collapse_fault_sites(netlist, load_sdf(sdf_filename) if sdf_filename else None)
+        if not quiet:
+            print(collapsed.report())
+        faults = collapsed.map_faults(faults)
+        site_positions = collapsed.representatives
+
+    # every trial may have been screened out
+    if faults is None or len(faults) > 0:
+        if backend == "python":
+            counts += run_python(netlist, timing_info, num_faults, sdf_filename, faults, jobs, seed)
+        else:
+            sim_counts = run_simulator(netlist, timing_info, num_faults, sdf_filename, faults, jobs, seed, monitor, quiet, site_positions,
+                                       instances, log_dir, backend)
+            if sim_counts is None:
+                return None
+            counts += sim_counts
+            if not prescreen and jobs == 1:
+                # the simulator already printed this summary
+                return counts
+
+    if not quiet:
+        print(counts.summary())
+    return counts
+
+def analyze_faults_sequential(netlist: Netlist, timing_info: TimingInfo, max_faults: int, sdf_filename: str, precision: Optional[float],
+                              confidence: float = 0.95, batch_size: int = DEFAULT_BATCH_SIZE, backend: str = "vcs",
+                              prescreen: bool = False, jobs: int = 1, monitor: str = "event", collapse: bool = False,
+                              instances: int = 1, log_dir: Optional[str] = None,
+                              checkpoint: Optional[CampaignCheckpoint] = None) -> Optional[FaultCounts]:
+    """
+    Run campaigns of batch_size trials, each from its own seed, until the confidence interval
+    of every counter's rate has a half-width of at most precision (a fraction, e.g. 0.005),
+    or max_faults trials were run (always, if precision is None). Prints the intervals with
+    the summary. With a checkpoint, the campaign continues after its finished batches and
+    records every batch it finishes there (see checkpoint).
+    """
+    counts = checkpoint.counts if checkpoint is not None else FaultCounts()
+    batch = checkpoint.num_batches if checkpoint is not None else 0
+    seed = checkpoint.seed if checkpoint is not None else DEFAULT_SEED
+    converged = checkpoint is not None and checkpoint.converged
+    while counts.num_faults < max_faults and not converged:
+        size = min(batch_size, max_faults - counts.num_faults)
+        batch_counts = analyze_faults(netlist, timing_info, size, sdf_filename, backend, prescreen, jobs, monitor,
+                                      batch_seed(seed, batch), quiet=True, collapse=collapse, instances=instances,
+                                      log_dir=log_dir if checkpoint is None else checkpoint.batch_dir(batch))
+        if batch_counts is None:
+            return None
+        counts += batch_counts
+        if precision is not None:
+            widest = max((hi - lo) / 2 for (lo, hi) in counts.intervals(confidence).values())
+            print(f"batch {batch + 1}: {counts.num_faults} trials, widest interval ±{100 * widest:.3f}%")
+            converged = widest <= precision
+        else:
+            print(f"batch {batch + 1}: {counts.num_faults} of {max_faults} trials")
+        if checkpoint is not None:
+            checkpoint.record(batch, batch_seed(seed, batch), batch_counts, converged)
+        batch += 1
+    if precision is not None and not converged:
+        print(f"Warning: stopped after {max_faults} trials before every interval was within ±{100 * precision:g}%")
+
+    print(counts.summary(confidence))
+    return counts
+
+def simulate_outcomes(netlist: Netlist, timing_info: TimingInfo, faults: FaultList, sdf_filename: str, backend: str = "vcs",
+                      jobs: int = 1, monitor: str = "event", seed: int = DEFAULT_SEED, instances: int = 1,
+                      log_dir: Optional[str] = None) -> Optional[np.ndarray]:
+    """Outcome bits (fault_log.OUTCOME_BITS) of every trial of a fault list, in list order, or None if the run failed."""
+    if backend == "python":
+        sizes = shard_sizes(len(faults), jobs)
+        seeds = shard_seeds(seed, len(sizes))
+        profiling.count("faults_simulated", len(faults))
+        with profiling.stage("python_sim"):
+            if len(sizes) == 1:
+                return campaign_outcomes(netlist, timing_info, faults, sdf_filename, seed)
+            with _shard_pool(jobs, netlist) as pool:
+                futures = [pool.submit(_run_python_outcomes_shard, timing_info, sdf_filename, shard_seed, shard)
+                           for (shard, shard_seed) in zip(_split_faults(faults, sizes), seeds)]
+                return np.concatenate([future.result() for future in futures])
+
+    if run_simulator(netlist, timing_info, len(faults), sdf_filename, faults, jobs, seed, monitor, quiet=True, instances=instances,
+                     log_dir=log_dir, simulator=backend) is None:
+        return None
+    num_shards = len(shard_sizes(len(faults), jobs))
+    outcomes = read_outcomes([_shard_file(FAULT_LOG_FILE, shard, num_shards, log_dir) for shard in range(num_shards)])
+    if len(outcomes) != len(faults):
+        print(f"Warning: the fault logs hold {len(outcomes)} of {len(faults)} trials")
+        return None
+    return outcomes
+
+def analyze_faults_stratified(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str, features: List[str],
+                              allocation: str = "proportional", importance: Optional[str] = None, backend: str = "vcs",
+                              prescreen: bool = False, jobs: int = 1, monitor: str = "event", seed: int = DEFAULT_SEED,
+                              start_bins: int = 1, instances: int = 1, log_dir: Optional[str] = None) -> Optional[WeightedRates]:
+    """
+    Campaign over a stratified (and optionally importance-weighted) fault list, see site_sampling.
+    Prints and returns the weighted rate estimates of the four counters.
+    """
+    sdf = load_sdf(sdf_filename) if sdf_filename else None
+    rng = np.random.default_rng(seed)
+    with profiling.stage("stratified_sampling"):
+        sampler = SiteSampler(netlist, timing_info, sdf, features, start_bins=start_bins)
+        try:
+            sample = sampler.sample(num_faults, rng, allocation, importance)
+        except ValueError as e:
+            print(f"Warning: {e}, use more faults or fewer features")
+            return None
+    print(sampler.report(sample))
+
+    outcomes = np.zeros(len(sample), dtype=np.int64)
+    simulate = np.ones(len(sample), dtype=bool)
+    if prescreen:
+        screen = TimingPrescreen(netlist, timing_info, sdf, sampler.analysis)
+        codes = screen.classify(sample.faults)
+        print(prescreen_report(codes))
+        outcomes[codes == LOGIC_MASKED] = MASKED_LOGIC
+        simulate = codes != LOGIC_MASKED
+
+    if simulate.any():
+        simulated = simulate_outcomes(netlist, timing_info, sample.faults.subset(simulate), sdf_filename, backend, jobs, monitor, seed,
+                                      instances, log_dir)
+        if simulated is None:
+            return None
+        outcomes[simulate] = simulated
+
+    rates = sample.estimate(outcomes)
+    print(rates.summary())
+    return rates
+
+def benchmark_monitors(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str,
+                       seed: int = DEFAULT_SEED, instances: int = 1, log_dir: Optional[str] = None,
+                       simulator: str = "vcs") -> List[Tuple[str, float]]:
+    """
+    Faults/sec of the testbench compiled by simulator (with instances faulty copies) with each monitor style,
+    on the same seed so both runs simulate the same trials. Compilation is not timed. Also warns
+    if the tallies differ.
+    """
+    results = []
+    counts = {}
+    for monitor in MONITOR_STYLES:
+        if build_simv(netlist, timing_info, num_faults, sdf_filename, monitor, instances=instances, simulator=simulator) is None:
+            continue
+        start = time.perf_counter()
+        counts[monitor] = run_simulator(netlist, timing_info, num_faults, sdf_filename, seed=seed, monitor=monitor, instances=instances,
+                                        log_dir=log_dir, simulator=simulator)
+        elapsed = time.perf_counter() - start
+        results.append((monitor, num_faults / elapsed if elapsed > 0 else float("inf")))
+
+    print(f"\n-----  testbench monitors ({netlist.name}, {simulator}, {num_faults} trials, {instances} faulty copies) -----")
+    for (monitor, rate) in results:
+        print(f"{monitor:<8}: {rate:10.1f} faults/sec")
+    tallies = [repr(c) for c in counts.values() if c is not None]
+    if len(tallies) == len(MONITOR_STYLES) and len(set(tallies)) > 1:
+        print("Warning: the monitor styles disagree on the fault tallies")
+    return results
+
+def analyze_timing_window(netlist: Netlist, timing_info: TimingInfo, num_samples: int, sdf_filename: Optional[str],
+                          seed: int = DEFAULT_SEED) -> WindowEstimate:
+    """
+    Screening bounds on the four rates from the vectorized timing-window model (see
+    timing_window), no simulation. Prints the per-wire and aggregate bounds.
+    """
+    with profiling.stage("timing_window"):
+        model = TimingWindowModel(netlist, timing_info, load_sdf(sdf_filename) if sdf_filename else None)
+        estimate = model.run(num_samples, np.random.default_rng(seed))
+    print(estimate.report())
+    return estimate
+
+def analyze_logic_masking(netlist: Netlist, num_faults: int, num_vectors: int = 4096, collapse: bool = False) -> FaultCounts:
+    """
+    Zero-delay bit-parallel logic-masking analysis, no timing simulation. With collapse only
+    the representatives are evaluated, which is exact for zero-delay masking.
+    """
+    with profiling.stage("logic_masking"):
+        if collapse:
+            compiled = compile_netlist(netlist)
+            collapsed = collapse_fault_sites(netlist)
+            print(collapsed.report())
+            rep_wires = compiled.fault_sites[collapsed.representatives].tolist()
+            rep_probabilities = logic_masking_probabilities(netlist, num_vectors, sites=rep_wires)
+            per_site = collapsed.expand({pos: rep_probabilities[compiled.wire_names[wire]]
+                                         for (pos, wire) in zip(collapsed.representatives.tolist(), rep_wires)})
+            probabilities = {compiled.wire_names[wire]: float(p) for (wire, p) in zip(compiled.fault_sites.tolist(), per_site)}
+        else:
+            probabilities = logic_masking_probabilities(netlist, num_vectors)
+    counts = logic_masking_counts(probabilities, num_faults)
+
+    print(f"\n-----  logic‑masking analysis ({num_vectors} vectors per wire) -----")
+    # most frequently masked wires first
+    for wire_name, p in sorted(probabilities.items(), key=lambda item: -item[1])[:10]:
+        print(f"{wire_name:<24}: {p:.4f}")
+    mean = sum(probabilities.values()) / max(len(probabilities), 1)
+    print(f"mean over {len(probabilities)} wires : {mean:.4f}")
+    print(f"3) logic‑masked (expected, {num_faults} trials) : {counts.masked_logic}")
+    return counts
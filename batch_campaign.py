@@ -0,0 +1,242 @@
+"""
+Batch campaigns over many designs (nathan.py --manifest, or a -m file with several modules).
+
+A manifest is a CSV file with a header row. Every row names a netlist and
+optionally its SDF, timing and pulse-width distribution (ns):
+
+  netlist,sdf,period,setup_time,hold_time,pulse_mean,pulse_sigma
+  modules/full_adder_64bit.vg,sdf/full_adder_64bit.syn.sdf,10,0.05,0.02,,
+  modules/ksa.vg,,1,,,0.08,0.02
+
+Empty or missing columns take the values given on the command line (-s, -p, -st,
+-ht, --pulse_mean, --pulse_sigma), and lines starting with # are skipped. Every module of every netlist is a
+design of its own. The netlists and SDF files are parsed concurrently in a
+process pool. The campaigns are then spread over `workers` processes, the
+largest design (most gates) first. Each campaign writes its console output
+and fault logs to its own directory under BATCH_DIR, so concurrent campaigns
+never share a file. At the end, one table (also written as CSV) lists the
+outcome rates of every design.
+"""
+import contextlib
+import csv
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from nathan_parser import Netlist
+from nathan_types import TimingInfo, FaultCounts, WeightedRates, PULSE_WIDTH_MEAN_NS, PULSE_WIDTH_SIGMA_NS
+from netlist_cache import load_netlists, netlist_to_tables, netlist_from_tables
+from sdf_parser import SdfData, load_sdf, sdf_to_tables, sdf_from_tables
+from compiled_netlist import compile_netlist
+from timing_window import WindowEstimate
+
+BATCH_DIR = "generated/batch"
+BATCH_RESULTS_FILE = os.path.join(BATCH_DIR, "results.csv")
+MANIFEST_COLUMNS = ["netlist", "sdf", "period", "setup_time", "hold_time", "pulse_mean", "pulse_sigma"]
+
+class BatchEntry:
+    """One manifest row: a netlist file with its SDF, clock/register timing and pulse widths (ns)."""
+    def __init__(self, netlist_filename: str, sdf_filename: Optional[str], period: float, setup_time: float, hold_time: float,
+                 pulse_mean: float = PULSE_WIDTH_MEAN_NS, pulse_sigma: float = PULSE_WIDTH_SIGMA_NS):
+        self.netlist_filename = netlist_filename
+        self.sdf_filename = sdf_filename
+        self.period = period
+        self.setup_time = setup_time
+        self.hold_time = hold_time
+        self.pulse_mean = pulse_mean
+        self.pulse_sigma = pulse_sigma
+
+    def __repr__(self):
+        return f"BatchEntry({self.netlist_filename}, sdf={self.sdf_filename}, period={self.period})"
+
+    @property
+    def timing_info(self) -> TimingInfo:
+        return TimingInfo(self.period, self.setup_time, self.hold_time, self.pulse_mean, self.pulse_sigma)
+
+class BatchDesign:
+    """One module of a manifest entry, parsed and ready to run."""
+    def __init__(self, index: int, entry: BatchEntry, netlist: Netlist, sdf: Optional[SdfData], base_dir: str = BATCH_DIR):
+        self.index = index
+        self.entry = entry
+        self.netlist = netlist
+        self.sdf = sdf
+        self.base_dir = base_dir
+
+    @property
+    def name(self) -> str:
+        return self.netlist.name
+
+    @property
+    def work_dir(self) -> str:
+        """Directory of this design's console output and fault logs."""
+        return os.path.join(self.base_dir, f"{self.index:03d}_{self.name}")
+
+class BatchResult:
+    def __init__(self, design: BatchDesign, result: object, output: str, wall_s: float):
+        self.design = design
+        self.result = result  # what the campaign returned (FaultCounts, WeightedRates, WindowEstimate, ...), None if it failed
+        self.output = output
+        self.wall_s = wall_s
+
+    def rates(self) -> Optional[Dict[str, float]]:
+        if isinstance(self.result, (WeightedRates, WindowEstimate)):
+            return self.result.rates
+        if isinstance(self.result, FaultCounts) and self.result.num_faults > 0:
+            return {name: count / self.result.num_faults for (name, count) in self.result.counters().items()}
+        return None
+
+def read_manifest(filename: str, sdf_filename: Optional[str], period: Optional[float], setup_time: Optional[float],
+                  hold_time: Optional[float], pulse_mean: float = PULSE_WIDTH_MEAN_NS,
+                  pulse_sigma: float = PULSE_WIDTH_SIGMA_NS) -> List[BatchEntry]:
+    """
+    Entries of a manifest, with the given defaults for empty columns (ValueError if a row
+    leaves a timing column empty that has no default).
+    """
+    with open(filename, newline="") as f:
+        rows = [line for line in f if line.strip() and not line.lstrip().startswith("#")]
+    reader = csv.DictReader(rows)
+    if reader.fieldnames is None or "netlist" not in reader.fieldnames:
+        raise ValueError(f"{filename} has no header row with a netlist column ({','.join(MANIFEST_COLUMNS)})")
+    unknown = [column for column in reader.fieldnames if column.strip() not in MANIFEST_COLUMNS]
+    if unknown:
+        raise ValueError(f"{filename}: unknown columns {', '.join(unknown)} (expected {','.join(MANIFEST_COLUMNS)})")
+
+    defaults = {"period": period, "setup_time": setup_time, "hold_time": hold_time, "pulse_mean": pulse_mean, "pulse_sigma": pulse_sigma}
+    entries = []
+    for row in reader:
+        row = {key.strip(): (value or "").strip() for (key, value) in row.items() if key is not None}
+        for column in ["netlist", "sdf"]:
+            if row.get(column) and not os.path.exists(row[column]):
+                raise ValueError(f"{filename}: {column} {row[column]} not found")
+        values = {}
+        for (column, default) in defaults.items():
+            if not row.get(column) and default is None:
+                raise ValueError(f"{filename}: {row['netlist']} has no {column} and --{column} is not given")
+            values[column] = float(row.get(column) or default)
+        entries.append(BatchEntry(row["netlist"], row.get("sdf") or sdf_filename, **values))
+    return entries
+
+##################################################
+#                 PARALLEL PARSING               #
+##################################################
+
+def _parse_netlist_tables(netlist_filename: str, use_cache: bool) -> list:
+    # netlists go back to the parent as tables, the object graph is too deep to pickle
+    return [netlist_to_tables(netlist) for (_, netlist) in load_netlists(netlist_filename, use_cache)]
+
+def _load_sdf_tables(sdf_filename: str, use_cache: bool) -> tuple:
+    return sdf_to_tables(load_sdf(sdf_filename, use_cache))
+
+def parse_designs(entries: List[BatchEntry], workers: int, use_cache: bool = True) -> List[BatchDesign]:
+    """Every module of every entry, with the netlist and SDF files parsed concurrently (each file once)."""
+    netlist_files = sorted({entry.netlist_filename for entry in entries})
+    sdf_files = sorted({entry.sdf_filename for entry in entries if entry.sdf_filename})
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        netlist_futures = {f: pool.submit(_parse_netlist_tables, f, use_cache) for f in netlist_files}
+        sdf_futures = {f: pool.submit(_load_sdf_tables, f, use_cache) for f in sdf_files}
+        sdfs = {f: sdf_from_tables(future.result()) for (f, future) in sdf_futures.items()}
+        modules = {f: future.result() for (f, future) in netlist_futures.items()}
+
+    designs = []
+    for entry in entries:
+        sdf = sdfs.get(entry.sdf_filename) if entry.sdf_filename else None
+        for tables in modules[entry.netlist_filename]:
+            designs.append(BatchDesign(len(designs), entry, netlist_from_tables(tables, entry.netlist_filename), sdf))
+    return designs
+
+##################################################
+#                 CAMPAIGN SCHEDULING            #
+##################################################
+
+# designs and campaign function of the batch, inherited by forked workers
+_batch_designs: List[BatchDesign] = []
+_batch_campaign: Optional[Callable[[BatchDesign], object]] = None
+
+def _init_batch_worker(designs: List[BatchDesign], campaign: Callable[[BatchDesign], object]) -> None:
+    global _batch_designs, _batch_campaign
+    _batch_designs = designs
+    _batch_campaign = campaign
+
+def _run_design(index: int):
+    design = _batch_designs[index]
+    os.makedirs(design.work_dir, exist_ok=True)
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        try:
+            result = _batch_campaign(design)
+        except Exception as e:
+            print(f"Warning: campaign on {design.name} failed: {e}")
+            result = None
+    wall_s = time.perf_counter() - start
+    with open(os.path.join(design.work_dir, "output.txt"), "w") as f:
+        f.write(output.getvalue())
+    return result, output.getvalue(), wall_s
+
+def run_batch(designs: List[BatchDesign], campaign: Callable[[BatchDesign], object], workers: int,
+              quiet: bool = False) -> List[BatchResult]:
+    """
+    Run campaign(design) for every design on up to workers processes, largest design first.
+    Each campaign's console output is printed as one block as soon as it finishes (unless quiet).
+    Results come back in design order.
+    """
+    order = sorted(range(len(designs)), key=lambda i: -compile_netlist(designs[i].netlist).num_gates)
+    results: List[Optional[BatchResult]] = [None] * len(designs)
+    # fork start method: designs and campaign are inherited rather than pickled
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+                             initializer=_init_batch_worker, initargs=(designs, campaign)) as pool:
+        futures = {pool.submit(_run_design, i): i for i in order}
+        for future in as_completed(futures):
+            i = futures[future]
+            result, output, wall_s = future.result()
+            results[i] = BatchResult(designs[i], result, output, wall_s)
+            if not quiet:
+                print(f"\n=====  {designs[i].name} ({designs[i].entry.netlist_filename}) =====")
+                print(output, end="")
+    return results
+
+##################################################
+#                 COMBINED RESULTS               #
+##################################################
+
+def _rows(results: List[BatchResult]) -> List[dict]:
+    rows = []
+    for r in results:
+        entry = r.design.entry
+        rates = r.rates()
+        row = {"module": r.design.name, "netlist": entry.netlist_filename, "sdf": entry.sdf_filename or "",
+               "period": entry.period, "setup_time": entry.setup_time, "hold_time": entry.hold_time,
+               "pulse_mean": entry.pulse_mean, "pulse_sigma": entry.pulse_sigma,
+               "faults": getattr(r.result, "num_faults", 0), "wall_s": round(r.wall_s, 3)}
+        for name in ["masked_timing", "meta_hit", "masked_logic", "observed"]:
+            row[name] = rates[name] if rates is not None else None
+        rows.append(row)
+    return rows
+
+def results_table(results: List[BatchResult], title: str = "batch results") -> str:
+    """One row per design: its timing and pulse widths (ns), the number of trials and the four outcome rates."""
+    lines = [f"\n-----  {title} ({len(results)} designs) -----",
+             f"{'module':<20} {'period':>7} {'t_su':>6} {'t_hd':>6} {'pulse':>6} {'sigma':>6} {'faults':>8} "
+             f"{'timing':>8} {'meta':>8} {'logic':>8} {'observed':>8} {'wall s':>8}"]
+    for result, row in zip(results, _rows(results)):
+        prefix = f"{row['module']:<20} {row['period']:>7g} {row['setup_time']:>6g} {row['hold_time']:>6g} " \
+                 f"{row['pulse_mean']:>6g} {row['pulse_sigma']:>6g} {row['faults']:>8}"
+        if row["observed"] is None:
+            lines.append(f"{prefix} {'failed' if result.result is None else '-':>8}")
+            continue
+        rates = " ".join(f"{100 * row[name]:>7.2f}%" for name in ["masked_timing", "meta_hit", "masked_logic", "observed"])
+        lines.append(f"{prefix} {rates} {row['wall_s']:>8.1f}")
+    return "\n".join(lines)
+
+def write_results(results: List[BatchResult], filename: str = BATCH_RESULTS_FILE) -> None:
+    rows = _rows(results)
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ["module"])
+        writer.writeheader()
+        writer.writerows(rows)
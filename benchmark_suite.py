@@ -0,0 +1,201 @@
+"""
+End-to-end benchmark of the NATHAN pipeline over netlists of increasing size.
+
+Every design file is run in a fresh (spawned) process, so the peak RSS of one
+design does not carry over to the next. Each module of the file goes through
+the pipeline stages in order and every stage records its wall time, CPU time
+(including child processes such as VCS or iverilog) and the peak RSS of the process so far:
+
+  parse_netlist         parse the file (all its modules, without the netlist cache)
+  calculate_delays      levelized delay traversal to the outputs (Netlist.calculate_delays)
+  gen_testbench_string  build the testbench text
+  compile_simv          compile of the testbench (vcs and iverilog backends only, cache bypassed)
+  simulate              fault campaign on the chosen backend, also reported as faults/sec
+
+Results go to a JSON file tagged with the git commit, so runs on two commits
+can be compared with --compare. The default designs are modules/*.vg plus the
+EPFL circuits of the benchmarks submodule, smallest file first. The EPFL
+sources are AIGs written as assign statements; they have to be mapped to the
+cell library (e.g. synthesized to .vg) before they have any gates to inject
+into, and are skipped with a warning until then.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from nathan_parser import parse_netlist
+from nathan_types import TimingInfo
+from compiled_netlist import compile_netlist
+from gen_testbench import gen_testbench_string
+from fault_sampling import DEFAULT_SEED
+from profiling import peak_rss_mb, cpu_time
+from simulators import SIMULATORS, use_gate_library
+
+DEFAULT_DESIGNS = ["modules/*.vg", "benchmarks/arithmetic/*.v", "benchmarks/random_control/*.v"]
+BENCHMARK_RESULTS_FILE = "generated/benchmark_results.json"
+# bump when the layout of the results file changes
+RESULTS_VERSION = 1
+
+# netlists whose SDF does not follow the sdf/<name>.syn.sdf convention
+SDF_FILES = {"modules/full_adder_1bit.vg": "sdf/fa.syn.sdf"}
+
+def sdf_for(netlist_filename: str) -> Optional[str]:
+    if netlist_filename in SDF_FILES:
+        return SDF_FILES[netlist_filename]
+    stem = os.path.splitext(os.path.basename(netlist_filename))[0]
+    candidate = os.path.join("sdf", f"{stem}.syn.sdf")
+    return candidate if os.path.exists(candidate) else None
+
+def design_files(patterns: List[str]) -> List[str]:
+    """Files matching the patterns, smallest first (duplicates removed)."""
+    files = sorted({f for pattern in patterns for f in glob.glob(pattern, recursive=True)})
+    return sorted(files, key=os.path.getsize)
+
+def _measure(fn: Callable, *args, **kwargs) -> Tuple[object, Dict[str, float]]:
+    wall, cpu = time.perf_counter(), cpu_time()
+    result = fn(*args, **kwargs)
+    return result, {"wall_s": time.perf_counter() - wall, "cpu_s": cpu_time() - cpu, "peak_rss_mb": peak_rss_mb()}
+
+def benchmark_file(netlist_filename: str, timing_info: TimingInfo, num_faults: int, backend: str = "python",
+                   seed: int = DEFAULT_SEED) -> List[dict]:
+    """One result record per module of the file (run in a fresh process by run_benchmarks)."""
+    startup_rss = peak_rss_mb()
+    netlists, parse_stats = _measure(lambda: list(parse_netlist(netlist_filename)))
+    sdf_filename = sdf_for(netlist_filename)
+    records = []
+    for module_name, netlist in netlists:
+        compiled = compile_netlist(netlist)
+        record = {"file": netlist_filename, "module": module_name, "sdf": sdf_filename, "wires": int(compiled.num_wires),
+                  "gates": int(compiled.num_gates), "levels": int(compiled.num_levels), "fault_sites": len(compiled.fault_sites),
+                  "startup_rss_mb": startup_rss, "stages": {"parse_netlist": parse_stats}}
+        records.append(record)
+        if compiled.num_gates == 0:
+            print(f"Warning: {netlist_filename}:{module_name} has no cell instances, map it to the cell library first")
+            continue
+        stages = record["stages"]
+
+        output_wires = [wire for wire in netlist.wires.values() if wire.is_output]
+        _, stages["calculate_delays"] = _measure(netlist.calculate_delays, output_wires, sdf_filename)
+        _, stages["gen_testbench_string"] = _measure(gen_testbench_string, netlist, timing_info, num_faults, sdf_filename or "")
+
+        if backend == "python":
+            # imported here, so the parse stage does not pay for the simulator
+            from event_sim import run_campaign
+            counts, stages["simulate"] = _measure(run_campaign, netlist, timing_info, num_faults, sdf_filename, seed)
+        else:
+            from analyze_faults import build_simv, run_simulator, simv_path
+            # time a real compile, not a cache hit
+            simv = simv_path(netlist, sdf_filename, simulator=backend)
+            if os.path.exists(simv):
+                os.remove(simv)
+            simv, stages["compile_simv"] = _measure(build_simv, netlist, timing_info, num_faults, sdf_filename, simulator=backend)
+            if simv is None:
+                continue
+            counts, stages["simulate"] = _measure(run_simulator, netlist, timing_info, num_faults, sdf_filename, seed=seed, quiet=True,
+                                                  simulator=backend)
+            if counts is None:
+                continue
+        wall = stages["simulate"]["wall_s"]
+        record["faults_per_sec"] = num_faults / wall if wall > 0 else float("inf")
+        record["counts"] = {name: int(getattr(counts, name)) for name in ["masked_timing", "meta_hit", "masked_logic", "observed"]}
+    return records
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def run_benchmarks(files: List[str], timing_info: TimingInfo, num_faults: int, backend: str = "python",
+                   seed: int = DEFAULT_SEED) -> dict:
+    results = []
+    for filename in files:
+        print(f"benchmarking {filename}")
+        # a fresh interpreter per file, so peak RSS is per design
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            try:
+                results += pool.submit(benchmark_file, filename, timing_info, num_faults, backend, seed).result()
+            except Exception as e:
+                print(f"Warning: skipping {filename}: {e}")
+    return {"version": RESULTS_VERSION, "commit": _git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "host": platform.node(), "backend": backend, "num_faults": num_faults,
+            "clock_period_ps": float(timing_info.clock_period_ps), "setup_time_ps": float(timing_info.setup_time_ps),
+            "hold_time_ps": float(timing_info.hold_time_ps), "results": results}
+
+def report(results: dict) -> str:
+    lines = [f"\n-----  benchmark ({results['backend']}, {results['num_faults']} faults, commit {results['commit']}) -----",
+             f"{'module':<20} {'gates':>7} {'levels':>6} {'stage':<21} {'wall ms':>10} {'cpu ms':>10} {'peak MB':>8}"]
+    for record in results["results"]:
+        for i, (stage, stats) in enumerate(record["stages"].items()):
+            prefix = f"{record['module']:<20} {record['gates']:>7} {record['levels']:>6}" if i == 0 else " " * 35
+            lines.append(f"{prefix} {stage:<21} {1000 * stats['wall_s']:>10.1f} {1000 * stats['cpu_s']:>10.1f} "
+                         f"{stats['peak_rss_mb']:>8.1f}")
+        if "faults_per_sec" in record:
+            lines.append(f"{'':<35} {'faults/sec':<21} {record['faults_per_sec']:>10.1f}")
+    return "\n".join(lines)
+
+def compare(baseline: dict, results: dict) -> str:
+    """Wall time and faults/sec of every (module, stage) in both result files, new over old."""
+    old = {(r["file"], r["module"]): r for r in baseline["results"]}
+    lines = [f"\n-----  {baseline['commit']} -> {results['commit']} -----",
+             f"{'module':<20} {'stage':<21} {'old ms':>10} {'new ms':>10} {'speedup':>8}"]
+    for record in results["results"]:
+        before = old.get((record["file"], record["module"]))
+        if before is None:
+            continue
+        for stage, stats in record["stages"].items():
+            if stage not in before["stages"]:
+                continue
+            old_ms, new_ms = 1000 * before["stages"][stage]["wall_s"], 1000 * stats["wall_s"]
+            lines.append(f"{record['module']:<20} {stage:<21} {old_ms:>10.1f} {new_ms:>10.1f} "
+                         f"{old_ms / new_ms if new_ms > 0 else float('inf'):>7.2f}x")
+        if "faults_per_sec" in record and "faults_per_sec" in before:
+            lines.append(f"{record['module']:<20} {'faults/sec':<21} {before['faults_per_sec']:>10.1f} "
+                         f"{record['faults_per_sec']:>10.1f} {record['faults_per_sec'] / before['faults_per_sec']:>7.2f}x")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every pipeline stage over a set of netlists and write the results as JSON")
+    parser.add_argument('designs', metavar='FILE', nargs='*', default=DEFAULT_DESIGNS,
+                        help='Netlists or glob patterns, defaults to modules/*.vg and the EPFL benchmarks submodule')
+    parser.add_argument('-n', '--num_faults', metavar='NUM', type=int, default=1000, help='Number of faults per campaign, defaults to 1000')
+    parser.add_argument('-p', '--period', metavar='PERIOD', type=float, default=10, help='Specify the clock period in nanoseconds (ns), defaults to 10')
+    parser.add_argument('-st', '--setup_time', metavar='TIME', type=float, default=0.05, help='Specify the register setup time in nanoseconds (ns), defaults to 0.05')
+    parser.add_argument('-ht', '--hold_time', metavar='TIME', type=float, default=0.02, help='Specify the register hold time in nanoseconds (ns), defaults to 0.02')
+    parser.add_argument('-b', '--backend', metavar='BACKEND', default='python', choices=["python", *SIMULATORS],
+                        help=f'Specify the simulation backend (python, {", ".join(SIMULATORS)}), defaults to python')
+    parser.add_argument('-l', '--gate_library', metavar='LIB', required=False,
+                        help='Verilog gate library the compiled testbenches are built with, defaults to simulators.GATE_LIB')
+    parser.add_argument('-o', '--output', metavar='FILE', default=BENCHMARK_RESULTS_FILE, help=f'Results file, defaults to {BENCHMARK_RESULTS_FILE}')
+    parser.add_argument('--compare', metavar='FILE', required=False, help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    if args.gate_library is not None:
+        use_gate_library(args.gate_library)
+    files = design_files(args.designs)
+    if not files:
+        print("Warning: no netlists match " + " ".join(args.designs))
+        return
+    results = run_benchmarks(files, TimingInfo(args.period, args.setup_time, args.hold_time), args.num_faults, args.backend)
+    print(report(results))
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Functional models for the lec25dscc25 standard cells that appear in the
+synthesized netlists under modules/.
+
+Every model is written with the bitwise operators only (~ & | ^), so the same
+function can evaluate a single bit (python int, mask the result with 1) or many
+packed bits at once (numpy uint64 arrays).
+
+Cell names are <function><drive strength>, e.g. "aoi21s2" is an aoi21 with
+drive strength s2. Only the function matters for simulation.
+"""
+import re
+from typing import Callable, Dict, List, Tuple
+
+class CellModel:
+    """Logic function of a cell, with its input pins in the order the function expects them."""
+    def __init__(self, name: str, pins: Tuple[str, ...], function: Callable):
+        self.name = name
+        self.pins = pins
+        self.function = function
+        self.output_pin = "Q"
+
+    def __repr__(self):
+        return f"CellModel({self.name}, pins={self.pins})"
+
+def _din(n: int) -> Tuple[str, ...]:
+    return tuple(f"DIN{i}" for i in range(1, n + 1))
+
+CELL_MODELS: Dict[str, CellModel] = {}
+
+def _add(name: str, pins: Tuple[str, ...], function: Callable) -> None:
+    CELL_MODELS[name] = CellModel(name, pins, function)
+
+# buffers / inverters
+_add("nb1",  ("DIN",), lambda a: a)
+_add("ib1",  ("DIN",), lambda a: ~a)
+_add("i1",   ("DIN",), lambda a: ~a)
+_add("hi1",  ("DIN",), lambda a: ~a)
+
+# simple gates
+_add("and2", _din(2), lambda a, b: a & b)
+_add("and3", _din(3), lambda a, b, c: a & b & c)
+_add("and4", _din(4), lambda a, b, c, d: a & b & c & d)
+_add("or2",  _din(2), lambda a, b: a | b)
+_add("or3",  _din(3), lambda a, b, c: a | b | c)
+_add("or4",  _din(4), lambda a, b, c, d: a | b | c | d)
+_add("nnd2", _din(2), lambda a, b: ~(a & b))
+_add("nnd3", _din(3), lambda a, b, c: ~(a & b & c))
+_add("nnd4", _din(4), lambda a, b, c, d: ~(a & b & c & d))
+_add("nor2", _din(2), lambda a, b: ~(a | b))
+_add("nor3", _din(3), lambda a, b, c: ~(a | b | c))
+_add("nor4", _din(4), lambda a, b, c, d: ~(a | b | c | d))
+_add("xor2", _din(2), lambda a, b: a ^ b)
+_add("xor3", _din(3), lambda a, b, c: a ^ b ^ c)
+_add("xnr2", _din(2), lambda a, b: ~(a ^ b))
+_add("xnr3", _din(3), lambda a, b, c: ~(a ^ b ^ c))
+
+# and-or-invert: digits give the size of each AND group, in pin order
+_add("aoi21",  _din(3), lambda a, b, c: ~((a & b) | c))
+_add("aoi22",  _din(4), lambda a, b, c, d: ~((a & b) | (c & d)))
+_add("aoi13",  _din(4), lambda a, b, c, d: ~(a | (b & c & d)))
+_add("aoi23",  _din(5), lambda a, b, c, d, e: ~((a & b) | (c & d & e)))
+_add("aoi211", _din(4), lambda a, b, c, d: ~((a & b) | c | d))
+_add("aoi221", _din(5), lambda a, b, c, d, e: ~((a & b) | (c & d) | e))
+_add("aoi222", _din(6), lambda a, b, c, d, e, f: ~((a & b) | (c & d) | (e & f)))
+
+# or-and-invert: digits give the size of each OR group, in pin order
+_add("oai21",   _din(3), lambda a, b, c: ~((a | b) & c))
+_add("oai22",   _din(4), lambda a, b, c, d: ~((a | b) & (c | d)))
+_add("oai13",   _din(4), lambda a, b, c, d: ~(a & (b | c | d)))
+_add("oai211",  _din(4), lambda a, b, c, d: ~((a | b) & c & d))
+_add("oai221",  _din(5), lambda a, b, c, d, e: ~((a | b) & (c | d) & e))
+_add("oai222",  _din(6), lambda a, b, c, d, e, f: ~((a | b) & (c | d) & (e | f)))
+_add("oai321",  _din(6), lambda a, b, c, d, e, f: ~((a | b | c) & (d | e) & f))
+_add("oai322",  _din(7), lambda a, b, c, d, e, f, g: ~((a | b | c) & (d | e) & (f | g)))
+_add("oai1112", _din(5), lambda a, b, c, d, e: ~(a & b & c & (d | e)))
+
+# and-or-and-invert
+_add("aoai1112", _din(5), lambda a, b, c, d, e: ~(a & b & (c | (d & e))))
+
+_DRIVE_STRENGTH_RE = re.compile(r"^(.*?)(s\d+)$")
+
+def cell_function_name(gate_type: str) -> str:
+    """Strip the drive strength suffix from a cell name ("aoi21s2" -> "aoi21")."""
+    match = _DRIVE_STRENGTH_RE.match(gate_type)
+    return match.group(1) if match else gate_type
+
+def get_cell_model(gate_type: str) -> CellModel:
+    """Look up the functional model for a cell type, raising ValueError if it is not modeled."""
+    name = cell_function_name(gate_type)
+    if name not in CELL_MODELS:
+        raise ValueError(f"No functional model for cell type {gate_type}")
+    return CELL_MODELS[name]
+
+def pin_order(gate_type: str, input_pins: List[str]) -> List[int]:
+    """Indices into input_pins, rearranged into the order the cell function expects."""
+    model = get_cell_model(gate_type)
+    if sorted(model.pins) != sorted(input_pins):
+        raise ValueError(f"Cell {gate_type} expects pins {model.pins}, got {input_pins}")
+    return [input_pins.index(pin) for pin in model.pins]
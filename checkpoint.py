@@ -0,0 +1,116 @@
+"""
+Durable progress of long campaigns (nathan.py --checkpoint DIR, --resume DIR).
+
+A checkpointed campaign runs in batches of --batch trials, batch b drawn from
+batch_seed(seed, b) the way a --precision campaign is, so its counters only
+depend on its settings and not on where it was interrupted. After every batch
+DIR/CHECKPOINT_FILE is rewritten atomically (temporary file, fsync, rename) with
+the command-line settings, the campaign seed, the SHA-256 of the netlist and
+SDF, and the trial range, seed and counters of every finished batch. The fault
+logs of batch b go to DIR/batch_<b>.
+
+--resume DIR restores the settings and continues with the first unfinished
+batch. A batch cut short is run again from its seed, so the final counters are
+those of an uninterrupted run.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from nathan_types import FaultCounts
+
+CHECKPOINT_FILE = "campaign.json"
+# bump when the layout of CHECKPOINT_FILE changes
+CHECKPOINT_VERSION = 1
+
+def file_digest(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class CampaignCheckpoint:
+    """Settings and finished batches of a checkpointed campaign, stored in directory/CHECKPOINT_FILE."""
+    def __init__(self, directory: str, settings: Dict[str, Any], seed: int, num_faults: int, inputs: Dict[str, str],
+                 batches: Optional[List[Dict[str, Any]]] = None, converged: bool = False):
+        self.directory = directory
+        self.settings = settings      # command-line arguments of the campaign
+        self.seed = seed              # batch b runs from batch_seed(seed, b)
+        self.num_faults = num_faults  # trials of the whole campaign (the maximum with --precision)
+        self.inputs = inputs          # SHA-256 of every input file at the start
+        self.batches = batches if batches is not None else []
+        self.converged = converged    # a --precision campaign reached its precision
+
+    @property
+    def filename(self) -> str:
+        return os.path.join(self.directory, CHECKPOINT_FILE)
+
+    @property
+    def num_batches(self) -> int:
+        return len(self.batches)
+
+    @property
+    def counts(self) -> FaultCounts:
+        """Counters of all finished batches."""
+        counts = FaultCounts()
+        for batch in self.batches:
+            counts += FaultCounts(**batch["counts"])
+        return counts
+
+    def batch_dir(self, batch: int) -> str:
+        return os.path.join(self.directory, f"batch_{batch:06d}")
+
+    def record(self, batch: int, seed: int, counts: FaultCounts, converged: bool = False) -> None:
+        """Add a finished batch and save, the campaign resumes after it from now on."""
+        first = self.counts.num_faults
+        self.batches.append({"batch": batch, "first": first, "last": first + counts.num_faults - 1, "seed": seed,
+                             "counts": {**counts.counters(), "num_faults": counts.num_faults}})
+        self.converged = bool(converged)
+        self.save()
+
+    def changed_inputs(self) -> List[str]:
+        """Input files that are missing or differ from the start of the campaign."""
+        return [filename for (filename, digest) in self.inputs.items()
+                if not os.path.exists(filename) or file_digest(filename) != digest]
+
+    def progress(self) -> str:
+        counts = self.counts
+        return f"Resuming {self.directory}: {self.num_batches} batches, {counts.num_faults} of {self.num_faults} trials done"
+
+    def save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        state = {"version": CHECKPOINT_VERSION, "settings": self.settings, "seed": self.seed, "num_faults": self.num_faults,
+                 "inputs": self.inputs, "batches": self.batches, "converged": self.converged}
+        # write, flush to disk, then rename: a preempted run leaves the previous state or the new one
+        tmp_path = f"{self.filename}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.filename)
+
+    @classmethod
+    def create(cls, directory: str, settings: Dict[str, Any], seed: int, num_faults: int,
+               input_files: List[str]) -> "CampaignCheckpoint":
+        """A new campaign in directory, saved right away."""
+        checkpoint = cls(directory, settings, seed, num_faults, {filename: file_digest(filename) for filename in input_files})
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load(cls, directory: str) -> "CampaignCheckpoint":
+        """The campaign saved in directory (ValueError if there is none or it is unreadable)."""
+        filename = os.path.join(directory, CHECKPOINT_FILE)
+        if not os.path.exists(filename):
+            raise ValueError(f"no {CHECKPOINT_FILE} in {directory}")
+        try:
+            with open(filename) as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"unreadable {filename} ({e})")
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{filename} was written by another version of NATHAN")
+        return cls(directory, state["settings"], state["seed"], state["num_faults"], state["inputs"], state["batches"],
+                   state["converged"])
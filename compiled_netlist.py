@@ -0,0 +1,238 @@
+"""
+Compact array-backed form of a parsed Netlist.
+
+The object graph built by nathan_parser (GraphWire/GraphGate with name strings
+and lists of references) is convenient to construct but heavy to traverse.
+CompiledNetlist is built from it once and holds:
+  - integer wire and gate IDs, with names interned in flat lists
+  - gates renumbered in topological (level) order, so evaluating gates
+    0..num_gates-1 in sequence is always valid
+  - CSR fanin (gate -> input wires, in cell pin order when the cell is modeled) and fanout
+    (wire -> (load gate, pin index)) arrays
+  - a per-gate level array and a cell-type table (gate_type indexes cell_types)
+
+Delay calculation, testbench generation and the simulators all work on this form.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from nathan_parser import Netlist, NetListVisitor
+from cell_library import CellModel, get_cell_model, pin_order
+
+# wire_flags bits
+WIRE_INPUT = 1
+WIRE_OUTPUT = 2
+
+class CompiledNetlist:
+    """Integer-indexed, CSR representation of a Netlist."""
+    def __init__(self):
+        self.name: str = ""
+        self.filepath: str = ""
+        self.inputs: List[Tuple[str, int]] = []   # signal name, width (same as Netlist)
+        self.outputs: List[Tuple[str, int]] = []  # signal name, width (same as Netlist)
+
+        # wires
+        self.wire_names: List[str] = []
+        self.wire_index: Dict[str, int] = {}
+        self.wire_flags = np.zeros(0, dtype=np.uint8)
+        self.wire_width = np.zeros(0, dtype=np.int32)     # width of the declaration the bit came from
+        self.wire_driver = np.zeros(0, dtype=np.int32)    # driving gate, -1 if none
+        self.fanout_ptr = np.zeros(1, dtype=np.int64)     # wire w loads: fanout_gates[fanout_ptr[w]:fanout_ptr[w+1]]
+        self.fanout_gates = np.zeros(0, dtype=np.int32)
+        self.fanout_pins = np.zeros(0, dtype=np.int16)    # pin index (in cell pin order) of each load
+
+        # gates, in topological order
+        self.gate_names: List[str] = []
+        self.gate_index: Dict[str, int] = {}
+        self.cell_types: List[str] = []                   # cell type table, e.g. ["xor2s2", "ib1s1", ...]
+        self.cell_models: List[Optional[CellModel]] = []  # functional model of each cell type, None if not modeled
+        self.gate_type = np.zeros(0, dtype=np.int16)      # index into cell_types
+        self.gate_output = np.zeros(0, dtype=np.int32)    # driven wire, -1 if none
+        self.gate_level = np.zeros(0, dtype=np.int32)
+        self.level_ptr = np.zeros(1, dtype=np.int64)      # level l gates: level_ptr[l]:level_ptr[l+1]
+        self.fanin_ptr = np.zeros(1, dtype=np.int64)      # gate g inputs: fanin_wires[fanin_ptr[g]:fanin_ptr[g+1]]
+        self.fanin_wires = np.zeros(0, dtype=np.int32)
+
+        self.cone_index = None  # cone_index.ConeIndex, built on first use by cone_index.cone_index
+
+    def __repr__(self):
+        return f"CompiledNetlist({self.name}, wires={self.num_wires}, gates={self.num_gates}, levels={self.num_levels})"
+
+    @property
+    def num_wires(self) -> int:
+        return len(self.wire_names)
+
+    @property
+    def num_gates(self) -> int:
+        return len(self.gate_names)
+
+    @property
+    def num_levels(self) -> int:
+        return len(self.level_ptr) - 1
+
+    @property
+    def input_wires(self) -> np.ndarray:
+        return np.flatnonzero(self.wire_flags & WIRE_INPUT)
+
+    @property
+    def output_wires(self) -> np.ndarray:
+        return np.flatnonzero(self.wire_flags & WIRE_OUTPUT)
+
+    @property
+    def fault_sites(self) -> np.ndarray:
+        """Candidate fault sites: every non-input wire, in declaration order (matches the testbench)."""
+        return np.flatnonzero((self.wire_flags & WIRE_INPUT) == 0)
+
+    def gate_inputs(self, gate: int) -> np.ndarray:
+        return self.fanin_wires[self.fanin_ptr[gate]:self.fanin_ptr[gate + 1]]
+
+    def gate_model(self, gate: int) -> CellModel:
+        """Functional model of a gate, raising ValueError for cells cell_library doesn't model."""
+        model = self.cell_models[self.gate_type[gate]]
+        if model is None:
+            raise ValueError(f"No functional model for cell type {self.cell_types[self.gate_type[gate]]}")
+        return model
+
+    def wire_loads(self, wire: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(load gates, pin indices) of a wire."""
+        lo, hi = self.fanout_ptr[wire], self.fanout_ptr[wire + 1]
+        return self.fanout_gates[lo:hi], self.fanout_pins[lo:hi]
+
+    def fanout_counts(self) -> np.ndarray:
+        return np.diff(self.fanout_ptr)
+
+    def verilog_name(self, wire: int) -> str:
+        """Name of the net in the original netlist, e.g. "S[62]" for the bus bit stored as "S_62"."""
+        name = self.wire_names[wire]
+        if self.wire_width[wire] > 1:
+            netname, netidx = name.rsplit('_', 1)
+            return f"{netname}[{netidx}]"
+        return name
+
+    def nbytes(self) -> int:
+        """Memory held by the arrays and name tables (names are shared with the Netlist)."""
+        arrays = [self.wire_flags, self.wire_width, self.wire_driver, self.fanout_ptr, self.fanout_gates,
+                  self.fanout_pins, self.gate_type, self.gate_output, self.gate_level, self.level_ptr,
+                  self.fanin_ptr, self.fanin_wires]
+        tables = sys.getsizeof(self.wire_names) + sys.getsizeof(self.gate_names) \
+               + sys.getsizeof(self.wire_index) + sys.getsizeof(self.gate_index)
+        return sum(a.nbytes for a in arrays) + tables
+
+    @classmethod
+    def from_netlist(cls, netlist: Netlist) -> "CompiledNetlist":
+        compiled = cls()
+        compiled.name = netlist.name
+        compiled.filepath = getattr(netlist, "filepath", "")
+        compiled.inputs = list(netlist.inputs)
+        compiled.outputs = list(netlist.outputs)
+
+        # wires keep declaration order
+        compiled.wire_names = [sys.intern(name) for name in netlist.wires.keys()]
+        compiled.wire_index = {name: i for (i, name) in enumerate(compiled.wire_names)}
+        num_wires = len(compiled.wire_names)
+        flags = np.zeros(num_wires, dtype=np.uint8)
+        widths = np.zeros(num_wires, dtype=np.int32)
+        for i, wire in enumerate(netlist.wires.values()):
+            flags[i] = (WIRE_INPUT if wire.is_input else 0) | (WIRE_OUTPUT if wire.is_output else 0)
+            widths[i] = wire.width
+        compiled.wire_flags = flags
+        compiled.wire_width = widths
+
+        # gates in level order
+        levels = netlist.levelize()
+        gates = [gate for level in levels for gate in level]
+        compiled.gate_names = [sys.intern(gate.name) for gate in gates]
+        compiled.gate_index = {name: i for (i, name) in enumerate(compiled.gate_names)}
+        compiled.level_ptr = np.cumsum([0] + [len(level) for level in levels], dtype=np.int64)
+        compiled.gate_level = np.repeat(np.arange(len(levels), dtype=np.int32), [len(level) for level in levels])
+
+        type_index: Dict[str, int] = {}
+        gate_type = np.zeros(len(gates), dtype=np.int16)
+        gate_output = np.full(len(gates), -1, dtype=np.int32)
+        fanin_ptr = np.zeros(len(gates) + 1, dtype=np.int64)
+        fanin: List[int] = []
+        for gate_idx, gate in enumerate(gates):
+            if gate.gate_type not in type_index:
+                type_index[gate.gate_type] = len(compiled.cell_types)
+                compiled.cell_types.append(sys.intern(gate.gate_type))
+                try:
+                    compiled.cell_models.append(get_cell_model(gate.gate_type))
+                except ValueError:
+                    # still usable for structure and timing, just not for logic simulation
+                    compiled.cell_models.append(None)
+            gate_type[gate_idx] = type_index[gate.gate_type]
+            if gate.output is not None:
+                gate_output[gate_idx] = compiled.wire_index[gate.output.name]
+            if compiled.cell_models[gate_type[gate_idx]] is not None:
+                order = pin_order(gate.gate_type, gate.input_pins)
+            else:
+                order = list(range(len(gate.inputs)))
+            fanin.extend(compiled.wire_index[gate.inputs[k].name] for k in order)
+            fanin_ptr[gate_idx + 1] = len(fanin)
+        compiled.gate_type = gate_type
+        compiled.gate_output = gate_output
+        compiled.fanin_ptr = fanin_ptr
+        compiled.fanin_wires = np.array(fanin, dtype=np.int32)
+
+        driver = np.full(num_wires, -1, dtype=np.int32)
+        driven = gate_output >= 0
+        driver[gate_output[driven]] = np.flatnonzero(driven)
+        compiled.wire_driver = driver
+
+        # fanout CSR from the fanin edges (counting sort by wire, stable in gate order)
+        edge_gate = np.repeat(np.arange(len(gates), dtype=np.int32), np.diff(fanin_ptr))
+        edge_pin = (np.arange(len(fanin), dtype=np.int64) - np.repeat(fanin_ptr[:-1], np.diff(fanin_ptr))).astype(np.int16)
+        order = np.argsort(compiled.fanin_wires, kind="stable")
+        compiled.fanout_gates = edge_gate[order]
+        compiled.fanout_pins = edge_pin[order]
+        compiled.fanout_ptr = np.zeros(num_wires + 1, dtype=np.int64)
+        compiled.fanout_ptr[1:] = np.cumsum(np.bincount(compiled.fanin_wires, minlength=num_wires))
+        return compiled
+
+def compile_netlist(netlist: Netlist) -> CompiledNetlist:
+    """Compiled form of a Netlist, built on first use and kept on the Netlist."""
+    if netlist.compiled is None:
+        netlist.compiled = CompiledNetlist.from_netlist(netlist)
+    return netlist.compiled
+
+##################################################
+#          OBJECT GRAPH VS COMPILED STATS        #
+##################################################
+
+def compare_representations(netlist_filename: str) -> None:
+    """Print build time and memory of the object graph against the compiled form."""
+    from pyverilog.vparser.parser import parse
+    ast, directives = parse(filelist=[netlist_filename], outputdir="./generated/parser")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    visitor = NetListVisitor(netlist_filename)
+    visitor.visit(ast)
+    graph_time = time.perf_counter() - start
+    graph_mem, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for module_name, netlist in visitor.module_netlists.items():
+        tracemalloc.start()
+        start = time.perf_counter()
+        compiled = CompiledNetlist.from_netlist(netlist)
+        compile_time = time.perf_counter() - start
+        compile_mem, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{module_name}: {compiled.num_wires} wires, {compiled.num_gates} gates, {compiled.num_levels} levels, {len(compiled.fanin_wires)} pins")
+        print(f"  object graph : {graph_time * 1000:8.2f} ms  {graph_mem / 1024:10.1f} KiB (all modules)")
+        print(f"  compiled     : {compile_time * 1000:8.2f} ms  {compile_mem / 1024:10.1f} KiB ({compiled.nbytes() / 1024:.1f} KiB of arrays and tables)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the object graph and compiled netlist representations")
+    parser.add_argument('input_file', metavar='FILE', help='Specify the input netlist')
+    args = parser.parse_args()
+    compare_representations(args.input_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Fan-out cone of influence of every wire, as a bitset over the output bits.
+
+Output bit i is bit j of output port p, numbered port by port in declaration
+order (the order of Netlist.outputs), so the bits of a port are contiguous and
+bit i of a mask lines up with bit i of the testbench's output vector. The cone
+of a wire holds the output bits a change on it can reach. It is built in one
+reverse-topological pass over the levels of the compiled netlist: every gate
+ORs the cone of its output into the cones of its inputs, as
+TimingAnalysis._backward does for path delays. Cones are stored as rows of
+uint64 words.
+
+A fault on a wire with an empty cone can never make the outputs diverge, so it
+is logic-masked without simulation. A fault on any other wire only needs its
+cone compared.
+"""
+import argparse
+import numpy as np
+from typing import List, Optional
+
+from nathan_parser import Netlist, parse_netlist
+from compiled_netlist import CompiledNetlist, compile_netlist
+
+WORD_BITS = 64
+
+def output_bit_wires(compiled: CompiledNetlist) -> np.ndarray:
+    """Wire of every output bit, in output bit order (port by port, LSB first)."""
+    wires = []
+    for (name, width) in compiled.outputs:
+        wires += [compiled.wire_index[f"{name}_{bit}" if width > 1 else name] for bit in range(width)]
+    return np.array(wires, dtype=np.int64)
+
+class ConeIndex:
+    """Output-bit bitset of every wire of a netlist."""
+    def __init__(self, compiled: CompiledNetlist):
+        self.compiled = compiled
+        self.output_wires = output_bit_wires(compiled)
+        self.num_words = max(1, -(-len(self.output_wires) // WORD_BITS))
+        self.cones = np.zeros((compiled.num_wires, self.num_words), dtype=np.uint64)
+        bits = np.arange(len(self.output_wires))
+        np.bitwise_or.at(self.cones, (self.output_wires, bits // WORD_BITS), np.uint64(1) << (bits % WORD_BITS).astype(np.uint64))
+
+        edge_gate = np.repeat(np.arange(compiled.num_gates, dtype=np.int64), np.diff(compiled.fanin_ptr))
+        edge_out = compiled.gate_output[edge_gate]
+        for level in reversed(range(compiled.num_levels)):
+            first_gate, last_gate = compiled.level_ptr[level], compiled.level_ptr[level + 1]
+            edges = slice(compiled.fanin_ptr[first_gate], compiled.fanin_ptr[last_gate])
+            sources = compiled.fanin_wires[edges]
+            sinks = edge_out[edges]
+            keep = sinks >= 0
+            np.bitwise_or.at(self.cones, sources[keep], self.cones[sinks[keep]])
+
+    def __repr__(self):
+        return f"ConeIndex({self.compiled.name}, {len(self.output_wires)} output bits)"
+
+    @property
+    def num_output_bits(self) -> int:
+        return len(self.output_wires)
+
+    def cone_sizes(self) -> np.ndarray:
+        """Number of output bits in the cone of every wire."""
+        as_bytes = self.cones.view(np.uint8).reshape(len(self.cones), -1)
+        return np.unpackbits(as_bytes, axis=1).sum(axis=1).astype(np.int64)
+
+    def reaches_output(self) -> np.ndarray:
+        """Per wire: whether any output bit is in its cone."""
+        return self.cones.any(axis=1)
+
+    def output_bits(self, wire: int) -> List[int]:
+        """Output bits in the cone of a wire."""
+        row = self.cones[wire].view(np.uint8)
+        return np.flatnonzero(np.unpackbits(row, bitorder="little")[:self.num_output_bits]).tolist()
+
+    def mask(self, wire: int) -> int:
+        """Cone of a wire as an integer, bit i set if output bit i is reachable."""
+        return sum(int(word) << (WORD_BITS * w) for (w, word) in enumerate(self.cones[wire].tolist()))
+
+    def report(self, sites: Optional[np.ndarray] = None) -> str:
+        sites = self.compiled.fault_sites if sites is None else sites
+        sizes = self.cone_sizes()[sites]
+        empty = int(np.count_nonzero(sizes == 0))
+        fraction = empty / len(sites) if len(sites) else 0.0
+        lines = [f"\n-----  cones of influence ({len(sites)} fault sites, {self.num_output_bits} output bits) -----",
+                 f"no path to an output  : {empty} ({100 * fraction:.1f}%)"]
+        if len(sizes):
+            lines.append(f"cone size (bits)      : min {sizes.min()}, median {int(np.median(sizes))}, "
+                         f"mean {sizes.mean():.1f}, max {sizes.max()}")
+            lines.append(f"mean share of outputs : {100 * sizes.mean() / max(self.num_output_bits, 1):.1f}%")
+        return "\n".join(lines)
+
+def cone_index(netlist: Netlist) -> ConeIndex:
+    """Cone index of a netlist, built on first use and kept with its compiled form."""
+    compiled = compile_netlist(netlist)
+    if compiled.cone_index is None:
+        compiled.cone_index = ConeIndex(compiled)
+    return compiled.cone_index
+
+def main():
+    parser = argparse.ArgumentParser(description="Cone-of-influence statistics of the fault sites of a netlist")
+    parser.add_argument('input_files', metavar='FILE', nargs='+', help='Netlists to index')
+    args = parser.parse_args()
+    for filename in args.input_files:
+        for module_name, netlist in parse_netlist(filename):
+            print(f"{module_name}: {cone_index(netlist).report().strip()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Directory of pickled entries keyed by input file contents, shared by the
+parsed-netlist and SDF caches.
+
+An entry is keyed by the SHA-256 of the source file and a version tag, and is
+stored together with its version so an entry written by an older reader is
+treated as a miss. Writes go through a temporary file and a rename, so
+concurrent runs never see partial entries. When the directory grows past
+max_bytes the least recently used entries are removed; reading an entry
+refreshes its modification time.
+"""
+import hashlib
+import os
+import pickle
+from typing import Any, List, Optional, Tuple
+
+class DiskCache:
+    """Pickled entries in cache_dir, keyed by file content hash, with LRU size-based eviction."""
+    def __init__(self, cache_dir: str, max_bytes: int, version: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, filename: str) -> str:
+        digest = hashlib.sha256(f"version {self.version}\n".encode())
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:32]
+
+    def entry_path(self, filename: str) -> str:
+        return os.path.join(self.cache_dir, self.key(filename) + ".pkl")
+
+    def read(self, path: str) -> Optional[Any]:
+        """The stored payload, or None if there is no usable entry (counted as a miss)."""
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            with open(path, "rb") as f:
+                version, payload = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError) as e:
+            print(f"Warning: ignoring unreadable cache entry {path} ({e})")
+            self.misses += 1
+            return None
+        if version != self.version:
+            self.misses += 1
+            return None
+        # mark as recently used for eviction
+        os.utime(path)
+        self.hits += 1
+        return payload
+
+    def write(self, path: str, payload: Any) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write then rename, so concurrent runs never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((self.version, payload), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self) -> List[Tuple[str, int, float]]:
+        """(path, size, mtime) of every entry, least recently used first."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(".pkl"):
+                path = os.path.join(self.cache_dir, filename)
+                stat = os.stat(path)
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits max_bytes (the newest entry is always kept)."""
+        entries = self.entries()
+        total = sum(size for (_, size, _) in entries)
+        removed = 0
+        for (path, size, _) in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        for (path, _, _) in self.entries():
+            os.remove(path)
+
+    def report(self) -> str:
+        entries = self.entries()
+        total = sum(size for (_, size, _) in entries)
+        return f"cache {self.cache_dir}: {self.hits} hits, {self.misses} misses, " \
+               f"{len(entries)} entries, {total / 1024:.1f} KiB of {self.max_bytes / (1024 * 1024):.0f} MiB"
@@ -0,0 +1,341 @@
+"""
+In-process event-driven timing simulator for SEU campaigns, used as an
+alternative to compiling the generated testbench with VCS.
+
+The simulator works on the compiled form of the Netlist (compiled_netlist). Gate
+behavior comes from the functional models in cell_library, and delays come from
+the SDF (IOPATH arcs, including COND arcs, plus INTERCONNECT delays). Delays are
+transport delays with no pulse rejection, matching the +transport_*_delays
++pulse_*/0 flags the VCS flow is compiled with.
+
+A trial follows the same steps as the generated testbench: random inputs are
+applied one clock period before the injection edge and are assumed settled by
+that edge. A randomly sampled non-input net is then inverted at fault_start for
+fault_width picoseconds. The faulty outputs are monitored over the same sampling
+windows as the testbench, and the trial is tallied into the same four counters.
+"""
+import heapq
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from nathan_parser import Netlist
+from nathan_types import TimingInfo, FaultCounts
+from compiled_netlist import compile_netlist
+from fault_sampling import FaultList, DEFAULT_SEED, sample_faults
+from sdf_parser import SdfData, load_sdf, select_delay
+from fault_log import outcome_bits
+from cone_index import cone_index
+
+# event kinds
+_WIRE_EVENT = 0  # driver of a wire changes its output
+_PIN_EVENT = 1   # a gate input pin sees a new value (after interconnect delay)
+_FORCE_EVENT = 2 # fault injection starts/ends on a wire
+
+class EventSimulator:
+    """Event-driven gate-level simulator over a compiled netlist, annotated with SDF delays."""
+    def __init__(self, netlist: Netlist, sdf: Optional[SdfData] = None, corner: str = "typ", default_delay_ps: int = 1):
+        self.netlist = netlist
+        self.compiled = compile_netlist(netlist)
+        self.sdf = sdf
+        self.corner = corner
+        self.default_delay_ps = default_delay_ps
+        compiled = self.compiled
+
+        self.wire_names: List[str] = compiled.wire_names
+        self.wire_index: Dict[str, int] = compiled.wire_index
+        self.input_wires: List[int] = compiled.input_wires.tolist()
+        self.output_wires: List[int] = compiled.output_wires.tolist()
+        self.output_bit: Dict[int, int] = {w: bit for (bit, w) in enumerate(self.output_wires)}
+        # candidate fault sites, same set and order as the testbench net list
+        self.fault_sites: List[int] = compiled.fault_sites.tolist()
+
+        # python lists of the CSR arrays, the inner loop indexes them one element at a time
+        self.gate_functions = [compiled.gate_model(g).function for g in range(compiled.num_gates)]
+        self.gate_pins: List[Tuple[str, ...]] = [compiled.gate_model(g).pins for g in range(compiled.num_gates)]
+        self.gate_inputs: List[List[int]] = [compiled.gate_inputs(g).tolist() for g in range(compiled.num_gates)]
+        self.gate_output: List[int] = compiled.gate_output.tolist()
+        self.arc_delays: List[List[Tuple[int, int]]] = []                     # per gate, per pin: (rise, fall)
+        self.cond_arcs: List[List[List[Tuple[object, int, int]]]] = []       # per gate, per pin: [(cond, rise, fall)]
+        self.fanout: List[List[Tuple[int, int, int, int]]] = []              # per wire: (gate, pin, rise, fall)
+
+        for gate_idx in range(compiled.num_gates):
+            delays, conds = self._gate_arcs(compiled.gate_names[gate_idx], self.gate_pins[gate_idx])
+            self.arc_delays.append(delays)
+            self.cond_arcs.append(conds)
+        for wire_idx in range(compiled.num_wires):
+            loads, load_pins = compiled.wire_loads(wire_idx)
+            fanout = []
+            for gate_idx, pin_idx in zip(loads.tolist(), load_pins.tolist()):
+                rise, fall = self._interconnect_delay(wire_idx, gate_idx, self.gate_pins[gate_idx][pin_idx])
+                fanout.append((gate_idx, pin_idx, rise, fall))
+            self.fanout.append(fanout)
+
+    def _to_ps(self, triple) -> Optional[int]:
+        value = select_delay(triple, self.corner)
+        if value is None:
+            return None
+        # the testbench runs with 1ps precision
+        return max(0, int(round(value)))
+
+    def _gate_arcs(self, gate_name: str, pins: Tuple[str, ...]):
+        delays: List[Tuple[int, int]] = []
+        conds: List[List[Tuple[object, int, int]]] = []
+        arcs = self.sdf.get_arcs(gate_name) if self.sdf is not None else []
+        for pin in pins:
+            pin_arcs = [arc for arc in arcs if arc.in_pin == pin]
+            plain = [arc for arc in pin_arcs if arc.cond_text is None]
+            # use the unconditional arc when no COND matches, or the first arc if there is none
+            default_arc = plain[0] if plain else (pin_arcs[0] if pin_arcs else None)
+            if default_arc is None:
+                delays.append((self.default_delay_ps, self.default_delay_ps))
+            else:
+                rise = self._to_ps(default_arc.rise)
+                fall = self._to_ps(default_arc.fall)
+                delays.append((rise if rise is not None else self.default_delay_ps,
+                               fall if fall is not None else self.default_delay_ps))
+            pin_conds = []
+            for arc in pin_arcs:
+                if arc.cond is None:
+                    continue
+                rise = self._to_ps(arc.rise)
+                fall = self._to_ps(arc.fall)
+                pin_conds.append((arc.cond, rise if rise is not None else delays[-1][0], fall if fall is not None else delays[-1][1]))
+            conds.append(pin_conds)
+        return delays, conds
+
+    def _interconnect_delay(self, wire_idx: int, load_idx: int, pin: str) -> Tuple[int, int]:
+        if self.sdf is None:
+            return 0, 0
+        driver = self.compiled.wire_driver[wire_idx]
+        src = f"{self.compiled.gate_names[driver]}/Q" if driver >= 0 else self.compiled.verilog_name(wire_idx)
+        rise, fall = self.sdf.get_interconnect(src, f"{self.compiled.gate_names[load_idx]}/{pin}")
+        rise, fall = self._to_ps(rise), self._to_ps(fall)
+        return (rise or 0), (fall or 0)
+
+    def _eval_gate(self, gate_idx: int, pin_values: List[int]) -> int:
+        return self.gate_functions[gate_idx](*pin_values) & 1
+
+    def settle(self, input_values: List[int]) -> List[int]:
+        """Zero-delay (steady state) value of every wire for the given primary input bits."""
+        values = [0] * len(self.wire_names)
+        for wire_idx, value in zip(self.input_wires, input_values):
+            values[wire_idx] = int(value) & 1
+        for gate_idx, inputs in enumerate(self.gate_inputs):
+            values[self.gate_output[gate_idx]] = self._eval_gate(gate_idx, [values[w] for w in inputs])
+        return values
+
+    def _arc_delay(self, gate_idx: int, pin_idx: int, pin_values: List[int], rising: bool) -> int:
+        conds = self.cond_arcs[gate_idx][pin_idx]
+        if conds:
+            named = dict(zip(self.gate_pins[gate_idx], pin_values))
+            for cond, rise, fall in conds:
+                if cond.evaluate(named):
+                    return rise if rising else fall
+        rise, fall = self.arc_delays[gate_idx][pin_idx]
+        return rise if rising else fall
+
+    def simulate_fault(self, golden: List[int], site: int, fault_start: int, fault_width: int, stop_time: int) -> List[Tuple[int, int]]:
+        """
+        Invert wire `site` during [fault_start, fault_start + fault_width) starting from the
+        settled state `golden`, and simulate until stop_time.
+
+        Returns the output difference as a list of (time, mask) change points, where bit i of
+        mask is set when output wire i differs from its golden value.
+        """
+        if fault_width <= 0:
+            return []
+        values = list(golden)            # current value on every net
+        driven = list(golden)            # value the driver puts on every net (differs while forced)
+        pins = [[golden[w] for w in inputs] for inputs in self.gate_inputs]
+        pending: Dict[int, List[Tuple[int, int, int]]] = {}  # wire -> scheduled (time, value, seq)
+        cancelled = set()
+        forced = False
+        seq = 0
+        queue: List[Tuple] = [(fault_start, 0, _FORCE_EVENT, site, 1), (fault_start + fault_width, 1, _FORCE_EVENT, site, 0)]
+        seq = 2
+
+        mask = 0
+        changes: List[Tuple[int, int]] = []
+
+        while queue and queue[0][0] <= stop_time:
+            time, event_seq, kind, a, b = heapq.heappop(queue)
+            changed_wire = None
+            if kind == _PIN_EVENT:
+                gate_idx, pin_idx, value = a, b >> 1, b & 1
+                gate_pins = pins[gate_idx]
+                if gate_pins[pin_idx] == value:
+                    continue
+                gate_pins[pin_idx] = value
+                out = self.gate_output[gate_idx]
+                new_value = self._eval_gate(gate_idx, gate_pins)
+                delay = self._arc_delay(gate_idx, pin_idx, gate_pins, rising=(new_value == 1))
+                # transport delay: a new transition cancels everything scheduled at or after it
+                scheduled = pending.setdefault(out, [])
+                when = time + delay
+                while scheduled and scheduled[-1][0] >= when:
+                    cancelled.add(scheduled.pop()[2])
+                projected = scheduled[-1][1] if scheduled else driven[out]
+                if projected != new_value:
+                    scheduled.append((when, new_value, seq))
+                    heapq.heappush(queue, (when, seq, _WIRE_EVENT, out, new_value))
+                    seq += 1
+                continue
+            elif kind == _WIRE_EVENT:
+                if event_seq in cancelled:
+                    continue
+                wire_idx, value = a, b
+                pending[wire_idx].pop(0)
+                driven[wire_idx] = value
+                if forced and wire_idx == site:
+                    continue
+                if values[wire_idx] != value:
+                    values[wire_idx] = value
+                    changed_wire = wire_idx
+            else:
+                # force to the inverted value, release back to the driven value
+                wire_idx, start = a, b
+                forced = bool(start)
+                value = (1 - golden[wire_idx]) if forced else driven[wire_idx]
+                if values[wire_idx] != value:
+                    values[wire_idx] = value
+                    changed_wire = wire_idx
+
+            if changed_wire is None:
+                continue
+            value = values[changed_wire]
+            if changed_wire in self.output_bit:
+                bit = 1 << self.output_bit[changed_wire]
+                mask = (mask | bit) if value != golden[changed_wire] else (mask & ~bit)
+                if changes and changes[-1][0] == time:
+                    changes[-1] = (time, mask)
+                else:
+                    changes.append((time, mask))
+            for gate_idx, pin_idx, rise, fall in self.fanout[changed_wire]:
+                heapq.heappush(queue, (time + (rise if value else fall), seq, _PIN_EVENT, gate_idx, (pin_idx << 1) | value))
+                seq += 1
+
+        return changes
+
+##################################################
+#               OUTCOME CLASSIFICATION           #
+##################################################
+
+def _mask_at(changes: List[Tuple[int, int]], time: int) -> int:
+    mask = 0
+    for t, m in changes:
+        if t > time:
+            break
+        mask = m
+    return mask
+
+def _scan(changes: List[Tuple[int, int]], lo: int, hi: int, old_mask: Optional[int] = None):
+    """
+    Look at the integer sample points lo..hi (inclusive), like the testbench's #TIMESTEP loops.
+    Returns (last sample with a difference or None, whether the mask ever differed from old_mask).
+    """
+    last_diff = None
+    changed = False
+    if lo > hi:
+        return last_diff, changed
+    # piecewise constant segments [start, next start)
+    segments = [(0, 0)] + changes
+    for i, (start, mask) in enumerate(segments):
+        end = segments[i + 1][0] - 1 if i + 1 < len(segments) else hi
+        seg_lo, seg_hi = max(start, lo), min(end, hi)
+        if seg_lo > seg_hi:
+            continue
+        if mask != 0:
+            last_diff = seg_hi
+        if old_mask is not None and mask != old_mask:
+            changed = True
+    return last_diff, changed
+
+def classify_fault(changes: List[Tuple[int, int]], timing_info: TimingInfo) -> FaultCounts:
+    """
+    Classify one trial from its output difference waveform (times relative to the injection edge),
+    using the same sampling windows and rules as the generated testbench.
+    """
+    period = int(timing_info.clock_period_ps)
+    t_su = int(timing_info.setup_time_ps)
+    t_hd = int(timing_info.hold_time_ps)
+    metastable = False
+    diverged = False
+    last_diff = 0
+
+    # divergence inside the hold window of the injection edge
+    hit, _ = _scan(changes, 1, t_hd)
+    if hit is not None:
+        metastable = diverged = True
+        last_diff = hit
+    # divergence before the setup window of the next edge
+    hit, _ = _scan(changes, t_hd + 1, period - t_su)
+    if hit is not None:
+        diverged = True
+        last_diff = hit
+    # setup window: any change of the faulty outputs is a setup violation
+    hit, moved = _scan(changes, period - t_su + 1, period - 1, _mask_at(changes, period - t_su))
+    if hit is not None:
+        diverged = True
+        last_diff = hit
+    metastable |= moved
+    # hold window of the next edge
+    hit, moved = _scan(changes, period + 1, period + t_hd, _mask_at(changes, period))
+    if hit is not None:
+        diverged = True
+        last_diff = hit
+    metastable |= moved
+
+    counts = FaultCounts(num_faults=1)
+    if metastable:
+        counts.meta_hit = 1
+    if not diverged:
+        counts.masked_logic = 1
+    if not metastable and diverged:
+        if last_diff < period - t_su:
+            counts.masked_timing = 1  # never reached sampling FF
+        else:
+            counts.observed = 1
+    return counts
+
+##################################################
+#                   CAMPAIGN                     #
+##################################################
+
+def run_campaign(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: Optional[str] = None,
+                 seed: int = DEFAULT_SEED, faults: Optional[FaultList] = None) -> FaultCounts:
+    """
+    Run a fault-injection campaign in-process and return the four counters. Trials are
+    sampled from seed, unless a pre-sampled fault list is given (num_faults is then ignored).
+    """
+    counts = FaultCounts()
+    for trial_counts in _trials(netlist, timing_info, num_faults, sdf_filename, seed, faults):
+        counts += trial_counts
+    return counts
+
+def campaign_outcomes(netlist: Netlist, timing_info: TimingInfo, faults: FaultList, sdf_filename: Optional[str] = None,
+                      seed: int = DEFAULT_SEED) -> np.ndarray:
+    """Outcome bits (as in fault_log) of every trial of a pre-sampled fault list, in list order."""
+    return np.array([outcome_bits(trial_counts) for trial_counts in _trials(netlist, timing_info, len(faults), sdf_filename, seed, faults)],
+                    dtype=np.int64)
+
+def _trials(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: Optional[str], seed: int,
+            faults: Optional[FaultList]) -> Iterator[FaultCounts]:
+    """Counters of each trial in turn."""
+    sdf = load_sdf(sdf_filename) if sdf_filename else None
+    sim = EventSimulator(netlist, sdf)
+    fault_seed, input_seed = np.random.SeedSequence(seed).spawn(2)
+    if faults is None:
+        faults = sample_faults(num_faults, len(sim.fault_sites), timing_info, np.random.default_rng(fault_seed))
+    input_rng = np.random.default_rng(input_seed)
+    stop_time = int(timing_info.clock_period_ps) + int(timing_info.hold_time_ps)
+    reaches_output = cone_index(netlist).reaches_output()[sim.fault_sites]
+
+    for site_pos, fault_start, fault_width in zip(faults.sites.tolist(), faults.starts.tolist(), faults.widths.tolist()):
+        inputs = input_rng.integers(0, 2, size=len(sim.input_wires))
+        if not reaches_output[site_pos]:
+            # no path to an output, logic-masked whatever the inputs (drawn anyway to keep the input stream)
+            yield FaultCounts(masked_logic=1, num_faults=1)
+            continue
+        golden = sim.settle(inputs)
+        changes = sim.simulate_fault(golden, sim.fault_sites[site_pos], fault_start, fault_width, stop_time)
+        yield classify_fault(changes, timing_info)
@@ -0,0 +1,107 @@
+"""
+Structural collapsing of equivalent fault sites.
+
+A wire whose only load is an inverter or buffer, and which is not a primary
+output itself, can only affect the circuit through that cell. A flip on it is a
+flip of the cell output, a cell delay later. Chains of such wires (e.g. the
+ib1s1 inverter chains of ksa.vg) therefore collapse onto the last wire of the
+chain, their representative. Multi-input gates are never collapsed through,
+because their other inputs can mask the flip.
+
+Each representative stands for `multiplicity` fault sites. Sampling a site
+uniformly and replacing it by its representative, with the fault start moved by
+the path delay in between, is the same as sampling representatives in
+proportion to their multiplicity. This keeps the campaign counters unchanged,
+while the testbench only needs the representatives (NUM_WIRES). For zero-delay
+logic masking the equivalence is exact. For timing, the shift uses the average
+of the early and late cell delays, so rise/fall asymmetry along the chain is
+not modeled.
+"""
+import argparse
+import numpy as np
+from typing import Dict, Optional
+
+from nathan_parser import Netlist, parse_netlist
+from compiled_netlist import compile_netlist
+from fault_sampling import FaultList
+from timing_engine import TimingAnalysis
+from sdf_parser import SdfData, load_sdf
+
+class CollapsedSites:
+    """Representative and start offset of every fault site (positions in CompiledNetlist.fault_sites)."""
+    def __init__(self, representative: np.ndarray, offset_ps: np.ndarray):
+        self.representative = representative  # per site: position of its representative
+        self.offset_ps = offset_ps            # per site: delay from the site to its representative
+        self.representatives, self.multiplicity = np.unique(representative, return_counts=True)
+
+    def __repr__(self):
+        return f"CollapsedSites({len(self.representative)} sites -> {len(self.representatives)} representatives)"
+
+    @property
+    def num_sites(self) -> int:
+        return len(self.representative)
+
+    def map_faults(self, faults: FaultList) -> FaultList:
+        """The same trials with every site replaced by its representative and the start shifted to match."""
+        return FaultList(self.representative[faults.sites], faults.starts + self.offset_ps[faults.sites], faults.widths)
+
+    def expand(self, values: Dict[int, float]) -> np.ndarray:
+        """Per-site values from values computed for the representatives only."""
+        return np.array([values[rep] for rep in self.representative.tolist()])
+
+    def report(self) -> str:
+        collapsed = self.num_sites - len(self.representatives)
+        fraction = collapsed / self.num_sites if self.num_sites else 0.0
+        return f"\n-----  fault collapsing -----\n" \
+               f"fault sites (NUM_WIRES) : {self.num_sites} -> {len(self.representatives)} representatives " \
+               f"({100 * fraction:.1f}% collapsed)\n" \
+               f"largest class           : {int(self.multiplicity.max()) if len(self.multiplicity) else 0} sites"
+
+def collapse_fault_sites(netlist: Netlist, sdf: Optional[SdfData] = None, analysis: Optional[TimingAnalysis] = None) -> CollapsedSites:
+    compiled = compile_netlist(netlist)
+    analysis = analysis if analysis is not None else TimingAnalysis(netlist, sdf)
+    sites = compiled.fault_sites
+    position = np.full(compiled.num_wires, -1, dtype=np.int64)
+    position[sites] = np.arange(len(sites))
+
+    # next wire along an inverter/buffer and the delay to it, -1 where the site is its own class
+    successor = np.full(len(sites), -1, dtype=np.int64)
+    step_ps = np.zeros(len(sites), dtype=np.int64)
+    fanout = compiled.fanout_counts()
+    is_output = np.zeros(compiled.num_wires, dtype=bool)
+    is_output[compiled.output_wires] = True
+    for pos, wire in enumerate(sites.tolist()):
+        if fanout[wire] != 1 or is_output[wire]:
+            continue
+        gate = int(compiled.fanout_gates[compiled.fanout_ptr[wire]])
+        model = compiled.cell_models[compiled.gate_type[gate]]
+        out = compiled.gate_output[gate]
+        if model is None or len(model.pins) != 1 or out < 0 or position[out] < 0:
+            continue
+        edge = compiled.fanin_ptr[gate]
+        successor[pos] = position[out]
+        step_ps[pos] = int(round((analysis.edge_min[edge] + analysis.edge_max[edge]) / 2))
+
+    representative = np.arange(len(sites), dtype=np.int64)
+    offset_ps = np.zeros(len(sites), dtype=np.int64)
+    for pos in range(len(sites)):
+        node = pos
+        while successor[node] >= 0:
+            offset_ps[pos] += step_ps[node]
+            node = successor[node]
+        representative[pos] = node
+    return CollapsedSites(representative, offset_ps)
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how far structural fault collapsing shrinks the fault-site space")
+    parser.add_argument('input_files', metavar='FILE', nargs='+', help='Netlists to collapse')
+    parser.add_argument('-s', '--sdf', metavar='FILE', required=False, help='Specify module timing information in Standard Data Format (SDF)')
+    args = parser.parse_args()
+
+    sdf = load_sdf(args.sdf) if args.sdf else None
+    for filename in args.input_files:
+        for module_name, netlist in parse_netlist(filename):
+            print(f"{module_name}: {collapse_fault_sites(netlist, sdf).report().strip()}")
+
+if __name__ == "__main__":
+    main()
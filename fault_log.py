@@ -0,0 +1,169 @@
+"""
+Per-fault result logs written by the testbench (+fault_log=) and their aggregation.
+
+Each line after the header is one trial: fault site (position in
+CompiledNetlist.fault_sites), pulse start and width (ps after the injection
+edge), outcome and last_diff, the time of the last output difference (ps after
+the injection edge, -1 if the outputs never diverged). outcome has one bit per
+counter the trial was tallied under (see OUTCOME_BITS), since the counters are
+not mutually exclusive.
+
+Logs are read in chunks of lines, so totals, per-wire vulnerability and
+histograms over start time and pulse width are built in bounded memory however
+long the campaign. A log cut short by a crashed run is read up to its last
+complete record.
+"""
+import argparse
+import itertools
+import numpy as np
+from typing import Iterator, List, Optional
+
+from nathan_parser import parse_netlist
+from nathan_types import FaultCounts
+from gen_testbench import net_list_lines
+
+FAULT_LOG_FILE = "generated/testbench/fault_log.csv"
+FAULT_LOG_HEADER = "site,start,width,outcome,last_diff"
+LOG_CHUNK_LINES = 64 * 1024
+
+# outcome bits, one per FaultCounts counter
+MASKED_TIMING = 1
+META_HIT = 2
+MASKED_LOGIC = 4
+OBSERVED = 8
+OUTCOME_BITS = [("masked_timing", MASKED_TIMING), ("meta_hit", META_HIT), ("masked_logic", MASKED_LOGIC), ("observed", OBSERVED)]
+
+# histogram bin widths in ps
+START_BINS = 20
+WIDTH_BIN_PS = 10
+
+def outcome_bits(counts: FaultCounts) -> int:
+    """Outcome of a single trial from its counters."""
+    return sum(bit for (name, bit) in OUTCOME_BITS if getattr(counts, name) > 0)
+
+def read_outcomes(filenames: List[str], chunk_lines: int = LOG_CHUNK_LINES) -> np.ndarray:
+    """Outcome column of the logs, concatenated in order (e.g. the shards of one fault list)."""
+    chunks = [records[:, 3] for filename in filenames for records in read_fault_log(filename, chunk_lines)]
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+
+def read_fault_log(filename: str, chunk_lines: int = LOG_CHUNK_LINES) -> Iterator[np.ndarray]:
+    """(n, 5) int64 arrays of consecutive records (site, start, width, outcome, last_diff)."""
+    with open(filename) as f:
+        header = f.readline().strip()
+        if header != FAULT_LOG_HEADER:
+            raise ValueError(f"{filename} is not a fault log (header {header!r})")
+        while True:
+            lines = list(itertools.islice(f, chunk_lines))
+            if not lines:
+                return
+            if not lines[-1].endswith("\n"):
+                # record cut short by a crashed run
+                lines.pop()
+            if lines:
+                yield np.loadtxt(lines, delimiter=",", dtype=np.int64, ndmin=2)
+
+def _grow(array: np.ndarray, length: int) -> np.ndarray:
+    """array padded with zero rows up to length rows."""
+    if len(array) >= length:
+        return array
+    return np.concatenate([array, np.zeros((length - len(array),) + array.shape[1:], dtype=array.dtype)])
+
+def _outcome_columns(outcome: np.ndarray) -> np.ndarray:
+    """(n, 4) 0/1 matrix of the counters each trial was tallied under, in OUTCOME_BITS order."""
+    return np.stack([(outcome & bit) != 0 for (_, bit) in OUTCOME_BITS], axis=1).astype(np.int64)
+
+def _binned(hist: np.ndarray, bins: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    hist = _grow(hist, int(bins.max()) + 1 if len(bins) else 0)
+    np.add.at(hist, bins, columns)
+    return hist
+
+class FaultLogSummary:
+    """Running totals, per-site outcome counts and start/width histograms of fault log records."""
+    def __init__(self, clock_period_ps: float, num_sites: int = 0):
+        self.clock_period_ps = clock_period_ps
+        self.start_bin_ps = max(1, int(np.ceil(clock_period_ps / START_BINS)))
+        self.num_records = 0
+        # rows: site / start bin / width bin, columns: counters in OUTCOME_BITS order
+        self.site_outcomes = np.zeros((num_sites, len(OUTCOME_BITS)), dtype=np.int64)
+        self.site_trials = np.zeros(num_sites, dtype=np.int64)
+        self.start_hist = np.zeros((0, len(OUTCOME_BITS)), dtype=np.int64)
+        self.width_hist = np.zeros((0, len(OUTCOME_BITS)), dtype=np.int64)
+
+    def add(self, records: np.ndarray) -> None:
+        sites, starts, widths, outcome = records[:, 0], records[:, 1], records[:, 2], records[:, 3]
+        columns = _outcome_columns(outcome)
+        self.num_records += len(records)
+        self.site_outcomes = _binned(self.site_outcomes, sites, columns)
+        self.site_trials = _grow(self.site_trials, len(self.site_outcomes))
+        np.add.at(self.site_trials, sites, 1)
+        self.start_hist = _binned(self.start_hist, starts // self.start_bin_ps, columns)
+        self.width_hist = _binned(self.width_hist, widths // WIDTH_BIN_PS, columns)
+
+    def add_file(self, filename: str, chunk_lines: int = LOG_CHUNK_LINES) -> int:
+        """Add every complete record of a log, returns how many were read."""
+        before = self.num_records
+        for records in read_fault_log(filename, chunk_lines):
+            self.add(records)
+        return self.num_records - before
+
+    def merge(self, other: "FaultLogSummary") -> None:
+        self.num_records += other.num_records
+        for name in ["site_outcomes", "site_trials", "start_hist", "width_hist"]:
+            mine, theirs = getattr(self, name), getattr(other, name)
+            length = max(len(mine), len(theirs))
+            setattr(self, name, _grow(mine, length) + _grow(theirs, length))
+
+    def counts(self) -> FaultCounts:
+        totals = self.site_outcomes.sum(axis=0) if len(self.site_outcomes) else np.zeros(len(OUTCOME_BITS), dtype=np.int64)
+        return FaultCounts(**{name: int(totals[i]) for i, (name, _) in enumerate(OUTCOME_BITS)}, num_faults=self.num_records)
+
+    def vulnerability(self) -> np.ndarray:
+        """Fraction of the trials on each site that were observed or hit setup/hold (nan where none were run)."""
+        meta = self.site_outcomes[:, 1]
+        observed = self.site_outcomes[:, 3]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.site_trials > 0, (meta + observed) / self.site_trials, np.nan)
+
+    def report(self, site_names: Optional[List[str]] = None, num_sites: int = 10) -> str:
+        lines = [f"\n-----  fault log ({self.num_records} trials) -----"]
+        vulnerability = self.vulnerability()
+        ranked = [site for site in np.argsort(-np.nan_to_num(vulnerability, nan=-1.0), kind="stable")[:num_sites]
+                  if self.site_trials[site] > 0]
+        lines.append(f"{'most vulnerable wires':<24} {'trials':>8} {'meta+obs':>9}")
+        for site in ranked:
+            name = site_names[site] if site_names is not None and site < len(site_names) else f"site {site}"
+            lines.append(f"{name:<24} {self.site_trials[site]:>8} {vulnerability[site]:>9.3f}")
+
+        header = f"{'timing':>8} {'meta':>8} {'logic':>8} {'observed':>8}"
+        for (title, hist, bin_ps) in [("fault start (ps)", self.start_hist, self.start_bin_ps),
+                                      ("pulse width (ps)", self.width_hist, WIDTH_BIN_PS)]:
+            lines.append(f"{title:<24} {header}")
+            for b, row in enumerate(hist):
+                if row.any():
+                    lines.append(f"{f'{b * bin_ps}-{(b + 1) * bin_ps - 1}':<24} " + " ".join(f"{n:>8}" for n in row))
+        return "\n".join(lines)
+
+def summarize_fault_logs(filenames: List[str], clock_period_ps: float, num_sites: int = 0) -> FaultLogSummary:
+    summary = FaultLogSummary(clock_period_ps, num_sites)
+    for filename in filenames:
+        summary.add_file(filename)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate per-fault logs written by the testbench")
+    parser.add_argument('logs', metavar='LOG', nargs='+', help='Fault logs (shards of one campaign are combined)')
+    parser.add_argument('-p', '--period', metavar='PERIOD', required=True, type=float, help='Specify the clock period in nanoseconds (ns)')
+    parser.add_argument('-m', '--module', metavar='FILE', required=False, help='Netlist of the campaign, to name the fault sites')
+    parser.add_argument('-t', '--top', metavar='N', required=False, type=int, default=10, help='Number of wires to list, defaults to 10')
+    args = parser.parse_args()
+
+    site_names = None
+    if args.module:
+        netlist = list(dict(parse_netlist(args.module)).values())[0]
+        site_names = net_list_lines(netlist)
+    summary = summarize_fault_logs(args.logs, args.period * 1000, len(site_names) if site_names else 0)
+    print(summary.counts().summary())
+    print(summary.report(site_names, args.top))
+
+if __name__ == "__main__":
+    main()
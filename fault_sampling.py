@@ -0,0 +1,82 @@
+"""
+Python-side sampling of fault trials.
+
+A trial is (fault site, fault_start, fault_width), drawn the same way the
+generated testbench draws them: a uniform site among the non-input wires, a
+uniform start within the clock period and a normally distributed pulse width.
+Sites are positions in CompiledNetlist.fault_sites, which is the order of the
+testbench net list (gen_testbench.write_net_list). A fault list can therefore
+be written to a file and replayed by the testbench.
+
+Campaigns split into shards (nathan.py --jobs) draw each shard from its own
+seed, derived from the campaign seed, so a sharded run is reproducible for a
+given seed and shard count.
+"""
+import numpy as np
+from typing import List, Optional
+
+from nathan_types import TimingInfo
+
+DEFAULT_SEED = 42
+
+class FaultList:
+    """Arrays of sampled trials: site position, start (ps after the edge) and pulse width (ps)."""
+    def __init__(self, sites: np.ndarray, starts: np.ndarray, widths: np.ndarray):
+        self.sites = np.asarray(sites, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.widths = np.asarray(widths, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.sites)
+
+    def __repr__(self):
+        return f"FaultList({len(self)} faults)"
+
+    def subset(self, selection: np.ndarray) -> "FaultList":
+        return FaultList(self.sites[selection], self.starts[selection], self.widths[selection])
+
+    def write(self, filename: str) -> None:
+        """One "site start width" line per trial, read back by the testbench with $fscanf."""
+        np.savetxt(filename, np.column_stack([self.sites, self.starts, self.widths]), fmt="%d")
+
+    @classmethod
+    def read(cls, filename: str) -> "FaultList":
+        data = np.loadtxt(filename, dtype=np.int64, ndmin=2)
+        if data.size == 0:
+            return cls(np.zeros(0), np.zeros(0), np.zeros(0))
+        return cls(data[:, 0], data[:, 1], data[:, 2])
+
+def sample_faults(num_faults: int, num_sites: int, timing_info: TimingInfo, rng: Optional[np.random.Generator] = None) -> FaultList:
+    """
+    Uniform sites and start times, normal pulse widths (timing_info.pulse_width_*) clamped at 0,
+    as in the testbench.
+    """
+    rng = rng if rng is not None else np.random.default_rng(DEFAULT_SEED)
+    sites = rng.integers(0, num_sites, size=num_faults)
+    starts = rng.integers(0, int(timing_info.clock_period_ps), size=num_faults)
+    widths = np.maximum(0, np.round(rng.normal(timing_info.pulse_width_mean_ps, timing_info.pulse_width_sigma_ps,
+                                                size=num_faults))).astype(np.int64)
+    return FaultList(sites, starts, widths)
+
+def shard_sizes(num_faults: int, num_shards: int) -> List[int]:
+    """Split num_faults into at most num_shards non-empty, near-equal shards."""
+    num_shards = max(1, min(num_shards, num_faults))
+    return [num_faults // num_shards + (1 if i < num_faults % num_shards else 0) for i in range(num_shards)]
+
+def shard_seeds(seed: int, num_shards: int) -> List[int]:
+    """
+    Independent 31-bit seeds for each shard (they also have to fit a SystemVerilog int).
+    A single shard keeps the campaign seed, so --jobs 1 reproduces an unsharded run.
+    """
+    if num_shards == 1:
+        return [seed]
+    return [int(s.generate_state(1)[0] & 0x7fffffff) for s in np.random.SeedSequence(seed).spawn(num_shards)]
+
+def batch_seed(seed: int, batch: int) -> int:
+    """
+    Seed of batch `batch` of a sequential campaign (31-bit, like shard_seeds). Batch 0 keeps
+    the campaign seed, so a campaign that stops after one batch matches a fixed-size run.
+    """
+    if batch == 0:
+        return seed
+    return int(np.random.SeedSequence([seed, batch]).generate_state(1)[0] & 0x7fffffff)
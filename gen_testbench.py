@@ -1,10 +1,102 @@
 from nathan_parser import Netlist, parse_netlist
-from typing import List
+from typing import List, Optional
 import os
+import numpy as np
 from nathan_types import TimingInfo
-
-def gen_testbench_string(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str) -> str:
-    filtered_wires = {key: value for (key, value) in netlist.wires.items() if not value.is_input}
+from compiled_netlist import compile_netlist
+from cone_index import cone_index
+
+# how the generated testbench watches the outputs, see gen_testbench_string
+MONITOR_STYLES = ["event", "polling"]
+
+# simulator the testbench is written for: "vcs" (SystemVerilog, DPI) or "iverilog" (the subset Icarus Verilog supports, VPI)
+TESTBENCH_DIALECTS = ["vcs", "iverilog"]
+
+TESTBENCH_FILE = "generated/testbench/testbench.sv"
+
+# fault sites of the testbench, one hierarchical name (below testbench.faulty) per line
+NET_LIST_FILE = "generated/testbench/nets.txt"
+
+def net_list_lines(netlist: Netlist, site_positions: Optional[np.ndarray] = None) -> List[str]:
+    """
+    Names of the fault sites in testbench index order (CompiledNetlist.fault_sites), or of
+    the sites at site_positions of it only (e.g. the representatives of fault_collapsing).
+    """
+    compiled = compile_netlist(netlist)
+    sites = compiled.fault_sites if site_positions is None else compiled.fault_sites[site_positions]
+    return [compiled.verilog_name(wire_idx) for wire_idx in sites]
+
+def write_net_list(netlist: Netlist, net_list_filename: str = NET_LIST_FILE, site_positions: Optional[np.ndarray] = None) -> None:
+    directory = os.path.dirname(net_list_filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(net_list_filename, "w") as f:
+        for name in net_list_lines(netlist, site_positions):
+            f.write(name + "\n")
+
+# output-bit cone of every fault site, one hex mask per line in net list order (see cone_index)
+CONE_LIST_FILE = "generated/testbench/cones.txt"
+
+def cone_list_lines(netlist: Netlist, site_positions: Optional[np.ndarray] = None) -> List[str]:
+    """Cone masks of the fault sites in net list order, bit i set if output bit i is reachable."""
+    compiled = compile_netlist(netlist)
+    cones = cone_index(netlist)
+    sites = compiled.fault_sites if site_positions is None else compiled.fault_sites[site_positions]
+    digits = max(1, -(-cones.num_output_bits // 4))
+    return [f"{cones.mask(wire_idx):0{digits}x}" for wire_idx in sites.tolist()]
+
+def write_cone_list(netlist: Netlist, cone_list_filename: str = CONE_LIST_FILE, site_positions: Optional[np.ndarray] = None) -> None:
+    directory = os.path.dirname(cone_list_filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(cone_list_filename, "w") as f:
+        for mask in cone_list_lines(netlist, site_positions):
+            f.write(mask + "\n")
+
+def gen_testbench_string(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str, fault_list_filename: Optional[str] = None,
+                         monitor: str = "event", net_list_filename: str = NET_LIST_FILE,
+                         site_positions: Optional[np.ndarray] = None, instances: int = 1,
+                         cone_list_filename: str = CONE_LIST_FILE, dialect: str = "vcs") -> str:
+    """
+    Build the fault-injection testbench. Faults are sampled inside the testbench, unless a
+    fault list file of pre-sampled "site start width" lines (see fault_sampling.FaultList)
+    is given, in which case the testbench replays the first num_faults of them.
+
+    The campaign parameters are read at run time, so one compiled simulator serves any
+    campaign on the same netlist and SDF: +num_faults=, +seed=, +clock_period=, +t_su=,
+    +t_hd=, +pulse_mean=, +pulse_sigma= (ps), +fault_list=, +net_list=, +cone_list= and
+    +fault_log=. num_faults, timing_info, fault_list_filename, net_list_filename and
+    cone_list_filename only set the defaults used when a plusarg is missing. With
+    +fault_log= every trial is also written as one CSV record.
+
+    The fault sites are not embedded: the testbench loads them from the net list file (see
+    write_net_list) at time 0, resolving each name to a VPI handle once, and then forces,
+    reads and releases them by index. site_positions restricts the fault sites to those
+    positions of CompiledNetlist.fault_sites; fault lists then index into the restricted list.
+
+    monitor selects how the outputs are watched: "event" (default) reacts to changes of diff
+    and of the faulty outputs, "polling" checks them every TIMESTEP. Both classify the same way.
+
+    instances sets the number of faulty copies of the DUT (faulty[k].dut), all driven by the
+    same inputs and compared against the one golden copy. Every cycle injects an independent
+    fault into each copy, so one input vector and one golden simulation serve instances trials.
+    Trials are logged in fault-list order (copy k of a cycle runs trial i + k).
+
+    Each copy only compares the output bits in the cone of influence of its fault site,
+    loaded from the cone list file (see write_cone_list). A fault on a site with an empty
+    cone is logic-masked without being injected, and a cycle whose faults are all of that
+    kind is not simulated at all.
+
+    dialect "iverilog" writes the same testbench for Icarus Verilog: the VPI system tasks of
+    net_force_vpi.c instead of DPI, $random instead of std::randomize for the inputs (seeded
+    by +input_seed=), plusargs read by the campaign process instead of static initializers,
+    and one injector process per faulty copy instead of automatic variables in fork/join_none.
+    """
+    iverilog = dialect == "iverilog"
+    # value of a function call that is not needed, void casts being VCS-only
+    discard = "found = " if iverilog else "void'"
+    compiled = compile_netlist(netlist)
+    fault_sites = compiled.fault_sites if site_positions is None else compiled.fault_sites[site_positions]
     ##################################################
     #               TESTBENCH DEFINES                #
     ##################################################
@@ -21,10 +113,14 @@ f"""
 `define PS(ticks) (ticks * 1)
 `define NS(ticks) (ticks * 1000)
 `define NUM_FAULTS {num_faults}
-`define NUM_WIRES {len(filtered_wires)}
-`define CLOCK_PERIOD `NS({timing_info.clock_period_ns})
-`define T_SU `NS({timing_info.setup_time_ns})
-`define T_HD `NS({timing_info.hold_time_ns})
+`define NUM_WIRES {len(fault_sites)}
+`define NUM_INSTANCES {instances}
+`define NUM_OUTPUT_BITS {max(1, sum(output[1] for output in netlist.outputs))}
+`define CLOCK_PERIOD `PS({int(timing_info.clock_period_ps)})
+`define T_SU `PS({int(timing_info.setup_time_ps)})
+`define T_HD `PS({int(timing_info.hold_time_ps)})
+`define PULSE_MEAN `PS({int(timing_info.pulse_width_mean_ps)})
+`define PULSE_SIGMA `PS({int(timing_info.pulse_width_sigma_ps)})
 `define TIMESTEP `PS(1)
 
 """
@@ -32,47 +128,84 @@ f"""
     ##################################################
     #               TESTBENCH HEADER                 #
     ##################################################
-    TB_HEADER = \
-f"""
-module testbench();
+    if iverilog:
+        TB_NET_HOOKS = \
+"""
+    // VPI system tasks of net_force_vpi.c for interacting with internal nets, resolved once by $load_nets
+    // (the nets of faulty copy k have indices k * NUM_WIRES + site): $load_nets(filename, scope),
+    // $force_net(idx, value), $release_net(idx) and $get_net_value(idx)
+    int found;
+"""
+        TB_PARAMETERS = \
+"""
+    // read by the campaign process before anything else, the clock starts once the period is set
+    int  num_faults;
+    int  seed;
+    int  input_seed;
+    time clock_period;
+    time t_su;
+    time t_hd;
+    int  pulse_mean;
+    int  pulse_sigma;
+    task read_plusargs;
+        num_faults   = plusarg_int("num_faults", `NUM_FAULTS);
+        seed         = plusarg_int("seed", 42);
+        input_seed   = plusarg_int("input_seed", 42);
+        t_su         = plusarg_int("t_su", `T_SU);
+        t_hd         = plusarg_int("t_hd", `T_HD);
+        pulse_mean   = plusarg_int("pulse_mean", `PULSE_MEAN);
+        pulse_sigma  = plusarg_int("pulse_sigma", `PULSE_SIGMA);
+        clock_period = plusarg_int("clock_period", `CLOCK_PERIOD);
+    endtask
 
-    // backannotate modules with timing information
-    initial $sdf_annotate("{sdf_filename}", golden);
-    initial $sdf_annotate("{sdf_filename}", faulty);
-    
-    // DPI hooks for interacting with internal nets via name
-    import "DPI-C" function int force_net_by_name_dpi(input string netname, input int value);
-    import "DPI-C" function int release_net_by_name_dpi(input string netname);
-    import "DPI-C" function int get_net_value_by_name_dpi(input string netname);
+    // clock gen
+    logic clock = 0;
+    initial begin
+        wait (clock_period > 0);
+        forever #(clock_period / 2) clock = ~clock;
+    end
+"""
+    else:
+        TB_NET_HOOKS = \
+"""
+    // DPI hooks for interacting with internal nets, resolved once by load_nets_dpi
+    // (the nets of faulty copy k have indices k * NUM_WIRES + site)
+    import "DPI-C" function int load_nets_dpi(input string filename, input string scope);
+    import "DPI-C" function int force_net_idx(input int idx, input int value);
+    import "DPI-C" function int release_net_idx(input int idx);
+    import "DPI-C" function int get_net_value_idx(input int idx);
+"""
+        TB_PARAMETERS = \
+"""
+    // static initializers run before any process, so the clock below already sees these
+    int  num_faults   = plusarg_int("num_faults", `NUM_FAULTS);
+    int  seed         = plusarg_int("seed", 42);
+    time clock_period = plusarg_int("clock_period", `CLOCK_PERIOD);
+    time t_su         = plusarg_int("t_su", `T_SU);
+    time t_hd         = plusarg_int("t_hd", `T_HD);
+    int  pulse_mean   = plusarg_int("pulse_mean", `PULSE_MEAN);
+    int  pulse_sigma  = plusarg_int("pulse_sigma", `PULSE_SIGMA);
 
     // clock gen
     logic clock = 0;
     always begin
-        #(`CLOCK_PERIOD / 2) clock = ~clock;
+        #(clock_period / 2) clock = ~clock;
     end
 """
+    TB_HEADER = \
+f"""
+module testbench();
 
-    ##################################################
-    #                 NET NAMES DICT                 #
-    ##################################################
-    TB_NET_NAMES_DICT = ""
-    TB_NET_NAMES_DICT += "\t// Netlist Dict\n"
-    TB_NET_NAMES_DICT += "\tstring net_names_dict[`NUM_WIRES] = '{\n"
-    for i, (wire_name, wire) in enumerate(filtered_wires.items()):
-        if wire_name[0] == '\\':
-            wire_name = '\\' + wire_name
-
-        if wire.width > 1:
-            netname, netidx = wire_name.rsplit('_', 1)
-            TB_NET_NAMES_DICT += f"\t\t\"{netname}[{netidx}]\""
-        else:
-            TB_NET_NAMES_DICT += f"\t\t\"{wire_name}\""
-        # style and commas
-        if i != (len(filtered_wires) - 1):
-            TB_NET_NAMES_DICT += ","
-        if i % 8 == 7:
-            TB_NET_NAMES_DICT += '\n'
-    TB_NET_NAMES_DICT += "\t};\n"
+    // backannotate modules with timing information (the faulty copies are annotated where they are instantiated)
+    initial $sdf_annotate("{sdf_filename}", golden);
+    {TB_NET_HOOKS}
+    // campaign parameters, overridden at run time by +<name>=<value>
+    function automatic int plusarg_int(string name, int default_value);
+        int value;
+        if ($value$plusargs({{name, "=%d"}}, value)) return value;
+        return default_value;
+    endfunction
+{TB_PARAMETERS}"""
 
     ##################################################
     #               DUT INSTANTIATION                #
@@ -87,91 +220,234 @@ module testbench();
         TB_DUT_INST += f"\tlogic [{output[1]-1}:0] {output[0]}_golden ;\n"
     TB_DUT_INST += "\n\t// Output Portlist (faulty)\n"
     for output in netlist.outputs:
-        TB_DUT_INST += f"\tlogic [{output[1]-1}:0] {output[0]}_faulty ;\n"
+        TB_DUT_INST += f"\tlogic [{output[1]-1}:0] {output[0]}_faulty [`NUM_INSTANCES] ;\n"
 
     TB_DUT_INST += "\n\t// Output Portlist (faulty, old)\n"
     for output in netlist.outputs:
-        TB_DUT_INST += f"\tlogic [{output[1]-1}:0] {output[0]}_faulty_old ;\n"
+        TB_DUT_INST += f"\tlogic [{output[1]-1}:0] {output[0]}_faulty_old [`NUM_INSTANCES] ;\n"
 
-    # Module instantiation
+    # Module instantiation, the faulty copies in a generate loop (scope testbench.faulty[k].dut)
     for mod in ["golden", "faulty"]:
-        TB_DUT_INST += f"\n\t{netlist.name} {mod} (\n"
-        TB_DUT_INST += "\t\t// Inputs\n"
+        indent = "\t" if mod == "golden" else "\t\t"
+        if mod == "golden":
+            TB_DUT_INST += f"\n\t{netlist.name} golden (\n"
+        else:
+            TB_DUT_INST += "\n\tfor (genvar k = 0; k < `NUM_INSTANCES; k++) begin : faulty\n"
+            TB_DUT_INST += f"\t\tinitial $sdf_annotate(\"{sdf_filename}\", dut);\n"
+            TB_DUT_INST += f"\t\t{netlist.name} dut (\n"
+        TB_DUT_INST += f"{indent}\t// Inputs\n"
         for input in netlist.inputs:
-            TB_DUT_INST += f"\t\t. {input[0]} ( {input[0]} ),\n"
-        TB_DUT_INST += "\t\t// Outputs\n"
+            TB_DUT_INST += f"{indent}\t. {input[0]} ( {input[0]} ),\n"
+        TB_DUT_INST += f"{indent}\t// Outputs\n"
         for i in range(0, len(netlist.outputs)):
             output = netlist.outputs[i]
-            TB_DUT_INST += f"\t\t. {output[0]} ( {output[0]}_{mod} )"
+            port = f"{output[0]}_golden" if mod == "golden" else f"{output[0]}_faulty[k]"
+            TB_DUT_INST += f"{indent}\t. {output[0]} ( {port} )"
             if i != (len(netlist.outputs) - 1):
                 TB_DUT_INST += ","
             TB_DUT_INST += "\n"
-        TB_DUT_INST += "\t);\n"
+        TB_DUT_INST += f"{indent});\n"
+        if mod == "faulty":
+            TB_DUT_INST += "\tend\n"
 
     ##################################################
     #               SIMULATION VARIABLES             #
     ##################################################
     TB_SIM_VARS = \
 """
-    // seed
-    int seed = 42;
-
     // Statistic counters maintained throughout campaign
     int  masked_timing = 0;   // 1) timing‑masked (between hold & setup)
     int  meta_hit      = 0;   // 2) setup/hold violation --> metastability
     int  masked_logic  = 0;   // 3) logic‑masked (fault crosses clock edge but doesn't have observable effects)
     int  observed      = 0;   // 4) captured & visible
 
-    // intermediate variables
-    int          sampled_idx;
-    int          fault_start;
-    int          fault_width; 
-    time         fault_end;   
-    logic        metastable; 
-    logic        diverged;   
+    // intermediate variables, one entry per faulty copy where indexed
+    int          sampled_idx [`NUM_INSTANCES];
+    int          fault_start [`NUM_INSTANCES];
+    int          fault_width [`NUM_INSTANCES];
+    logic        metastable [`NUM_INSTANCES];
+    logic        diverged [`NUM_INSTANCES];
+    time         last_diff [`NUM_INSTANCES];
+    int          active;      // faulty copies with a fault this cycle
+    int          live;        // active copies whose fault can reach an output
     time         edge_now;
     time         edge_next;
     time         hd_period_end;
     time         su_period_start; 
-    time         last_diff;
     logic        is_timing_masked;
-    string       net_name;
 """
 
 
     ##################################################
     #                   DIFF SIGNAL                  #
     ##################################################
+    # output bit i of the cone masks is bit i of these vectors (first port in the LSBs)
+    golden_bits = ", ".join(f"{output[0]}_golden" for output in reversed(netlist.outputs))
+    faulty_bits = ", ".join(f"{output[0]}_faulty[k]" for output in reversed(netlist.outputs))
     TB_DIFF_SIGNAL = \
+f"""
+    // output-bit cone of every fault site, and of the fault each faulty copy runs (0 if none)
+    logic [`NUM_OUTPUT_BITS-1:0] cone_masks [`NUM_WIRES];
+    logic [`NUM_OUTPUT_BITS-1:0] cone [`NUM_INSTANCES];
+
+    // is there a difference between the outputs of faulty copy k and the golden module,
+    // within the cone of its fault
+    wire [`NUM_OUTPUT_BITS-1:0] golden_bits = {{{golden_bits}}};
+    wire [`NUM_INSTANCES-1:0] diff;
+    for (genvar k = 0; k < `NUM_INSTANCES; k++) begin : compare
+        wire [`NUM_OUTPUT_BITS-1:0] faulty_bits = {{{faulty_bits}}};
+        assign diff[k] = |((faulty_bits ^ golden_bits) & cone[k]);
+    end
 """
-    // is there a difference between the two module outputs
-    logic diff;
-    assign diff =
+
+    ##################################################
+    #                OUTPUT MONITORS                 #
+    ##################################################
+    TB_MONITORS = ""
+    if monitor == "event":
+        faulty_outputs = " or ".join(f"{output[0]}_faulty[k]" for output in netlist.outputs)
+        deviation_check = " ||\n\t\t\t\t".join(f"( {output[0]}_faulty[k] != {output[0]}_faulty_old[k] )" for output in netlist.outputs)
+        TB_MONITORS = \
+f"""
+    // event-driven output monitors: instead of sampling every TIMESTEP, record when diff
+    // (or a deviation of the faulty outputs from faulty_old) starts and ends, and turn each
+    // interval into the flags the per-sample checks would have set (samples are integer
+    // times from watch_from on, except skip_sample, the capturing edge), per faulty copy
+    logic  watch_diff = 0;
+    logic  watch_outputs = 0;
+    logic  diff_high [`NUM_INSTANCES];
+    logic  deviating [`NUM_INSTANCES];
+    time   watch_from;
+    time   skip_sample;
+    time   diff_since [`NUM_INSTANCES];
+    time   deviation_since [`NUM_INSTANCES];
+    time   deviation_from;
+
+    function automatic void note_diff(int k, time from_t, time to_t);
+        if (from_t < watch_from) from_t = watch_from;
+        if (to_t == skip_sample) to_t = to_t - 1;
+        if (from_t == skip_sample) from_t = from_t + 1;
+        if (to_t >= from_t) begin
+            diverged[k] = 1;
+            if (to_t > last_diff[k]) last_diff[k] = to_t;
+            if (from_t <= hd_period_end) metastable[k] = 1;
+        end
+    endfunction
+
+    function automatic void note_deviation(int k, time from_t, time to_t);
+        if (from_t < deviation_from) from_t = deviation_from;
+        if (to_t >= from_t) metastable[k] = 1;
+    endfunction
+
+    for (genvar k = 0; k < `NUM_INSTANCES; k++) begin : monitor
+        always @(diff[k]) if (watch_diff) begin
+            if (diff[k]) begin
+                if (!diff_high[k]) begin
+                    diff_high[k] = 1;
+                    diff_since[k] = $time;
+                end
+            end else if (diff_high[k]) begin
+                diff_high[k] = 0;
+                note_diff(k, diff_since[k], $time - 1);
+            end
+        end
+
+        always @({faulty_outputs}) if (watch_outputs) begin
+            if ({deviation_check}) begin
+                if (!deviating[k]) begin
+                    deviating[k] = 1;
+                    deviation_since[k] = $time;
+                end
+            end else if (deviating[k]) begin
+                deviating[k] = 0;
+                note_deviation(k, deviation_since[k], $time - 1);
+            end
+        end
+    end
 """
-    for i in range(0, len(netlist.outputs)):
-        output = netlist.outputs[i]
-        TB_DIFF_SIGNAL += f"\t\t{output[0]}_faulty != {output[0]}_golden "
-        if i != len(netlist.outputs) - 1:
-            TB_DIFF_SIGNAL += " ||\n"
-    TB_DIFF_SIGNAL += ";\n"
 
     ##################################################
     #                INITIAL BEGIN                   #
     ##################################################
+    read_plusargs = "\n        read_plusargs();" if iverilog else ""
+    load_nets = "$load_nets" if iverilog else "load_nets_dpi"
     TB_INITIAL_BEGIN = \
 f"""
-    // fault injection campaign
-    initial begin
+    // fault injection campaign, replaying pre-sampled faults if +fault_list= names a file
+    int fault_file = 0;
+    string fault_list = "{fault_list_filename or ''}";
+    string net_list = "{net_list_filename}";
+    string cone_list = "{cone_list_filename}";
+    int cone_file;
+    // per-fault records, written if +fault_log= names a file (see fault_log.py)
+    int log_file = 0;
+    string fault_log;
+    int outcome;
+    initial begin{read_plusargs}
+        {discard}($value$plusargs("net_list=%s", net_list));
+        for (int k = 0; k < `NUM_INSTANCES; k++) begin
+            if ({load_nets}(net_list, $sformatf("testbench.faulty[%0d].dut", k)) != `NUM_WIRES) begin
+                $display("Error: net list %s does not resolve to the %0d fault sites of this testbench", net_list, `NUM_WIRES);
+                $finish;
+            end
+        end
+
+        {discard}($value$plusargs("cone_list=%s", cone_list));
+        cone_file = $fopen(cone_list, "r");
+        if (cone_file == 0) begin
+            $display("Warning: could not open cone list %s, comparing all outputs", cone_list);
+            for (int w = 0; w < `NUM_WIRES; w++) cone_masks[w] = '1;
+        end else begin
+            $fclose(cone_file);
+            $readmemh(cone_list, cone_masks);
+        end
+
+        if ($value$plusargs("fault_log=%s", fault_log)) begin
+            log_file = $fopen(fault_log, "w");
+            if (log_file == 0) begin
+                $display("Error: could not open fault log %s", fault_log);
+                $finish;
+            end
+            $fdisplay(log_file, "site,start,width,outcome,last_diff");
+        end
 
-        for (int i = 0; i < `NUM_FAULTS; i++) begin
-            // sample a net from the netlist
-            sampled_idx = $dist_uniform(seed, 0, `NUM_WIRES - 1);
-            net_name = {{ \"testbench.faulty.\", net_names_dict[sampled_idx]}};
+        {discard}($value$plusargs("fault_list=%s", fault_list));
+        if (fault_list != "") begin
+            fault_file = $fopen(fault_list, "r");
+            if (fault_file == 0) begin
+                $display("Error: could not open fault list %s", fault_list);
+                $finish;
+            end
+        end
 
-            // sample timing parameters for the pulse
-            fault_start = $dist_uniform(seed, 0, `CLOCK_PERIOD - 1);
-            fault_width = $dist_normal(seed, `PS(55), `PS(15));
-            if (fault_width < 0) fault_width = 0;
+        // every cycle runs one trial on each faulty copy (fewer in the last one)
+        for (int i = 0; i < num_faults; i += `NUM_INSTANCES) begin
+            active = (num_faults - i < `NUM_INSTANCES) ? num_faults - i : `NUM_INSTANCES;
+            live = 0;
+            for (int k = 0; k < `NUM_INSTANCES; k++) cone[k] = 0;
+            for (int k = 0; k < active; k++) begin
+                if (fault_file != 0) begin
+                    // read the net and pulse timing of the next fault
+                    if ($fscanf(fault_file, "%d %d %d\\n", sampled_idx[k], fault_start[k], fault_width[k]) != 3) begin
+                        $display("Error: fault list %s ended after %0d faults", fault_list, i + k);
+                        $finish;
+                    end
+                end else begin
+                    // sample a net from the netlist
+                    sampled_idx[k] = $dist_uniform(seed, 0, `NUM_WIRES - 1);
+
+                    // sample timing parameters for the pulse
+                    fault_start[k] = $dist_uniform(seed, 0, clock_period - 1);
+                    fault_width[k] = $dist_normal(seed, pulse_mean, pulse_sigma);
+                    if (fault_width[k] < 0) fault_width[k] = 0;
+                end
+                // a fault with no path to an output is logic-masked, it is neither injected nor compared
+                cone[k] = cone_masks[sampled_idx[k]];
+                if (cone[k] != 0) live++;
+                metastable[k] = 0;
+                diverged[k] = 0;
+                last_diff[k] = 0;
+            end
 
 """
 
@@ -180,66 +456,67 @@ f"""
     ##################################################
     TB_RANDOM_INPUTS = \
 """
-            // random inputs
-            @(posedge clock);
+            // random inputs, drawn even when the cycle is skipped so later cycles see the same ones
+            if (live > 0) @(posedge clock);
 """
     for input in netlist.inputs:
-        TB_RANDOM_INPUTS += f"\t\t\tassert(std::randomize( {input[0]} ));\n"
+        if iverilog:
+            # one 32-bit draw per word, truncated to the port width
+            words = ", ".join(["$random(input_seed)"] * -(-input[1] // 32))
+            TB_RANDOM_INPUTS += f"\t\t\t{input[0]} = {{{words}}};\n"
+        else:
+            TB_RANDOM_INPUTS += f"\t\t\tassert(std::randomize( {input[0]} ));\n"
 
     ##################################################
     #                FAULT INJECTION                 #
     ##################################################
-    old_assign_stmt = ""
+    old_assign_stmt = "\t\t\t\t\tfor (int k = 0; k < `NUM_INSTANCES; k++) begin\n"
     for output in netlist.outputs:
-        old_assign_stmt += f"\t\t\t\t\t{output[0]}_faulty_old = {output[0]}_faulty ;\n"
+        old_assign_stmt += f"\t\t\t\t\t\t{output[0]}_faulty_old[k] = {output[0]}_faulty[k] ;\n"
+    old_assign_stmt += "\t\t\t\t\tend\n"
 
     old_eq_check = ""
     for i in range(0, len(netlist.outputs)):
         output = netlist.outputs[i]
-        old_eq_check += f"( {output[0]}_faulty != {output[0]}_faulty_old )"
+        old_eq_check += f"( {output[0]}_faulty[k] != {output[0]}_faulty_old[k] )"
         if i != len(netlist.outputs) - 1:
             old_eq_check += " ||\n"
 
-    TB_FAULT_INJECTION = \
-f"""
-            // fault modeling routine
-            @(posedge clock)
-            fork
-                //----- 1) inject the bit‑flip ---------------------------------------
-                begin
-                    #`PS(fault_start);
-                    force_net_by_name_dpi(net_name, ~get_net_value_by_name_dpi(net_name));
-                    #`PS(fault_width);
-                    release_net_by_name_dpi(net_name);
-                end
-
-                //----- 2) watch outputs until next +edge ----------------------------
+    if monitor == "polling":
+        TB_WATCH_OUTPUTS = \
+f"""                //----- 2) watch outputs until next +edge ----------------------------
                 begin
                     edge_now   = $time; // current rising edge
-                    edge_next  = edge_now + `CLOCK_PERIOD;
-                    hd_period_end = edge_now + `T_HD;
-                    su_period_start = edge_next - `T_SU;
-
-                    last_diff = 0;
-                    metastable = 0;
-                    diverged = 0;
+                    edge_next  = edge_now + clock_period;
+                    hd_period_end = edge_now + t_hd;
+                    su_period_start = edge_next - t_su;
+
+                    for (int k = 0; k < `NUM_INSTANCES; k++) begin
+                        last_diff[k] = 0;
+                        metastable[k] = 0;
+                        diverged[k] = 0;
+                    end
 
                     // check for any divergence BEFORE the edge
                     while ($time < hd_period_end) begin
                         #(`TIMESTEP)
-                        if (diff) begin
-                            metastable = 1;
-                            diverged = 1;
-                            last_diff = $time;
+                        for (int k = 0; k < `NUM_INSTANCES; k++) begin
+                            if (diff[k]) begin
+                                metastable[k] = 1;
+                                diverged[k] = 1;
+                                last_diff[k] = $time;
+                            end
                         end
                     end 
 
 
                     while ($time < su_period_start) begin
                         #(`TIMESTEP)
-                        if (diff) begin
-                            diverged = 1;
-                            last_diff = $time;
+                        for (int k = 0; k < `NUM_INSTANCES; k++) begin
+                            if (diff[k]) begin
+                                diverged[k] = 1;
+                                last_diff[k] = $time;
+                            end
                         end
                     end
 
@@ -247,12 +524,14 @@ f"""
 
                     while ($time < (edge_next - 1)) begin  
                         #(`TIMESTEP)
-                        if (diff) begin
-                            last_diff = $time;
-                            diverged = 1;
-                        end
-                        if ({old_eq_check}) begin 
-                            metastable = 1;
+                        for (int k = 0; k < `NUM_INSTANCES; k++) begin
+                            if (diff[k]) begin
+                                last_diff[k] = $time;
+                                diverged[k] = 1;
+                            end
+                            if ({old_eq_check}) begin 
+                                metastable[k] = 1;
+                            end
                         end
                     end 
 
@@ -261,18 +540,121 @@ f"""
 {old_assign_stmt}
 
                     edge_now = $time;
-                    while ($time < (edge_now + `T_HD)) begin
+                    while ($time < (edge_now + t_hd)) begin
                         #(`TIMESTEP)
-                        if (diff) begin
-                            last_diff = $time;
-                            diverged = 1;
-                        end
-                        if ({old_eq_check}) begin
-                            metastable = 1;
+                        for (int k = 0; k < `NUM_INSTANCES; k++) begin
+                            if (diff[k]) begin
+                                last_diff[k] = $time;
+                                diverged[k] = 1;
+                            end
+                            if ({old_eq_check}) begin
+                                metastable[k] = 1;
+                            end
                         end
                     end
                 end
-            join
+"""
+    else:
+        TB_WATCH_OUTPUTS = \
+f"""                //----- 2) open the monitor windows until next +edge + hold ----------
+                begin
+                    edge_now   = $time; // current rising edge
+                    edge_next  = edge_now + clock_period;
+                    hd_period_end = edge_now + t_hd;
+                    su_period_start = edge_next - t_su;
+
+                    // every sample after the edge counts, except the next edge itself
+                    watch_from = edge_now + 1;
+                    skip_sample = edge_next;
+                    for (int k = 0; k < `NUM_INSTANCES; k++) begin
+                        last_diff[k] = 0;
+                        metastable[k] = 0;
+                        diverged[k] = 0;
+                        diff_high[k] = (diff[k] === 1'b1);
+                        diff_since[k] = watch_from;
+                    end
+                    watch_diff = 1;
+
+                    // setup window: the faulty outputs must hold their value from here on
+                    #(su_period_start - $time);
+{old_assign_stmt}
+                    deviation_from = su_period_start + 1;
+                    for (int k = 0; k < `NUM_INSTANCES; k++) deviating[k] = 0;
+                    watch_outputs = 1;
+
+                    // capturing edge: close the setup window, open the hold window
+                    @(posedge clock);
+                    for (int k = 0; k < `NUM_INSTANCES; k++) begin
+                        if (deviating[k]) note_deviation(k, deviation_since[k], $time - 1);
+                        deviating[k] = 0;
+                    end
+{old_assign_stmt}
+                    edge_now = $time;
+                    deviation_from = edge_now + 1;
+
+                    #(t_hd);
+                    for (int k = 0; k < `NUM_INSTANCES; k++) begin
+                        if (diff_high[k]) note_diff(k, diff_since[k], $time);
+                        if (deviating[k]) note_deviation(k, deviation_since[k], $time);
+                    end
+                    watch_diff = 0;
+                    watch_outputs = 0;
+                end
+"""
+
+    if iverilog:
+        # no automatic variables in static processes: every copy has a process of its own
+        TB_INJECTORS = \
+"""
+    // fault injectors, one per faulty copy, started every cycle by the campaign through inject
+    event inject;
+    int   injected;
+    for (genvar k = 0; k < `NUM_INSTANCES; k++) begin : injector
+        always @(inject) if (k < active && cone[k] != 0) begin
+            #`PS(fault_start[k]);
+            $force_net(k * `NUM_WIRES + sampled_idx[k], ~$get_net_value(k * `NUM_WIRES + sampled_idx[k]));
+            #`PS(fault_width[k]);
+            $release_net(k * `NUM_WIRES + sampled_idx[k]);
+            injected++;
+        end
+    end
+"""
+        TB_INJECT = \
+"""                begin
+                    injected = 0;
+                    -> inject;
+                    wait (injected == live);
+                end
+"""
+    else:
+        TB_INJECTORS = ""
+        TB_INJECT = \
+"""                begin
+                    for (int k = 0; k < active; k++) begin
+                        automatic int net = k * `NUM_WIRES + sampled_idx[k];
+                        automatic int start = fault_start[k];
+                        automatic int width = fault_width[k];
+                        if (cone[k] != 0) fork
+                            begin
+                                #`PS(start);
+                                force_net_idx(net, ~get_net_value_idx(net));
+                                #`PS(width);
+                                release_net_idx(net);
+                            end
+                        join_none
+                    end
+                    wait fork;
+                end
+"""
+
+    TB_FAULT_INJECTION = \
+f"""
+            // fault modeling routine, skipped if no fault of this cycle can reach an output
+            if (live > 0) @(posedge clock)
+            fork
+                //----- 1) inject the bit‑flips, one per live faulty copy ---------------
+{TB_INJECT}
+{TB_WATCH_OUTPUTS}            join
 """
 
     ##################################################
@@ -280,23 +662,35 @@ f"""
     ##################################################
     TB_STATISTICS_END = \
 """
-            is_timing_masked = 0;
+            for (int k = 0; k < active; k++) begin
+                is_timing_masked = 0;
+                outcome = 0;
+
+                if (metastable[k]) begin meta_hit++; outcome |= 2; end
+                if (!diverged[k])  begin masked_logic++; outcome |= 4; end
+                if (!metastable[k] && diverged[k] && (last_diff[k] < (edge_now - t_su))) begin 
+                    masked_timing++;  // never reached sampling FF
+                    is_timing_masked = 1;
+                    outcome |= 1;
+                end
+                if (!metastable[k] && diverged[k] && !is_timing_masked) begin observed++; outcome |= 8; end
 
-            if (metastable) meta_hit++;
-            if (!diverged)  masked_logic++;
-            if (!metastable && diverged && (last_diff < (edge_now - `T_SU))) begin 
-                masked_timing++;  // never reached sampling FF
-                is_timing_masked = 1;
+                // outcome has one bit per counter above, last_diff is relative to the injection edge
+                if (log_file != 0) begin
+                    $fdisplay(log_file, "%0d,%0d,%0d,%0d,%0d", sampled_idx[k], fault_start[k], fault_width[k], outcome,
+                              diverged[k] ? last_diff[k] - (edge_next - clock_period) : -1);
+                    if ((i + k) % 256 == 255) $fflush(log_file);
+                end
             end
-            if (!metastable && diverged && !is_timing_masked) observed++; 
         end
 
         // print summary
-        $display("\\n-----  fault‑injection summary (%%0d trials) -----", `NUM_FAULTS);
-        $display("1) timing‑masked        : %%0d", masked_timing);
-        $display("2) setup/hold violation : %%0d", meta_hit);
-        $display("3) logic‑masked         : %%0d", masked_logic);
-        $display("4) observed             : %%0d", observed);
+        $display("\\n-----  fault‑injection summary (%0d trials) -----", num_faults);
+        $display("1) timing‑masked        : %0d", masked_timing);
+        $display("2) setup/hold violation : %0d", meta_hit);
+        $display("3) logic‑masked         : %0d", masked_logic);
+        $display("4) observed             : %0d", observed);
+        if (log_file != 0) $fclose(log_file);
         $finish;
     end
 
@@ -306,10 +700,11 @@ endmodule
     testbench_str =  ""
     testbench_str += TB_DEFINES
     testbench_str += TB_HEADER
-    testbench_str += TB_NET_NAMES_DICT
     testbench_str += TB_DUT_INST
     testbench_str += TB_SIM_VARS
     testbench_str += TB_DIFF_SIGNAL
+    testbench_str += TB_MONITORS
+    testbench_str += TB_INJECTORS
     testbench_str += TB_INITIAL_BEGIN
     testbench_str += TB_RANDOM_INPUTS
     testbench_str += TB_FAULT_INJECTION
@@ -319,12 +714,19 @@ endmodule
 
 
 
-def gen_testbench(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str):
-    testbench_str = gen_testbench_string(netlist, timing_info, num_faults, sdf_filename)
+def gen_testbench(netlist: Netlist, timing_info: TimingInfo, num_faults: int, sdf_filename: str, fault_list_filename: Optional[str] = None,
+                  monitor: str = "event", net_list_filename: str = NET_LIST_FILE, site_positions: Optional[np.ndarray] = None,
+                  instances: int = 1, cone_list_filename: str = CONE_LIST_FILE, testbench_filename: str = TESTBENCH_FILE,
+                  dialect: str = "vcs"):
+    testbench_str = gen_testbench_string(netlist, timing_info, num_faults, sdf_filename, fault_list_filename, monitor, net_list_filename,
+                                         site_positions, instances, cone_list_filename, dialect)
+    write_net_list(netlist, net_list_filename, site_positions)
+    write_cone_list(netlist, cone_list_filename, site_positions)
 
-    os.makedirs("generated", exist_ok=True)
-    os.makedirs("generated/testbench", exist_ok=True)
-    with open("generated/testbench/testbench.sv", "w") as f:
+    directory = os.path.dirname(testbench_filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(testbench_filename, "w") as f:
         f.write(testbench_str)
 
 def test_main():
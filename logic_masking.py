@@ -0,0 +1,110 @@
+"""
+Bit-parallel zero-delay logic-masking analysis.
+
+Every wire holds an array of uint64 words, one bit per input vector, so one
+pass over the levelized netlist evaluates 64 * num_words vectors at once using
+the bitwise cell models from cell_library. To analyze a fault site, the site's
+word array is inverted and only the gates in its transitive fanout are
+re-evaluated. The flip is logic-masked for a vector when no primary output
+changes.
+
+Timing is ignored: this answers "would a long enough flip on this wire ever be
+visible at the outputs", which is the logic-masking part of the campaign.
+"""
+import numpy as np
+from typing import Dict, List, Optional
+
+from nathan_parser import Netlist
+from nathan_types import FaultCounts
+from compiled_netlist import compile_netlist
+
+WORD_BITS = 64
+
+def popcount(words: np.ndarray) -> int:
+    """Number of set bits in a uint64 array."""
+    return int(np.unpackbits(np.ascontiguousarray(words).view(np.uint8)).sum())
+
+class BitParallelEvaluator:
+    """Levelized zero-delay evaluator over packed uint64 input vectors."""
+    def __init__(self, netlist: Netlist):
+        self.netlist = netlist
+        self.compiled = compile_netlist(netlist)
+        compiled = self.compiled
+        self.wire_names: List[str] = compiled.wire_names
+        self.wire_index: Dict[str, int] = compiled.wire_index
+        self.input_wires: List[int] = compiled.input_wires.tolist()
+        self.output_wires: List[int] = compiled.output_wires.tolist()
+        self.fault_sites: List[int] = compiled.fault_sites.tolist()
+
+        self.gate_functions = [compiled.gate_model(g).function for g in range(compiled.num_gates)]
+        self.gate_inputs: List[List[int]] = [compiled.gate_inputs(g).tolist() for g in range(compiled.num_gates)]
+        self.gate_output: List[int] = compiled.gate_output.tolist()
+        # wire -> distinct gates reading it (gate IDs are already in evaluation order)
+        self.fanout: List[List[int]] = [sorted(set(compiled.wire_loads(w)[0].tolist())) for w in range(compiled.num_wires)]
+
+    def random_inputs(self, num_words: int, rng: np.random.Generator) -> np.ndarray:
+        """Random packed input vectors, shape (num_inputs, num_words)."""
+        return rng.integers(0, np.iinfo(np.uint64).max, size=(len(self.input_wires), num_words), dtype=np.uint64, endpoint=True)
+
+    def evaluate(self, input_words: np.ndarray) -> np.ndarray:
+        """Golden value of every wire, shape (num_wires, num_words)."""
+        values = np.zeros((len(self.wire_names), input_words.shape[1]), dtype=np.uint64)
+        values[self.input_wires] = input_words
+        for gate_idx, inputs in enumerate(self.gate_inputs):
+            values[self.gate_output[gate_idx]] = self.gate_functions[gate_idx](*values[inputs])
+        return values
+
+    def fanout_cone(self, site: int) -> List[int]:
+        """Gates in the transitive fanout of a wire, in evaluation order."""
+        seen = set()
+        stack = list(self.fanout[site])
+        while stack:
+            gate_idx = stack.pop()
+            if gate_idx in seen:
+                continue
+            seen.add(gate_idx)
+            stack.extend(self.fanout[self.gate_output[gate_idx]])
+        return sorted(seen)
+
+    def observed_mask(self, golden: np.ndarray, site: int) -> np.ndarray:
+        """Bitmask (per vector) of where inverting `site` changes at least one primary output."""
+        faulty: Dict[int, np.ndarray] = {site: ~golden[site]}
+        for gate_idx in self.fanout_cone(site):
+            args = [faulty[w] if w in faulty else golden[w] for w in self.gate_inputs[gate_idx]]
+            faulty[self.gate_output[gate_idx]] = self.gate_functions[gate_idx](*args)
+        observed = np.zeros(golden.shape[1], dtype=np.uint64)
+        for wire_idx in self.output_wires:
+            if wire_idx in faulty:
+                observed |= faulty[wire_idx] ^ golden[wire_idx]
+        return observed
+
+def logic_masking_probabilities(netlist: Netlist, num_vectors: int = 4096, seed: int = 42, evaluator: Optional[BitParallelEvaluator] = None,
+                                sites: Optional[List[int]] = None) -> Dict[str, float]:
+    """
+    Probability, per candidate fault site (or per wire index in sites), that inverting the
+    wire has no effect on any primary output for a uniformly random input vector (zero-delay).
+    """
+    evaluator = evaluator if evaluator is not None else BitParallelEvaluator(netlist)
+    rng = np.random.default_rng(seed)
+    num_words = max(1, -(-num_vectors // WORD_BITS))
+    golden = evaluator.evaluate(evaluator.random_inputs(num_words, rng))
+    # ignore the unused tail bits of the last word
+    valid = np.full(num_words, np.iinfo(np.uint64).max, dtype=np.uint64)
+    tail = num_vectors - (num_words - 1) * WORD_BITS
+    if tail < WORD_BITS:
+        valid[-1] = np.uint64((1 << tail) - 1)
+    total = min(num_vectors, num_words * WORD_BITS)
+
+    probabilities: Dict[str, float] = {}
+    for site in (sites if sites is not None else evaluator.fault_sites):
+        observed = popcount(evaluator.observed_mask(golden, site) & valid)
+        probabilities[evaluator.wire_names[site]] = 1.0 - observed / total
+    return probabilities
+
+def logic_masking_counts(probabilities: Dict[str, float], num_faults: int) -> FaultCounts:
+    """
+    Expected logic-masked count for a campaign of num_faults trials that samples fault
+    sites uniformly, as the generated testbench does. Only masked_logic is filled in.
+    """
+    mean = sum(probabilities.values()) / len(probabilities) if probabilities else 0.0
+    return FaultCounts(masked_logic=int(round(mean * num_faults)), num_faults=num_faults)
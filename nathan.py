@@ -1,9 +1,24 @@
 import argparse
+import cProfile
+import functools
 from nathan_parser import Netlist, parse_netlist
+from netlist_cache import load_netlists
+from sdf_parser import load_sdf
 import os
 import numpy as np
-from analyze_faults import analyze_faults
-from nathan_types import TimingInfo
+from typing import Optional
+from analyze_faults import analyze_faults, analyze_faults_sequential, analyze_faults_stratified, analyze_logic_masking, benchmark_monitors, \
+    analyze_timing_window, BACKENDS, DEFAULT_BATCH_SIZE
+from simulators import SIMULATORS, GATE_LIB, use_gate_library
+from site_sampling import FEATURES, ALLOCATIONS, IMPORTANCE_FEATURES
+from gen_testbench import MONITOR_STYLES
+from nathan_types import TimingInfo, PULSE_WIDTH_MEAN_NS, PULSE_WIDTH_SIGMA_NS
+from batch_campaign import BatchDesign, read_manifest, parse_designs, run_batch, results_table, write_results, \
+    BATCH_DIR, BATCH_RESULTS_FILE
+from parameter_sweep import SWEEP_PARAMETERS, SWEEP_DIR, SWEEP_RESULTS_FILE, parse_values, sweep_entries, sweep_designs
+from checkpoint import CampaignCheckpoint, CHECKPOINT_FILE
+from fault_sampling import DEFAULT_SEED
+import profiling
 
 DESCRIPTION_STR = \
 """
@@ -16,12 +31,58 @@ outputs and the rates of masking due to timing and the structure of the module \
 itself.
 """
 
+# arguments taken from the command line of a --resume run, all others from the checkpoint
+RESUME_ARGS = ["resume", "no_cache", "profile", "cprofile"]
+
 def validate_args(args) -> bool:
-    # validate module netlist file exists
-    if not os.path.exists(args.module):
+    # validate module netlist file (or batch manifest) exists
+    if (args.module is None) == (args.manifest is None):
+        print("Invalid arguments: give either --module or --manifest")
+        return False
+
+    if args.module is not None and not os.path.exists(args.module):
         print("Invalid argument to --module: file not found")
         return False
 
+    if args.manifest is not None and not os.path.exists(args.manifest):
+        print("Invalid argument to --manifest: file not found")
+        return False
+
+    # given on the command line, or restored from the checkpoint by --resume;
+    # for a --manifest the timing is only the default of empty columns (see read_manifest)
+    required = ["num_faults"] if args.manifest is not None else ["num_faults", "period", "setup_time", "hold_time"]
+    for name in required:
+        if getattr(args, name) is None:
+            print(f"Invalid arguments: --{name} is required")
+            return False
+
+    if args.gate_library is not None and not os.path.exists(args.gate_library):
+        print("Invalid argument to --gate_library: file not found")
+        return False
+
+    if args.workers < 1:
+        print("Invalid argument to --workers: must be a positive integer")
+        return False
+
+    # timing and pulse widths: one value, or several for a sweep
+    for name in SWEEP_PARAMETERS:
+        if getattr(args, name) is None:
+            continue
+        try:
+            values = parse_values(getattr(args, name))
+        except ValueError as e:
+            print(f"Invalid argument to --{name}: {e}")
+            return False
+        if min(values) < 0 or (name == "period" and min(values) <= 0):
+            print(f"Invalid argument to --{name}: must be a positive time in ns")
+            return False
+        if len(values) > 1 and args.manifest is not None:
+            print(f"Invalid argument to --{name}: a --manifest batch takes a single value, give the others per manifest row")
+            return False
+        if len(values) > 1 and args.checkpoint is not None:
+            print(f"Invalid argument to --{name}: a --checkpoint campaign takes a single value")
+            return False
+
     # validate number of faults
     try:
         int(args.num_faults)
@@ -33,41 +94,239 @@ def validate_args(args) -> bool:
         print("Invalid argument to --num_faults: must be a positive integer")
         return False
 
+    if args.jobs < 1:
+        print("Invalid argument to --jobs: must be a positive integer")
+        return False
+
+    if args.precision is not None and not 0 < args.precision < 100:
+        print("Invalid argument to --precision: must be a percentage between 0 and 100")
+        return False
+
+    if not 0 < args.confidence < 100:
+        print("Invalid argument to --confidence: must be a percentage between 0 and 100")
+        return False
+
+    if args.batch < 1:
+        print("Invalid argument to --batch: must be a positive integer")
+        return False
+
+    if args.stratify is not None:
+        for feature in args.stratify.split(","):
+            if feature not in FEATURES:
+                print(f"Invalid argument to --stratify: {feature} is not one of {', '.join(FEATURES)}")
+                return False
+
+    if args.instances < 1:
+        print("Invalid argument to --instances: must be a positive integer")
+        return False
+
+    if args.benchmark_monitors and args.backend not in SIMULATORS:
+        print(f"Invalid argument to --backend: --benchmark_monitors needs a compiled testbench ({', '.join(SIMULATORS)})")
+        return False
+
+    if args.start_bins < 1:
+        print("Invalid argument to --start_bins: must be a positive integer")
+        return False
+
+    if args.checkpoint is not None:
+        if args.manifest is not None or args.stratify is not None or args.importance is not None or args.logic_masking \
+                or args.timing_window or args.benchmark_monitors:
+            print("Invalid argument to --checkpoint: only plain and --precision campaigns are checkpointed")
+            return False
+        if args.resume is None and os.path.exists(os.path.join(args.checkpoint, CHECKPOINT_FILE)):
+            print(f"Invalid argument to --checkpoint: {args.checkpoint} already holds a campaign, continue it with --resume {args.checkpoint}")
+            return False
+
     return True
 
+def run_module(args, netlist: Netlist, sdf, log_dir: Optional[str] = None, checkpoint: Optional[CampaignCheckpoint] = None):
+    """Run the analysis selected by args on one module and return its result (counts or rates)."""
+    timing_info = TimingInfo(float(args.period), float(args.setup_time), float(args.hold_time), float(args.pulse_mean),
+                             float(args.pulse_sigma))
+    if sdf is not None:
+        with profiling.stage("attach_sdf"):
+            netlist.attach_sdf(sdf)
+    if args.logic_masking:
+        return analyze_logic_masking(netlist, int(args.num_faults), args.logic_masking, args.collapse)
+    if args.timing_window:
+        return analyze_timing_window(netlist, timing_info, int(args.num_faults), args.sdf)
+    if args.benchmark_monitors:
+        return benchmark_monitors(netlist, timing_info, int(args.num_faults), args.sdf, instances=args.instances, log_dir=log_dir,
+                                  simulator=args.backend)
+    if args.stratify is not None or args.importance is not None:
+        features = args.stratify.split(",") if args.stratify else []
+        return analyze_faults_stratified(netlist, timing_info, int(args.num_faults), args.sdf, features, args.allocation, args.importance,
+                                         args.backend, args.prescreen, args.jobs, args.monitor, start_bins=args.start_bins,
+                                         instances=args.instances, log_dir=log_dir)
+    if args.precision is not None or checkpoint is not None:
+        precision = args.precision / 100 if args.precision is not None else None
+        return analyze_faults_sequential(netlist, timing_info, int(args.num_faults), args.sdf, precision, args.confidence / 100,
+                                         args.batch, args.backend, args.prescreen, args.jobs, args.monitor, args.collapse, args.instances,
+                                         log_dir, checkpoint)
+    return analyze_faults(netlist, timing_info, int(args.num_faults), args.sdf, args.backend, args.prescreen, args.jobs, args.monitor,
+                          collapse=args.collapse, instances=args.instances, log_dir=log_dir)
+
+def run_design(args, design: BatchDesign):
+    """run_module on one design of a batch or sweep, with the SDF, timing and pulse widths of its entry."""
+    entry = design.entry
+    design_args = argparse.Namespace(**vars(args))
+    design_args.module = entry.netlist_filename
+    design_args.sdf = entry.sdf_filename
+    design_args.period, design_args.setup_time, design_args.hold_time = entry.period, entry.setup_time, entry.hold_time
+    design_args.pulse_mean, design_args.pulse_sigma = entry.pulse_mean, entry.pulse_sigma
+    return run_module(design_args, design.netlist, design.sdf, design.work_dir)
+
 def main():
     parser = argparse.ArgumentParser(prog="NATHAN", description=DESCRIPTION_STR)
-    parser.add_argument('-m', '--module', metavar='FILE', required=True,
-                        help='Specify the input netlist')
-    parser.add_argument('-n', '--num_faults', metavar='NUM', required=True,
+    parser.add_argument('-m', '--module', metavar='FILE', required=False,
+                        help='Specify the input netlist, every module of it is analyzed')
+    parser.add_argument('--manifest', metavar='FILE', required=False,
+                        help='Run a batch of campaigns over the netlists listed in a CSV manifest (netlist,sdf,period,setup_time,hold_time,pulse_mean,pulse_sigma) instead of --module')
+    parser.add_argument('-w', '--workers', metavar='N', required=False, type=int, default=os.cpu_count() or 1,
+                        help='Specify the number of processes a batch parses and runs its designs on, defaults to the number of cores')
+    parser.add_argument('-n', '--num_faults', metavar='NUM', required=False,
                         help='Specify the number of faults to inject')
     parser.add_argument('-l', '--gate_library', metavar='LIB', required=False,
-                        help='Specify the gate library to use for parsing and simulation')
+                        help=f'Specify the Verilog gate library the compiled testbench is built with, defaults to {GATE_LIB}')
     parser.add_argument('-s', '--sdf', metavar='FILE', required=False,
                         help='Specify module timing information in Standard Data Format (SDF)')
-    parser.add_argument('-p', '--period', metavar='PERIOD', required=True,
-                        help='Specify the clock period in nanoseconds (ns)')
-    parser.add_argument('-st', '--setup_time', metavar='TIME', required=True,
-                        help='Specify the register setup time in nanoseconds (ns)')
-    parser.add_argument('-ht', '--hold_time', metavar='TIME', required=True,
-                        help='Specify the register hold time in nanoseconds (ns)')
-    
-    # arg: gaussian distribution (u, o2) params
-    
+    parser.add_argument('-p', '--period', metavar='PERIOD', required=False,
+                        help='Specify the clock period in nanoseconds (ns), several values sweep it')
+    parser.add_argument('-st', '--setup_time', metavar='TIME', required=False,
+                        help='Specify the register setup time in nanoseconds (ns), several values sweep it')
+    parser.add_argument('-ht', '--hold_time', metavar='TIME', required=False,
+                        help='Specify the register hold time in nanoseconds (ns), several values sweep it')
+    parser.add_argument('--pulse_mean', metavar='TIME', required=False, default=str(PULSE_WIDTH_MEAN_NS),
+                        help=f'Specify the mean width of the injected pulses in nanoseconds (ns), defaults to {PULSE_WIDTH_MEAN_NS}')
+    parser.add_argument('--pulse_sigma', metavar='TIME', required=False, default=str(PULSE_WIDTH_SIGMA_NS),
+                        help=f'Specify the standard deviation of the pulse width in nanoseconds (ns), defaults to {PULSE_WIDTH_SIGMA_NS}')
+    parser.add_argument('-b', '--backend', metavar='BACKEND', required=False, default='vcs', choices=BACKENDS,
+                        help=f'Specify the simulation backend ({", ".join(BACKENDS)}), defaults to vcs')
+    parser.add_argument('-ps', '--prescreen', action='store_true', required=False,
+                        help='Skip simulating faults that SDF path delays prove logic-masked (no path to an output, or arriving after the setup/hold window)')
+    parser.add_argument('-j', '--jobs', metavar='N', required=False, type=int, default=1,
+                        help='Split the campaign into N shards with distinct seeds and run them in parallel, defaults to 1')
+    parser.add_argument('-pr', '--precision', metavar='PCT', required=False, type=float,
+                        help='Run batches until every outcome rate is known to within +/- PCT percent, with -n as the maximum number of faults')
+    parser.add_argument('--confidence', metavar='PCT', required=False, type=float, default=95,
+                        help='Specify the confidence level of the --precision intervals in percent, defaults to 95')
+    parser.add_argument('--batch', metavar='NUM', required=False, type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Specify the number of faults per --precision or --checkpoint batch, defaults to {DEFAULT_BATCH_SIZE}')
+    parser.add_argument('--stratify', metavar='FEATURES', required=False,
+                        help=f'Sample fault sites stratified by comma-separated features ({", ".join(FEATURES)}) and report weighted rates')
+    parser.add_argument('--start_bins', metavar='NUM', required=False, type=int, default=1,
+                        help='Also stratify --stratify campaigns by fault start time into NUM bins, defaults to 1')
+    parser.add_argument('--allocation', metavar='RULE', required=False, default='proportional', choices=ALLOCATIONS,
+                        help=f'Specify how --stratify trials are shared between strata ({", ".join(ALLOCATIONS)}), defaults to proportional')
+    parser.add_argument('--importance', metavar='FEATURE', required=False, choices=IMPORTANCE_FEATURES,
+                        help=f'Within each stratum, draw sites in proportion to 1 + FEATURE / mean ({", ".join(IMPORTANCE_FEATURES)})')
+    parser.add_argument('--collapse', action='store_true', required=False,
+                        help='Move every fault to the representative of its inverter/buffer chain, so only representatives are simulated')
+    parser.add_argument('--monitor', metavar='STYLE', required=False, default='event', choices=MONITOR_STYLES,
+                        help=f'Specify how the compiled testbench watches the outputs ({", ".join(MONITOR_STYLES)}), defaults to event')
+    parser.add_argument('-k', '--instances', metavar='K', required=False, type=int, default=1,
+                        help='Simulate K faulty copies of the module against one golden copy in the compiled testbench, each with its own fault per cycle, defaults to 1')
+    parser.add_argument('-bm', '--benchmark_monitors', action='store_true', required=False,
+                        help='Only report compiled-testbench faults/sec with each monitor style on the same trials')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', required=False,
+                        help='Always parse the netlist and SDF instead of loading them from the on-disk caches')
+    parser.add_argument('--profile', metavar='FILE', required=False,
+                        help='Write a JSON report of per-stage wall/CPU time, peak memory, netlist statistics and faults/sec to FILE')
+    parser.add_argument('--cprofile', metavar='FILE', required=False,
+                        help='Also dump cProfile statistics of the Python stages to FILE (read with python -m pstats FILE)')
+    parser.add_argument('-lm', '--logic_masking', metavar='VECTORS', required=False, type=int,
+                        help='Only estimate per-wire logic masking with a zero-delay bit-parallel evaluation of VECTORS random inputs')
+    parser.add_argument('-tw', '--timing_window', action='store_true', required=False,
+                        help='Only bound per-wire and overall rates from SDF path delays and the setup/hold windows, vectorized over -n random pulses')
+    parser.add_argument('--checkpoint', metavar='DIR', required=False,
+                        help='Run the campaign in --batch batches and record the settings, finished batches and their counters in DIR after each one')
+    parser.add_argument('--resume', metavar='DIR', required=False,
+                        help='Continue the --checkpoint campaign in DIR after its last finished batch, with the settings it was started with')
+
     # parser.add_argument('-v', '--verbose', action='store_true', required=False,
     #                     help='Do not suppress additional output')
     # TRUERANDOM vs seed option - https://www.doulos.com/media/1293/snug2013_sv_random_stability_paper.pdf
 
     args = parser.parse_args()
+    checkpoint = None
+    if args.resume is not None:
+        try:
+            checkpoint = CampaignCheckpoint.load(args.resume)
+        except ValueError as e:
+            print(f"Invalid argument to --resume: {e}")
+            return
+        changed = checkpoint.changed_inputs()
+        if changed:
+            print(f"Invalid argument to --resume: {', '.join(changed)} changed since the campaign started")
+            return
+        args = argparse.Namespace(**{**checkpoint.settings, **{name: getattr(args, name) for name in RESUME_ARGS}, "checkpoint": args.resume})
     if not validate_args(args):
         parser.print_help()
         return
 
-    netlists = parse_netlist(args.module)
-    assert len(netlists) == 1 # TODO: remove this? not sure.
-    for module_name, netlist in netlists:
-        timing_info = TimingInfo(float(args.period), float(args.setup_time), float(args.hold_time))
-        analyze_faults(netlist, timing_info, int(args.num_faults), args.sdf)
+    if args.gate_library is not None:
+        use_gate_library(args.gate_library)
+
+    profiler = profiling.start() if args.profile else None
+    python_profile = cProfile.Profile() if args.cprofile else None
+    if python_profile is not None:
+        python_profile.enable()
+
+    if args.manifest is not None:
+        try:
+            defaults = [float(value) if value is not None else None
+                        for value in (args.period, args.setup_time, args.hold_time, args.pulse_mean, args.pulse_sigma)]
+            entries = read_manifest(args.manifest, args.sdf, *defaults)
+        except ValueError as e:
+            print(f"Invalid argument to --manifest: {e}")
+            return
+        with profiling.stage("parse_designs"):
+            designs = parse_designs(entries, args.workers, use_cache=not args.no_cache)
+    else:
+        with profiling.stage("parse_netlist"):
+            netlists = load_netlists(args.module, use_cache=not args.no_cache)
+        # read once here, later lookups of the same file in this run reuse it
+        with profiling.stage("load_sdf"):
+            sdf = load_sdf(args.sdf, use_cache=not args.no_cache) if args.sdf else None
+        grid = {name: parse_values(getattr(args, name)) for name in SWEEP_PARAMETERS}
+        entries = sweep_entries(args.module, args.sdf, grid)
+        designs = sweep_designs([netlist for (module_name, netlist) in netlists], sdf, entries,
+                                SWEEP_DIR if len(entries) > 1 else BATCH_DIR)
+    sweep = args.manifest is None and len(entries) > 1
+
+    if args.checkpoint is not None and checkpoint is None:
+        if len(designs) != 1:
+            print("Invalid argument to --checkpoint: the netlist has several modules, a checkpoint holds one campaign")
+            return
+        settings = {name: value for (name, value) in vars(args).items() if name not in RESUME_ARGS}
+        checkpoint = CampaignCheckpoint.create(args.checkpoint, settings, DEFAULT_SEED, int(args.num_faults),
+                                               [args.module, *([args.sdf] if args.sdf else [])])
+    elif checkpoint is not None:
+        print(checkpoint.progress())
+
+    if args.manifest is None and len(designs) == 1:
+        with profiling.stage("campaign"):
+            run_module(args, designs[0].netlist, designs[0].sdf, checkpoint=checkpoint)
+    else:
+        # several designs or grid points: campaigns run side by side, then one combined table
+        with profiling.stage("sweep" if sweep else "batch"):
+            results = run_batch(designs, functools.partial(run_design, args), args.workers, quiet=sweep)
+        results_file = SWEEP_RESULTS_FILE if sweep else BATCH_RESULTS_FILE
+        print(results_table(results, "sweep results" if sweep else "batch results"))
+        write_results(results, results_file)
+        print(f"{'Sweep' if sweep else 'Batch'} results written to {results_file}")
+    if profiler is not None:
+        for design in designs:
+            profiler.add_netlist(design.netlist)
+
+    if python_profile is not None:
+        python_profile.disable()
+        profiling.dump_python_profile(python_profile, args.cprofile)
+        print(f"cProfile statistics written to {args.cprofile}")
+    if profiler is not None:
+        print(profiler.summary())
+        profiler.write(args.profile)
+        print(f"Profile written to {args.profile}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,14 +1,17 @@
 import argparse
+import re
+import time
 from pyverilog.vparser.parser import parse
 from pyverilog.ast_code_generator.codegen import ASTCodeGenerator
-from sdf import get_delays
 # Parse Verilog file
 import pyverilog.vparser.ast as ast
 from pyverilog.vparser.ast import *
 from pyverilog.dataflow.visit import NodeVisitor
 
 from typing import List, Dict, Optional, Tuple
-from queue import LifoQueue
+
+# bump whenever parsing changes what ends up in a Netlist, so cached netlists are re-parsed
+PARSER_VERSION = 2
 
 class GraphWire:
     """Represents a wire in the netlist, with connections to driving/driven gates."""
@@ -21,6 +24,7 @@ class GraphWire:
         self.width = 0
         self.output_distance: int = 0  # Distance to the output wire (for delay calculation)
         self.output_delay: int = 0     # Delay to the output wire (for delay calculation)
+        self.sdf_interconnects: Dict[Tuple[str, str], tuple] = {}  # (load gate, pin) -> (rise, fall) INTERCONNECT delay, see Netlist.attach_sdf
 
     def __repr__(self):
         return f"Wire({self.name}, driver={self.driver.name if self.driver else None}, loads={[g.name for g in self.loads]}, is_input={self.is_input}, is_output={self.is_output}, distance={self.output_distance}, width={self.width})"
@@ -34,15 +38,8 @@ class GraphWire:
             return
 
     def add_load(self, gate) -> None:
-        """Add a gate as a load for this wire."""
-        if gate not in self.loads:
-            self.loads.append(gate)
-        else:
-            # TODO: This can happen if the same gate has this wire as an input multiple times, so check to avoid displaying this
-            # ex:   oai322s1 U670 ( .DIN1(n380), .DIN2(n382), .DIN3(n381), .DIN4(n382),
-            #                       .DIN5(n379), .DIN6(n318), .DIN7(n317), .Q(n384) ); from 64 bit adder
-            print(f"Warning: Wire {self.name} already has load {gate.name}, skipping duplicate addition ({[g.name for g in self.loads]}).")
-            return
+        """Add a gate as a load for this wire (once per gate, see Netlist.connect_gate)."""
+        self.loads.append(gate)
 
 class GraphGate:
     """Represents a gate instance in the netlist."""
@@ -50,6 +47,7 @@ class GraphGate:
         def __init__(self):
             super().__init__()
             self.inputs: List[str] = []  # List of input wire names
+            self.input_pins: List[str] = []  # Port name for each input wire (e.g., "DIN1")
             self.output: Optional[str] = None  # Output wire name
 
         def process_argname(self, argname):
@@ -76,6 +74,7 @@ class GraphGate:
             else:
                 # input port
                 self.inputs.append(self.process_argname(node.argname))
+                self.input_pins.append(node.portname)
             return (self.inputs, self.output)
 
 
@@ -84,17 +83,35 @@ class GraphGate:
         self.gate_type: str = gate_instance.module  # Gate type (e.g., "xor2s2")
         self.delay: int = delay          # Propagation delay (default 1)
         self.inputs: List[GraphWire] = []      # Input wires
+        self.input_pins: List[str] = []        # Port name of each input wire, same order as inputs
         self.output: Optional[GraphWire] = None # Output wire
 
         self.output_distance: int = 0  # Distance to the output wire (for delay calculation)
         self.output_delay: int = 0     # Delay to the output wire (for delay calculation)
+        self.sdf_arcs: list = []       # IOPATH arcs (sdf_parser.IopathArc), see Netlist.attach_sdf
 
         # process the portlist to get input/output wires
         visitor = self.GateVisitor()
         visitor.visit(gate_instance)
         self.inputs = [wires[s] for s in visitor.inputs if s]
+        self.input_pins = [p for (s, p) in zip(visitor.inputs, visitor.input_pins) if s]
         self.output = wires[visitor.output] if visitor.output else None
 
+    @classmethod
+    def from_ports(cls, name: str, gate_type: str, inputs: List[GraphWire], input_pins: List[str], output: Optional[GraphWire]) -> "GraphGate":
+        """Build a gate from already resolved connections (no AST), e.g. when loading a cached netlist."""
+        gate = cls.__new__(cls)
+        gate.name = name
+        gate.gate_type = gate_type
+        gate.delay = 1
+        gate.inputs = inputs
+        gate.input_pins = input_pins
+        gate.output = output
+        gate.output_distance = 0
+        gate.output_delay = 0
+        gate.sdf_arcs = []
+        return gate
+
     def __repr__(self):
         return f"""Gate({self.name}, type={self.gate_type}, inputs={[w.name for w in self.inputs]}, output={self.output.name if self.output else None})"""
 
@@ -109,6 +126,8 @@ class Netlist:
         self.outputs: List[Tuple[str, int]] = [] # signal name, width
         self.wires: Dict[str, GraphWire] = {}  # name -> Wire
         self.gates: Dict[str, GraphGate] = {}  # name -> Gate
+        self.compiled = None  # CompiledNetlist, built on first use by compiled_netlist.compile_netlist
+        self.sdf = None       # SdfData, set by attach_sdf
 
 
     def add_wire(self, wire: GraphWire) -> None:
@@ -155,44 +174,77 @@ class Netlist:
         # output wire (0) -> driving gate -> input wires (1) -> driving gates -> input wires (2) -> driving gate (3)
         return
 
-    def calculate_delays(self, output_wires: List[GraphWire], sdf_filepath = None) -> None:
-        """Calculate the delays from output wires to input wires."""
-        sdf_obj = None
-        if sdf_filepath is not None:
-            sdf_obj = get_delays(sdf_filepath)
-            # make sdf a bit nicer, get the dict of each cell by name
-            print(sdf_obj)
-
-        stack = LifoQueue()
-        for wire in output_wires:
-            stack.put((wire, None))  # push the output wire and None as the previous gate
-
-        # if sdf file, use that to parse and calc delays
-
-        # max output delay to a wire/gate is the max of the current and the gate we came from's delay (plus one if we're a gate)
-        while not stack.empty():
-            # stack tuple holds a pair of (wire, gate that takes wire as input) so (wire, load_gate)
-            t: Tuple[GraphWire, GraphGate] = stack.get()
-            wire, load_gate = t
-            # load_gate being None means its an output wire, and thus has distance 0
-            if load_gate is not None:
-                wire.output_distance = max(wire.output_distance, load_gate.output_distance + 1)
-                wire.output_delay = max(wire.output_delay, load_gate.output_delay) # don't add, because gates come with own delay
-                # gate loading this wire should have
-
-            driving_gate = None
-            if wire.driver:
-                # process gate driving this wire, should only ever happen once per gate BUT JUST IN CASE
-                driving_gate = wire.driver
-                driving_gate.output_distance = max(wire.output_distance, driving_gate.output_distance)
-                # delay is max of wire output delay + self delay, max is just for sanity, should only get set once
-                driving_gate.output_delay = max(wire.output_delay + driving_gate.delay, driving_gate.output_delay)
-
-            if driving_gate:
-                # add this gate with all its loads to the stack
-                for input_wire in driving_gate.inputs:
-                    stack.put((input_wire, driving_gate))
+    def levelize(self) -> List[List[GraphGate]]:
+        """
+        Group gates into levels: level 0 gates only read primary inputs (or undriven wires),
+        and every other gate is one level above the deepest driver of its inputs.
+        Raises ValueError on combinational loops.
+        """
+        gate_level: Dict[str, int] = {}
+        pending: Dict[str, int] = {}
+        ready: List[GraphGate] = []
+        for gate in self.gates.values():
+            pending[gate.name] = sum(1 for w in gate.inputs if w.driver is not None)
+            gate_level[gate.name] = 0
+            if pending[gate.name] == 0:
+                ready.append(gate)
+        levels: List[List[GraphGate]] = []
+        num_levelized = 0
+        while ready:
+            gate = ready.pop()
+            level = gate_level[gate.name]
+            while len(levels) <= level:
+                levels.append([])
+            levels[level].append(gate)
+            num_levelized += 1
+            if gate.output is None:
+                continue
+            for load in gate.output.loads:
+                # a load may read the same wire on several pins
+                pending[load.name] -= sum(1 for w in load.inputs if w is gate.output)
+                gate_level[load.name] = max(gate_level[load.name], level + 1)
+                if pending[load.name] == 0:
+                    ready.append(load)
+        if num_levelized != len(self.gates):
+            raise ValueError(f"Netlist {self.name} has a combinational loop")
+        return levels
 
+    def calculate_delays(self, output_wires: List[GraphWire], sdf_filepath = None) -> None:
+        """
+        Calculate the delays from every wire/gate to the output wires, filling in output_delay
+        (longest delay, in ps with an SDF and in gate delays without one) and output_distance.
+        """
+        # imported here, timing_engine builds on this module
+        from timing_engine import analyze_timing
+        if set(w.name for w in output_wires) != set(w.name for w in self.wires.values() if w.is_output):
+            print("Warning: calculate_delays measures delays to all primary outputs of the netlist")
+        analysis = analyze_timing(self, sdf_filepath)
+        analysis.annotate()
+
+    def attach_sdf(self, sdf) -> None:
+        """
+        Attach SDF delays (sdf_parser.SdfData) to the graph: every gate gets its IOPATH arcs in
+        sdf_arcs, and every wire the INTERCONNECT delays to each of its load pins in sdf_interconnects.
+        """
+        self.sdf = sdf
+        for gate in self.gates.values():
+            gate.sdf_arcs = sdf.get_arcs(gate.name)
+        for wire in self.wires.values():
+            if wire.driver is not None:
+                src = f"{wire.driver.name}/Q"
+            elif wire.width > 1:
+                # port bus bit, named as in the netlist (A_3 -> A[3])
+                netname, netidx = wire.name.rsplit('_', 1)
+                src = f"{netname}[{netidx}]"
+            else:
+                src = wire.name
+            wire.sdf_interconnects = {}
+            for load in wire.loads:
+                for (input_wire, pin) in zip(load.inputs, load.input_pins):
+                    if input_wire is wire:
+                        rise, fall = sdf.get_interconnect(src, f"{load.name}/{pin}")
+                        if rise is not None or fall is not None:
+                            wire.sdf_interconnects[(load.name, pin)] = (rise, fall)
 
     def _parse_decl(self, decl):
         """Parse a declaration (input, output, wire) and create corresponding GraphWire."""
@@ -212,16 +264,19 @@ class Netlist:
         if decl.width is not None:
             width: Width = decl.width
             width_val = int(width.msb.value) - int(width.lsb.value) + 1
+        self.declare(decl.name, width_val, is_input, is_output)
 
+    def declare(self, decl_name: str, width_val: int, is_input: bool, is_output: bool) -> None:
+        """Record a port/wire declaration, with one GraphWire per bit (bit i of bus A is "A_i")."""
         if is_input:
             # add (name, width)
-            self.inputs.append((decl.name, width_val))
+            self.inputs.append((decl_name, width_val))
         if is_output:
-            self.outputs.append((decl.name, width_val))
+            self.outputs.append((decl_name, width_val))
         # create a wire for each bit in the declaration
         for i in range(width_val):
             # create a wire for the graph
-            name = decl.name if width_val == 1 else f"{decl.name}_{i}"
+            name = decl_name if width_val == 1 else f"{decl_name}_{i}"
             wire = GraphWire(name, is_input=is_input, is_output=is_output)
             wire.width = width_val
             self.add_wire(wire)
@@ -230,10 +285,17 @@ class Netlist:
         """Parse an instance of a gate and create a corresponding GraphGate."""
         # create a gate instance
         gate = GraphGate(gate_inst, self.wires)
+        self.connect_gate(gate)
+        return gate
+
+    def connect_gate(self, gate: GraphGate) -> None:
+        """Add a gate and link it to the wires it reads and drives."""
         # gate has references to all wires it connects to, both loads and drive
         self.add_gate(gate)
-        # connect the gate to the input wires that drives it
-        for input_wire in gate.inputs:
+        # connect the gate to the input wires that drives it, once per wire: a gate can read a wire on several pins
+        # ex:   oai322s1 U670 ( .DIN1(n380), .DIN2(n382), .DIN3(n381), .DIN4(n382),
+        #                       .DIN5(n379), .DIN6(n318), .DIN7(n317), .Q(n384) ); from 64 bit adder
+        for input_wire in dict.fromkeys(gate.inputs):
             # store reference to the gate in the input wire
             input_wire.add_load(gate)
         # connect the gate to the output wire it drives
@@ -242,7 +304,6 @@ class Netlist:
             gate.output.add_driver(gate)
         else:
             print(f"Warning: Gate {gate.name} has no output wire")
-        return gate
 
 
 
@@ -266,17 +327,211 @@ class NetListVisitor(NodeVisitor):
         self.module_netlists[node.name] = netlist
         return
 
-def parse_netlist(netlist_filename: str):
+##################################################
+#           STREAMING GATE-LEVEL READER          #
+##################################################
+
+class UnsupportedConstruct(Exception):
+    """Raised by VgReader on Verilog outside the flat gate-level subset."""
+
+# whitespace, line comment, block comment start, token (escaped identifier, identifier, number, punctuation), anything else
+_VG_TOKEN = re.compile(r"\s+|//.*|/\*|(\\\S+|[A-Za-z_][A-Za-z0-9_$]*|\d+|[()\[\],;:.])|(.)")
+
+# keywords that can start a statement outside the subset (anything else starting a statement is a cell type)
+_VG_UNSUPPORTED = {"assign", "reg", "inout", "supply0", "supply1", "tri", "wand", "wor", "parameter", "localparam",
+                   "defparam", "always", "initial", "function", "task", "generate", "specify", "integer", "real",
+                   "genvar", "primitive", "and", "or", "nand", "nor", "xor", "xnor", "not", "buf", "bufif0",
+                   "bufif1", "notif0", "notif1", "module", "input", "output", "wire"}
+_VG_PUNCTUATION = {"(", ")", "[", "]", ",", ";", ":", "."}
+
+class VgReader:
+    """
+    Streaming reader for synthesized gate-level netlists: module headers, input/output/wire
+    declarations (optionally [msb:lsb] buses) and cell instances with named port connections
+    to nets or bus bits. Statements are built from a line-by-line token stream and added to
+    the Netlist as soon as they end, so the whole file is never held as an AST.
+    Raises UnsupportedConstruct on anything else (parse_netlist then falls back to pyverilog).
+    """
+    def __init__(self, netlist_filename: str):
+        self.netlist_filename = netlist_filename
+        self.module_netlists: Dict[str, Netlist] = {}  # module name -> Netlist
+
+    def tokens(self, f):
+        """(token, line number) pairs, skipping whitespace and comments."""
+        in_comment = False
+        for line_no, line in enumerate(f, 1):
+            pos = 0
+            if in_comment:
+                pos = line.find("*/")
+                if pos < 0:
+                    continue
+                pos += 2
+                in_comment = False
+            while pos < len(line):
+                match = _VG_TOKEN.match(line, pos)
+                pos = match.end()
+                if match.group(1):
+                    yield match.group(1), line_no
+                elif match.group(2):
+                    raise UnsupportedConstruct(f"line {line_no}: unexpected {match.group(2)!r}")
+                elif match.group(0) == "/*":
+                    pos = line.find("*/", pos)
+                    if pos < 0:
+                        in_comment = True
+                        break
+                    pos += 2
+
+    def read(self) -> Dict[str, Netlist]:
+        netlist: Optional[Netlist] = None
+        statement: List[str] = []
+        with open(self.netlist_filename, "r") as f:
+            for token, line_no in self.tokens(f):
+                if token == "endmodule" and not statement:
+                    if netlist is None:
+                        raise UnsupportedConstruct(f"line {line_no}: endmodule outside a module")
+                    self.module_netlists[netlist.name] = netlist
+                    netlist = None
+                    continue
+                statement.append(token)
+                if token == ";":
+                    netlist = self._statement(statement, netlist, line_no)
+                    statement = []
+        if statement or netlist is not None:
+            raise UnsupportedConstruct("unexpected end of file")
+        return self.module_netlists
+
+    def _statement(self, tokens: List[str], netlist: Optional[Netlist], line_no: int) -> Optional[Netlist]:
+        head = tokens[0]
+        if head == "module":
+            if netlist is not None or len(tokens) < 3:
+                raise UnsupportedConstruct(f"line {line_no}: unexpected module declaration")
+            # the port list only repeats names that input/output declare (ANSI ports are not supported)
+            if any(t in ("input", "output", "inout", "#") for t in tokens):
+                raise UnsupportedConstruct(f"line {line_no}: ANSI or parameterized module header")
+            netlist = Netlist()
+            netlist.name = tokens[1]
+            netlist.filepath = self.netlist_filename
+            return netlist
+        if netlist is None:
+            raise UnsupportedConstruct(f"line {line_no}: statement outside a module")
+        if head in ("input", "output", "wire"):
+            self._declaration(tokens, netlist, line_no)
+        elif head in _VG_UNSUPPORTED or head in _VG_PUNCTUATION:
+            raise UnsupportedConstruct(f"line {line_no}: '{head}' statement")
+        else:
+            self._instances(tokens, netlist, line_no)
+        return netlist
+
+    def _declaration(self, tokens: List[str], netlist: Netlist, line_no: int) -> None:
+        # input|output|wire [ [ msb : lsb ] ] name { , name } ;
+        width_val = 1
+        i = 1
+        if tokens[i] == "[":
+            if len(tokens) < 7 or not (tokens[2].isdigit() and tokens[3] == ":" and tokens[4].isdigit() and tokens[5] == "]"):
+                raise UnsupportedConstruct(f"line {line_no}: unsupported range")
+            width_val = int(tokens[2]) - int(tokens[4]) + 1
+            i = 6
+        names = tokens[i:-1]
+        if not names or any(t in _VG_PUNCTUATION for t in names[0::2]) or any(t != "," for t in names[1::2]) or len(names) % 2 == 0:
+            raise UnsupportedConstruct(f"line {line_no}: unsupported declaration")
+        for name in names[0::2]:
+            netlist.declare(name, width_val, tokens[0] == "input", tokens[0] == "output")
+
+    def _instances(self, tokens: List[str], netlist: Netlist, line_no: int) -> None:
+        # cell inst ( .PIN ( net [ [ bit ] ] ) , ... ) { , inst ( ... ) } ;
+        gate_type = tokens[0]
+        i = 1
+        while True:
+            if i + 1 >= len(tokens) or tokens[i + 1] != "(":
+                raise UnsupportedConstruct(f"line {line_no}: unsupported instance of {gate_type}")
+            gate_name = tokens[i]
+            i += 2
+            inputs: List[GraphWire] = []
+            input_pins: List[str] = []
+            output: Optional[GraphWire] = None
+            while tokens[i] != ")":
+                # .PIN ( net ) or .PIN ( net [ bit ] )
+                if tokens[i] != "." or tokens[i + 2] != "(":
+                    raise UnsupportedConstruct(f"line {line_no}: positional or malformed port connection on {gate_name}")
+                pin = tokens[i + 1]
+                if tokens[i + 4] == ")":
+                    net = tokens[i + 3]
+                    i += 5
+                elif tokens[i + 4] == "[" and tokens[i + 5].isdigit() and tokens[i + 6] == "]" and tokens[i + 7] == ")":
+                    net = f"{tokens[i + 3]}_{tokens[i + 5]}"
+                    i += 8
+                else:
+                    raise UnsupportedConstruct(f"line {line_no}: unsupported connection to {gate_name}.{pin}")
+                if net not in netlist.wires:
+                    raise UnsupportedConstruct(f"line {line_no}: undeclared net {net}")
+                if pin == "Q":
+                    if output is not None:
+                        print(f"Warning: Multiple output ports found on line {line_no}")
+                    else:
+                        output = netlist.wires[net]
+                else:
+                    inputs.append(netlist.wires[net])
+                    input_pins.append(pin)
+                if tokens[i] == ",":
+                    i += 1
+            netlist.connect_gate(GraphGate.from_ports(gate_name, gate_type, inputs, input_pins, output))
+            i += 1
+            if tokens[i] == ";":
+                return
+            if tokens[i] != ",":
+                raise UnsupportedConstruct(f"line {line_no}: unsupported instance of {gate_type}")
+            i += 1
+
+def parse_netlist(netlist_filename: str, use_pyverilog: bool = False):
+    """
+    Netlists of every module in a .vg file, as (module name, Netlist) items. Flat gate-level
+    netlists are read by VgReader; anything it doesn't support goes through pyverilog.
+    """
+    if not use_pyverilog:
+        try:
+            return VgReader(netlist_filename).read().items()
+        except (UnsupportedConstruct, IndexError) as e:
+            # IndexError: statement ended early, e.g. a truncated port connection
+            print(f"Note: {netlist_filename}: {e or 'malformed statement'}, parsing with pyverilog instead")
     ast, directives = parse(filelist=[netlist_filename], outputdir="./generated/parser")
     visitor = NetListVisitor(netlist_filename)
     visitor.visit(ast)
     return visitor.module_netlists.items()
 
+def _netlist_signature(netlist: Netlist):
+    """Everything parsing puts into a Netlist, for comparing the two readers."""
+    wires = [(w.name, w.width, w.is_input, w.is_output, w.driver.name if w.driver else None, [g.name for g in w.loads])
+             for w in netlist.wires.values()]
+    gates = [(g.name, g.gate_type, [w.name for w in g.inputs], g.input_pins, g.output.name if g.output else None)
+             for g in netlist.gates.values()]
+    return (netlist.name, netlist.inputs, netlist.outputs, wires, gates)
+
+def benchmark_readers(netlist_filename: str, repeat: int = 3) -> None:
+    """Time VgReader against the pyverilog path (best of repeat) and check they build the same netlists."""
+    results = {}
+    for label, use_pyverilog in [("pyverilog", True), ("streaming", False)]:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            netlists = dict(parse_netlist(netlist_filename, use_pyverilog=use_pyverilog))
+            best = min(best, time.perf_counter() - start)
+        results[label] = (best, {name: _netlist_signature(n) for (name, n) in netlists.items()})
+    num_gates = sum(len(sig[4]) for sig in results["streaming"][1].values())
+    print(f"{netlist_filename}: {num_gates} instances")
+    for label, (best, _) in results.items():
+        print(f"  {label:<10}: {best * 1000:10.1f} ms")
+    print(f"  speedup   : {results['pyverilog'][0] / results['streaming'][0]:.1f}x, "
+          f"identical netlists: {results['pyverilog'][1] == results['streaming'][1]}")
+
 def main():
     parser = argparse.ArgumentParser(description="Nathan")
     parser.add_argument('input_file', metavar='FILE', help='Specify the input netlist') # positional arg
     parser.add_argument('--period', metavar='PERIOD', required=False, help='Specify the clock period')
+    parser.add_argument('--benchmark', action='store_true', required=False, help='Compare the streaming reader against pyverilog')
     args = parser.parse_args()
+    if args.benchmark:
+        benchmark_readers(args.input_file)
+        return
 
     netlist_filename = args.input_file
     netlist = parse_netlist(netlist_filename)
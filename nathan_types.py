@@ -1,7 +1,14 @@
 import numpy as np
+from statistics import NormalDist
+from typing import Dict, Optional, Tuple
+
+# pulse width distribution of the injected faults (normal, clamped at 0)
+PULSE_WIDTH_MEAN_NS = 0.055
+PULSE_WIDTH_SIGMA_NS = 0.015
 
 class TimingInfo:
-    def __init__(self, clock_period_ns: float, setup_time_ns: float, hold_time_ns: float):
+    def __init__(self, clock_period_ns: float, setup_time_ns: float, hold_time_ns: float,
+                 pulse_width_mean_ns: float = PULSE_WIDTH_MEAN_NS, pulse_width_sigma_ns: float = PULSE_WIDTH_SIGMA_NS):
         self.clock_period_ns = clock_period_ns
         self.clock_period_ps = np.round(clock_period_ns * 1000)
 
@@ -9,4 +16,90 @@ class TimingInfo:
         self.setup_time_ps = np.round(setup_time_ns * 1000)
 
         self.hold_time_ns = hold_time_ns
-        self.hold_time_ps = np.round(hold_time_ns * 1000)
\ No newline at end of file
+        self.hold_time_ps = np.round(hold_time_ns * 1000)
+
+        self.pulse_width_mean_ns = pulse_width_mean_ns
+        self.pulse_width_mean_ps = np.round(pulse_width_mean_ns * 1000)
+
+        self.pulse_width_sigma_ns = pulse_width_sigma_ns
+        self.pulse_width_sigma_ps = np.round(pulse_width_sigma_ns * 1000)
+
+class FaultCounts:
+    """The four outcome counters reported at the end of a fault-injection campaign."""
+    def __init__(self, masked_timing: int = 0, meta_hit: int = 0, masked_logic: int = 0, observed: int = 0, num_faults: int = 0):
+        self.masked_timing = masked_timing  # 1) timing-masked (between hold & setup)
+        self.meta_hit = meta_hit            # 2) setup/hold violation --> metastability
+        self.masked_logic = masked_logic    # 3) logic-masked (no observable effect on the outputs)
+        self.observed = observed            # 4) captured & visible
+        self.num_faults = num_faults        # number of trials (counters are not mutually exclusive)
+
+    def __repr__(self):
+        return f"FaultCounts(masked_timing={self.masked_timing}, meta_hit={self.meta_hit}, masked_logic={self.masked_logic}, observed={self.observed}, num_faults={self.num_faults})"
+
+    def __add__(self, other: "FaultCounts") -> "FaultCounts":
+        return FaultCounts(self.masked_timing + other.masked_timing,
+                           self.meta_hit + other.meta_hit,
+                           self.masked_logic + other.masked_logic,
+                           self.observed + other.observed,
+                           self.num_faults + other.num_faults)
+
+    def counters(self) -> Dict[str, int]:
+        return {"masked_timing": self.masked_timing, "meta_hit": self.meta_hit,
+                "masked_logic": self.masked_logic, "observed": self.observed}
+
+    def intervals(self, confidence: float = 0.95) -> Dict[str, Tuple[float, float]]:
+        """Wilson score confidence interval of the fraction of trials behind each counter."""
+        return {name: wilson_interval(count, self.num_faults, confidence) for (name, count) in self.counters().items()}
+
+    def summary(self, confidence: Optional[float] = None) -> str:
+        """
+        Summary in the same format the generated testbench prints at $finish, with the
+        confidence interval of each rate appended if confidence is given.
+        """
+        lines = [f"\n-----  fault‑injection summary ({self.num_faults} trials) -----",
+                 f"1) timing‑masked        : {self.masked_timing}",
+                 f"2) setup/hold violation : {self.meta_hit}",
+                 f"3) logic‑masked         : {self.masked_logic}",
+                 f"4) observed             : {self.observed}"]
+        if confidence is not None:
+            for i, (lo, hi) in enumerate(self.intervals(confidence).values()):
+                lines[i + 1] += f"  [{100 * lo:.2f}%, {100 * hi:.2f}%] at {100 * confidence:g}%"
+        return "\n".join(lines)
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Wilson score interval for a binomial proportion ((0, 1) without trials)."""
+    if trials == 0:
+        return (0.0, 1.0)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return (max(0.0, center - half_width), min(1.0, center + half_width))
+
+# counter names in summary order, with their summary labels
+COUNTER_LABELS = [("masked_timing", "1) timing‑masked        "), ("meta_hit", "2) setup/hold violation "),
+                  ("masked_logic", "3) logic‑masked         "), ("observed", "4) observed             ")]
+
+class WeightedRates:
+    """Outcome rates estimated from weighted (stratified or importance-sampled) trials, with standard errors."""
+    def __init__(self, rates: Dict[str, float], stderr: Dict[str, float], num_faults: int):
+        self.rates = rates
+        self.stderr = stderr
+        self.num_faults = num_faults
+
+    def __repr__(self):
+        return f"WeightedRates({self.rates}, stderr={self.stderr}, num_faults={self.num_faults})"
+
+    def equivalent_trials(self, name: str) -> float:
+        """Uniform trials that would give the same standard error for this rate."""
+        p, se = self.rates[name], self.stderr[name]
+        return p * (1 - p) / (se * se) if se > 0 else float("inf")
+
+    def summary(self, confidence: float = 0.95) -> str:
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        lines = [f"\n-----  weighted fault‑injection estimate ({self.num_faults} trials, {100 * confidence:g}% confidence) -----"]
+        for (name, label) in COUNTER_LABELS:
+            lines.append(f"{label}: {100 * self.rates[name]:6.2f}% ± {100 * z * self.stderr[name]:.2f}%"
+                         f"  (as precise as {self.equivalent_trials(name):.0f} uniform trials)")
+        return "\n".join(lines)
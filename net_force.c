@@ -1,4 +1,6 @@
 #include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
 #include "vpi_user.h"
 
 /**
@@ -12,6 +14,15 @@
  * VPI: 17-29
  * Force and Release: 22-28/22-29
  *
+ * The testbench resolves its fault sites once with load_nets_dpi (one net name per
+ * line of a side file) and then forces, reads and releases them by index, so no
+ * name lookup happens per fault. With several faulty copies of the DUT it loads the
+ * list once per copy, and the handles of the k-th scope follow those of the first k.
+ * The by-name functions are kept for ad hoc use.
+ *
+ * Icarus Verilog has no DPI: net_force_vpi.c includes this file and registers the
+ * index functions as VPI system tasks/functions for the iverilog testbench dialect.
+ *
  * TODO: compile into shared library (add makefile rule)
  */
 
@@ -70,3 +81,107 @@ extern int release_net_by_name_dpi(const char *netname) {
 extern int get_net_value_by_name_dpi(const char *netname) {
     return get_net_value_by_name(netname);
 }
+
+// handles of the fault sites, resolved once by load_nets_dpi
+static vpiHandle *net_handles = NULL;
+static int num_net_handles = 0;
+
+static int net_handles_capacity = 0;
+
+// handle of a net, or of a bit of a vector net for "<name>[<bit>]" if the simulator does
+// not resolve bit-selects by name (Icarus Verilog)
+static vpiHandle net_handle_by_name(char *path) {
+    vpiHandle net_h = vpi_handle_by_name((PLI_BYTE8 *)path, NULL);
+    size_t len = strlen(path);
+    if (net_h || len == 0 || path[len - 1] != ']') return net_h;
+
+    char *bracket = strrchr(path, '[');
+    if (!bracket) return NULL;
+    int bit = atoi(bracket + 1);
+    *bracket = '\0';
+    vpiHandle vector_h = vpi_handle_by_name((PLI_BYTE8 *)path, NULL);
+    *bracket = '[';
+    return vector_h ? vpi_handle_by_index(vector_h, bit) : NULL;
+}
+
+// resolve "<scope>.<name>" for every line of filename and append the handles to the table,
+// returns the number of nets of this scope or -1
+extern int load_nets_dpi(const char *filename, const char *scope) {
+    FILE *f = fopen(filename, "r");
+    if (!f) {
+        vpi_printf("Error: (load_nets) cannot open net list '%s'.\n", filename);
+        return -1;
+    }
+
+    int first = num_net_handles;
+    int missing = 0;
+    char line[4096];
+    char path[4096 + 256];
+    while (fgets(line, sizeof(line), f)) {
+        // keep spaces: escaped identifiers end with one
+        line[strcspn(line, "\r\n")] = '\0';
+        if (line[0] == '\0') continue;
+        snprintf(path, sizeof(path), "%s.%s", scope, line);
+
+        if (num_net_handles == net_handles_capacity) {
+            int capacity = net_handles_capacity ? 2 * net_handles_capacity : 1024;
+            // on failure the old table stays valid (and owned by net_handles)
+            vpiHandle *grown = (vpiHandle *)realloc(net_handles, capacity * sizeof(vpiHandle));
+            if (!grown) {
+                vpi_printf("Error: (load_nets) out of memory for %d net handles.\n", capacity);
+                fclose(f);
+                return -1;
+            }
+            net_handles = grown;
+            net_handles_capacity = capacity;
+        }
+        net_handles[num_net_handles] = net_handle_by_name(path);
+        if (!net_handles[num_net_handles]) {
+            vpi_printf("Error: (load_nets) net '%s' not found.\n", path);
+            missing++;
+        }
+        num_net_handles++;
+    }
+    fclose(f);
+    return missing ? -1 : num_net_handles - first;
+}
+
+static vpiHandle net_by_idx(int idx, const char *caller) {
+    if (idx < 0 || idx >= num_net_handles) {
+        vpi_printf("Error: (%s) net index %d out of range (%d nets loaded).\n", caller, idx, num_net_handles);
+        return NULL;
+    }
+    return net_handles[idx];
+}
+
+extern int force_net_idx(int idx, int value) {
+    vpiHandle net_h = net_by_idx(idx, "force");
+    if (!net_h) return -1;
+
+    s_vpi_value val_s;
+    val_s.format = vpiIntVal;
+    val_s.value.integer = value;
+    vpi_put_value(net_h, &val_s, 0, vpiForceFlag);
+    return 0;
+}
+
+extern int release_net_idx(int idx) {
+    vpiHandle net_h = net_by_idx(idx, "release");
+    if (!net_h) return -1;
+
+    s_vpi_value val_s;
+    val_s.format = vpiIntVal;
+    val_s.value.integer = 0; // this is ignored
+    vpi_put_value(net_h, &val_s, 0, vpiReleaseFlag);
+    return 0;
+}
+
+extern int get_net_value_idx(int idx) {
+    vpiHandle net_h = net_by_idx(idx, "get_value");
+    if (!net_h) return -1;
+
+    s_vpi_value value_s;
+    value_s.format = vpiIntVal;
+    vpi_get_value(net_h, &value_s);
+    return value_s.value.integer;
+}
@@ -0,0 +1,117 @@
+#include "net_force.c"
+
+/**
+ * VPI system tasks and functions over the index functions of net_force.c, for
+ * simulators without DPI (Icarus Verilog). The iverilog testbench dialect calls
+ *
+ *   $load_nets(filename, scope)   function, same as load_nets_dpi
+ *   $force_net(idx, value)        task, same as force_net_idx
+ *   $release_net(idx)             task, same as release_net_idx
+ *   $get_net_value(idx)           function, same as get_net_value_idx
+ *
+ * Build with `iverilog-vpi --name=net_force net_force_vpi.c` and load with
+ * `vvp -M <dir> -m net_force`. analyze_faults does both for the iverilog backend.
+ */
+
+// handles of the first max arguments of the calling system task/function, returns the number of arguments
+static int get_args(vpiHandle *args, int max) {
+    vpiHandle arg_it = vpi_iterate(vpiArgument, vpi_handle(vpiSysTfCall, NULL));
+    vpiHandle arg_h;
+    int n = 0;
+    // the iterator is freed once vpi_scan returns NULL
+    while (arg_it && (arg_h = vpi_scan(arg_it))) {
+        if (n < max) args[n] = arg_h;
+        n++;
+    }
+    return n;
+}
+
+static int int_arg(vpiHandle arg_h) {
+    s_vpi_value val_s;
+    val_s.format = vpiIntVal;
+    vpi_get_value(arg_h, &val_s);
+    return val_s.value.integer;
+}
+
+static void put_return(int value) {
+    s_vpi_value val_s;
+    val_s.format = vpiIntVal;
+    val_s.value.integer = value;
+    vpi_put_value(vpi_handle(vpiSysTfCall, NULL), &val_s, NULL, vpiNoDelay);
+}
+
+static PLI_INT32 sizetf_int(PLI_BYTE8 *user_data) {
+    return 32;
+}
+
+static PLI_INT32 load_nets_calltf(PLI_BYTE8 *user_data) {
+    vpiHandle args[2];
+    if (get_args(args, 2) != 2) {
+        vpi_printf("Error: $load_nets takes a file name and a scope.\n");
+        put_return(-1);
+        return 0;
+    }
+    // vpi_get_value strings live in a buffer the next call reuses, copy the first
+    char filename[4096];
+    s_vpi_value val_s;
+    val_s.format = vpiStringVal;
+    vpi_get_value(args[0], &val_s);
+    snprintf(filename, sizeof(filename), "%s", val_s.value.str);
+    vpi_get_value(args[1], &val_s);
+    put_return(load_nets_dpi(filename, val_s.value.str));
+    return 0;
+}
+
+static PLI_INT32 force_net_calltf(PLI_BYTE8 *user_data) {
+    vpiHandle args[2];
+    if (get_args(args, 2) != 2) {
+        vpi_printf("Error: $force_net takes a net index and a value.\n");
+        return 0;
+    }
+    force_net_idx(int_arg(args[0]), int_arg(args[1]));
+    return 0;
+}
+
+static PLI_INT32 release_net_calltf(PLI_BYTE8 *user_data) {
+    vpiHandle args[1];
+    if (get_args(args, 1) != 1) {
+        vpi_printf("Error: $release_net takes a net index.\n");
+        return 0;
+    }
+    release_net_idx(int_arg(args[0]));
+    return 0;
+}
+
+static PLI_INT32 get_net_value_calltf(PLI_BYTE8 *user_data) {
+    vpiHandle args[1];
+    if (get_args(args, 1) != 1) {
+        vpi_printf("Error: $get_net_value takes a net index.\n");
+        put_return(-1);
+        return 0;
+    }
+    put_return(get_net_value_idx(int_arg(args[0])));
+    return 0;
+}
+
+static void register_systf(PLI_INT32 type, const char *name, PLI_INT32 (*calltf)(PLI_BYTE8 *)) {
+    s_vpi_systf_data tf_data;
+    memset(&tf_data, 0, sizeof(tf_data));
+    tf_data.type = type;
+    tf_data.sysfunctype = vpiIntFunc;
+    tf_data.tfname = (PLI_BYTE8 *)name;
+    tf_data.calltf = calltf;
+    tf_data.sizetf = type == vpiSysFunc ? sizetf_int : NULL;
+    vpi_register_systf(&tf_data);
+}
+
+static void register_net_force(void) {
+    register_systf(vpiSysFunc, "$load_nets", load_nets_calltf);
+    register_systf(vpiSysTask, "$force_net", force_net_calltf);
+    register_systf(vpiSysTask, "$release_net", release_net_calltf);
+    register_systf(vpiSysFunc, "$get_net_value", get_net_value_calltf);
+}
+
+void (*vlog_startup_routines[])(void) = {
+    register_net_force,
+    0
+};
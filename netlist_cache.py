@@ -0,0 +1,109 @@
+"""
+Persistent on-disk cache of parsed netlists.
+
+Parsing a .vg file runs the iverilog preprocessor and pyverilog's yacc parser
+before the Netlist graph is built, which dominates startup on large netlists.
+The cache stores every module of a parsed file as flat tables (wire names,
+widths and port flags; gate names, cell types, input wire indices, pin names
+and output wire index) in one pickle per file. Loading rebuilds the
+GraphWire/GraphGate graph from those tables without touching pyverilog.
+
+Entries are keyed by the SHA-256 of the .vg contents and PARSER_VERSION, so an
+edited netlist or a parser change is a miss. Storage and LRU eviction are
+handled by disk_cache.DiskCache.
+"""
+import argparse
+import time
+from typing import ItemsView, List, Optional, Tuple
+
+from nathan_parser import Netlist, GraphWire, GraphGate, parse_netlist, PARSER_VERSION
+from disk_cache import DiskCache
+
+NETLIST_CACHE_DIR = "generated/netlist_cache"
+NETLIST_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# (name, inputs, outputs, wires, gates), wires as (name, width, is_input, is_output),
+# gates as (name, cell type, input wire indices, input pins, output wire index or -1)
+ModuleTables = Tuple[str, List[Tuple[str, int]], List[Tuple[str, int]], List[Tuple[str, int, bool, bool]],
+                     List[Tuple[str, str, List[int], List[str], int]]]
+
+def netlist_to_tables(netlist: Netlist) -> ModuleTables:
+    wire_index = {name: i for (i, name) in enumerate(netlist.wires.keys())}
+    wires = [(w.name, w.width, w.is_input, w.is_output) for w in netlist.wires.values()]
+    gates = [(g.name, g.gate_type, [wire_index[w.name] for w in g.inputs], list(g.input_pins),
+              wire_index[g.output.name] if g.output is not None else -1) for g in netlist.gates.values()]
+    return (netlist.name, list(netlist.inputs), list(netlist.outputs), wires, gates)
+
+def netlist_from_tables(tables: ModuleTables, filepath: str) -> Netlist:
+    name, inputs, outputs, wire_table, gate_table = tables
+    netlist = Netlist()
+    netlist.name = name
+    netlist.filepath = filepath
+    netlist.inputs = list(inputs)
+    netlist.outputs = list(outputs)
+    wires: List[GraphWire] = []
+    for (wire_name, width, is_input, is_output) in wire_table:
+        wire = GraphWire(wire_name, is_input=is_input, is_output=is_output)
+        wire.width = width
+        netlist.add_wire(wire)
+        wires.append(wire)
+    for (gate_name, gate_type, inputs_idx, input_pins, output_idx) in gate_table:
+        gate = GraphGate.from_ports(gate_name, gate_type, [wires[i] for i in inputs_idx], list(input_pins),
+                                    wires[output_idx] if output_idx >= 0 else None)
+        netlist.connect_gate(gate)
+    return netlist
+
+class NetlistCache(DiskCache):
+    """Parsed netlists keyed by .vg content hash and PARSER_VERSION."""
+    def __init__(self, cache_dir: str = NETLIST_CACHE_DIR, max_bytes: int = NETLIST_CACHE_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes, PARSER_VERSION)
+        self.last_event = ""
+
+    def load(self, netlist_filename: str) -> ItemsView[str, Netlist]:
+        """Netlists of every module in the file, from the cache if possible (same shape as parse_netlist)."""
+        path = self.entry_path(netlist_filename)
+        start = time.perf_counter()
+        modules: Optional[List[ModuleTables]] = self.read(path)
+        if modules is not None:
+            netlists = {tables[0]: netlist_from_tables(tables, netlist_filename) for tables in modules}
+            self.last_event = f"hit {path} ({(time.perf_counter() - start) * 1000:.1f} ms)"
+            return netlists.items()
+
+        netlists = dict(parse_netlist(netlist_filename))
+        parse_time = time.perf_counter() - start
+        self.write(path, [netlist_to_tables(netlist) for netlist in netlists.values()])
+        self.last_event = f"miss, parsed in {parse_time * 1000:.1f} ms and stored {path}"
+        return netlists.items()
+
+    def report(self) -> str:
+        return "netlist " + super().report()
+
+_default_cache: Optional[NetlistCache] = None
+
+def load_netlists(netlist_filename: str, use_cache: bool = True) -> ItemsView[str, Netlist]:
+    """parse_netlist through the default on-disk cache, printing whether it was a hit or a miss."""
+    global _default_cache
+    if not use_cache:
+        return parse_netlist(netlist_filename)
+    if _default_cache is None:
+        _default_cache = NetlistCache()
+    netlists = _default_cache.load(netlist_filename)
+    print(f"Netlist cache {_default_cache.last_event}")
+    return netlists
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or fill the parsed-netlist cache")
+    parser.add_argument('input_files', metavar='FILE', nargs='*', help='Netlists to load through the cache')
+    parser.add_argument('--clear', action='store_true', help='Remove every cache entry first')
+    args = parser.parse_args()
+
+    cache = NetlistCache()
+    if args.clear:
+        cache.clear()
+    for filename in args.input_files:
+        cache.load(filename)
+        print(f"{filename}: {cache.last_event}")
+    print(cache.report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Parameter sweeps over clock period, setup/hold time and pulse-width distribution.
+
+Giving nathan.py several values for any of -p, -st, -ht, --pulse_mean or
+--pulse_sigma runs one campaign per point of their cartesian product. Values
+are in ns, as a comma-separated list in which each item is a number or an
+inclusive start:stop:step range, e.g. -p 0.5:2:0.5,5,10.
+
+The grid points are batch designs (see batch_campaign) that share the parsed
+netlist. They run in parallel on --workers processes and end in one table of
+the four outcome rates per point, also written to SWEEP_RESULTS_FILE. All of
+these parameters are testbench plusargs, so the vcs and iverilog backends compile a
+single testbench (the first campaign builds it, the others wait for it and reuse it).
+"""
+import itertools
+import os
+from typing import Dict, List, Optional
+
+from nathan_parser import Netlist
+from sdf_parser import SdfData
+from batch_campaign import BatchEntry, BatchDesign
+
+SWEEP_DIR = "generated/sweep"
+SWEEP_RESULTS_FILE = os.path.join(SWEEP_DIR, "results.csv")
+# command-line arguments that can take several values, in grid order
+SWEEP_PARAMETERS = ["period", "setup_time", "hold_time", "pulse_mean", "pulse_sigma"]
+
+def parse_values(text: str) -> List[float]:
+    """Values of a comma-separated list of numbers and start:stop:step ranges (ValueError if malformed)."""
+    values = []
+    for item in str(text).split(","):
+        fields = item.split(":")
+        if len(fields) == 1:
+            values.append(float(fields[0]))
+            continue
+        if len(fields) != 3:
+            raise ValueError(f"{item} is neither a number nor start:stop:step")
+        start, stop, step = (float(field) for field in fields)
+        if step <= 0 or stop < start:
+            raise ValueError(f"{item} is an empty range")
+        # stop is included, up to rounding of the step
+        count = int((stop - start) / step + 1e-9) + 1
+        values += [round(start + k * step, 9) for k in range(count)]
+    return values
+
+def sweep_entries(netlist_filename: str, sdf_filename: Optional[str], grid: Dict[str, List[float]]) -> List[BatchEntry]:
+    """One entry per grid point, the last parameter of SWEEP_PARAMETERS varying fastest."""
+    return [BatchEntry(netlist_filename, sdf_filename, *point)
+            for point in itertools.product(*(grid[name] for name in SWEEP_PARAMETERS))]
+
+def sweep_designs(netlists: List[Netlist], sdf: Optional[SdfData], entries: List[BatchEntry],
+                  base_dir: str = SWEEP_DIR) -> List[BatchDesign]:
+    """Every module at every grid point, all points of a module sharing its Netlist."""
+    return [BatchDesign(len(netlists) * point + i, entry, netlist, sdf, base_dir)
+            for (point, entry) in enumerate(entries) for (i, netlist) in enumerate(netlists)]
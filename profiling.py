@@ -0,0 +1,147 @@
+"""
+Per-stage profiling of a NATHAN run (nathan.py --profile).
+
+While a Profiler is active, every block wrapped in profiling.stage(name) adds
+its wall time and CPU time to that stage. CPU time includes child processes
+(VCS, simv, shard workers) once they have exited. The stage also records the
+peak RSS reached by then. Stages nest: a stage opened inside another is
+reported as "outer/inner", and the outer totals include the inner ones.
+Without an active profiler, stage() and count() do nothing, so the hooks stay
+in the pipeline at no cost.
+
+The JSON report holds the stages in the order they first ran, the netlist
+statistics (wires, gates, levels, fault sites, cone sizes), counters such as the number of
+simulated faults, and faults/sec over the SIMULATION_STAGES.
+"""
+import contextlib
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import numpy as np
+from typing import Dict, List, Optional
+
+from nathan_parser import Netlist
+from compiled_netlist import compile_netlist
+from cone_index import cone_index
+
+# stages that run the fault campaign itself, faults/sec is measured over these
+SIMULATION_STAGES = ["simv_run", "python_sim"]
+
+def peak_rss_mb(children: bool = False) -> float:
+    """Peak RSS of this process (or of its largest finished child) in MiB."""
+    # ru_maxrss is in KiB on Linux
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    return resource.getrusage(who).ru_maxrss / 1024
+
+def cpu_time() -> float:
+    """User and system time of this process and its finished children, in seconds."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_mb = 0.0
+
+    def to_dict(self) -> dict:
+        return {"calls": self.calls, "wall_s": self.wall_s, "cpu_s": self.cpu_s, "peak_rss_mb": self.peak_rss_mb}
+
+class Profiler:
+    def __init__(self):
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, float] = {}
+        self.netlists: Dict[str, dict] = {}
+        self._open: List[str] = []
+        self._wall = time.perf_counter()
+        self._cpu = cpu_time()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        self._open.append(name)
+        path = "/".join(self._open)
+        # registered on entry, so stages are listed before the ones they contain
+        stats = self.stages.setdefault(path, StageStats())
+        wall, cpu = time.perf_counter(), cpu_time()
+        try:
+            yield
+        finally:
+            self._open.pop()
+            stats.calls += 1
+            stats.wall_s += time.perf_counter() - wall
+            stats.cpu_s += cpu_time() - cpu
+            stats.peak_rss_mb = max(stats.peak_rss_mb, peak_rss_mb())
+
+    def count(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_netlist(self, netlist: Netlist) -> None:
+        compiled = compile_netlist(netlist)
+        cone_sizes = cone_index(netlist).cone_sizes()[compiled.fault_sites]
+        self.netlists[netlist.name] = {"file": netlist.filepath, "wires": int(compiled.num_wires), "gates": int(compiled.num_gates),
+                                       "levels": int(compiled.num_levels), "fault_sites": len(compiled.fault_sites),
+                                       "empty_cone_sites": int(np.count_nonzero(cone_sizes == 0)),
+                                       "mean_cone_bits": float(cone_sizes.mean()) if len(cone_sizes) else 0.0}
+
+    def simulation_time(self) -> float:
+        """Wall time spent in the SIMULATION_STAGES (outermost occurrences only)."""
+        return sum(stats.wall_s for (path, stats) in self.stages.items()
+                   if path.split("/")[-1] in SIMULATION_STAGES and not any(s in SIMULATION_STAGES for s in path.split("/")[:-1]))
+
+    def report(self) -> dict:
+        simulated = self.counters.get("faults_simulated", 0)
+        sim_time = self.simulation_time()
+        return {"command": " ".join(sys.argv), "python": platform.python_version(), "host": platform.node(), "pid": os.getpid(),
+                "wall_s": time.perf_counter() - self._wall, "cpu_s": cpu_time() - self._cpu,
+                "peak_rss_mb": peak_rss_mb(), "peak_child_rss_mb": peak_rss_mb(children=True),
+                "netlists": self.netlists, "stages": {path: stats.to_dict() for (path, stats) in self.stages.items()},
+                "counters": self.counters, "simulation_s": sim_time,
+                "faults_per_sec": simulated / sim_time if sim_time > 0 else None}
+
+    def summary(self) -> str:
+        lines = [f"\n-----  profile -----", f"{'stage':<40} {'calls':>6} {'wall ms':>10} {'cpu ms':>10} {'peak MB':>8}"]
+        for path, stats in self.stages.items():
+            name = "  " * path.count("/") + path.split("/")[-1]
+            lines.append(f"{name:<40} {stats.calls:>6} {1000 * stats.wall_s:>10.1f} {1000 * stats.cpu_s:>10.1f} {stats.peak_rss_mb:>8.1f}")
+        faults_per_sec = self.report()["faults_per_sec"]
+        if faults_per_sec is not None:
+            lines.append(f"{'faults/sec':<40} {faults_per_sec:>28.1f}")
+        return "\n".join(lines)
+
+    def write(self, filename: str) -> None:
+        _make_parent(filename)
+        with open(filename, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+def _make_parent(filename: str) -> None:
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+def dump_python_profile(profile, filename: str) -> None:
+    """Write cProfile statistics (python -m pstats FILE reads them)."""
+    _make_parent(filename)
+    profile.dump_stats(filename)
+
+# profiler of this run, set by start()
+_active: Optional[Profiler] = None
+
+def start() -> Profiler:
+    global _active
+    _active = Profiler()
+    return _active
+
+def stage(name: str):
+    """Context manager timing a pipeline stage, a no-op unless a profiler was started."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
+
+def count(name: str, value: float = 1) -> None:
+    if _active is not None:
+        _active.count(name, value)
@@ -0,0 +1,371 @@
+"""
+Minimal SDF (Standard Delay Format) reader for the delay files written by
+Design Compiler (see sdf/). Only the constructs that appear there are handled:
+IOPATH (optionally wrapped in COND) and INTERCONNECT delays in ABSOLUTE blocks.
+
+All delays are converted to picoseconds. A delay is stored as a
+(min, typ, max) triple, and every arc carries one triple for a rising output
+and one for a falling output.
+
+The file is read line by line and every delay entry is indexed as soon as it
+closes, so memory use doesn't grow with the size of the file. load_sdf adds a
+per-process memo and an on-disk cache of the index.
+"""
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+DelayTriple = Tuple[float, float, float]
+CORNERS = {"min": 0, "typ": 1, "max": 2}
+
+class CondExpr:
+    """A compiled SDF COND expression over cell pin names (e.g. "!DIN2", "DIN1&DIN2")."""
+    _TOKEN_RE = re.compile(r"\s*(1'b[01]|1'B[01]|[01]|[A-Za-z_][A-Za-z0-9_]*|==|!=|[!~&|^()])")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pins: List[str] = []
+        self._tokens = self._tokenize(text)
+        self._pos = 0
+        self._eval: Optional[Callable[[Dict[str, int]], int]] = self._parse_or()
+        if self._pos != len(self._tokens):
+            raise ValueError(f"Unsupported COND expression: {text}")
+
+    def __repr__(self):
+        return f"Cond({self.text})"
+
+    def evaluate(self, pin_values: Dict[str, int]) -> Optional[bool]:
+        """Evaluate the condition, or return None if it refers to a pin that isn't in pin_values."""
+        if any(pin not in pin_values for pin in self.pins):
+            return None
+        return bool(self._eval(pin_values) & 1)
+
+    def _tokenize(self, text: str) -> List[str]:
+        tokens = []
+        pos = 0
+        text = text.strip()
+        while pos < len(text):
+            match = self._TOKEN_RE.match(text, pos)
+            if match is None:
+                raise ValueError(f"Unsupported COND expression: {text}")
+            tokens.append(match.group(1))
+            pos = match.end()
+        return tokens
+
+    def _peek(self) -> Optional[str]:
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _take(self) -> str:
+        token = self._tokens[self._pos]
+        self._pos += 1
+        return token
+
+    # precedence (low to high): | ^ & ==/!= unary
+    def _parse_or(self):
+        left = self._parse_xor()
+        while self._peek() == "|":
+            self._take()
+            right = self._parse_xor()
+            left = (lambda l, r: lambda v: l(v) | r(v))(left, right)
+        return left
+
+    def _parse_xor(self):
+        left = self._parse_and()
+        while self._peek() == "^":
+            self._take()
+            right = self._parse_and()
+            left = (lambda l, r: lambda v: l(v) ^ r(v))(left, right)
+        return left
+
+    def _parse_and(self):
+        left = self._parse_eq()
+        while self._peek() == "&":
+            self._take()
+            right = self._parse_eq()
+            left = (lambda l, r: lambda v: l(v) & r(v))(left, right)
+        return left
+
+    def _parse_eq(self):
+        left = self._parse_unary()
+        while self._peek() in ("==", "!="):
+            op = self._take()
+            right = self._parse_unary()
+            if op == "==":
+                left = (lambda l, r: lambda v: int((l(v) & 1) == (r(v) & 1)))(left, right)
+            else:
+                left = (lambda l, r: lambda v: int((l(v) & 1) != (r(v) & 1)))(left, right)
+        return left
+
+    def _parse_unary(self):
+        token = self._peek()
+        if token is None:
+            raise ValueError(f"Unsupported COND expression: {self.text}")
+        self._take()
+        if token in ("!", "~"):
+            operand = self._parse_unary()
+            return lambda v: ~operand(v) & 1
+        if token == "(":
+            inner = self._parse_or()
+            if self._peek() != ")":
+                raise ValueError(f"Unsupported COND expression: {self.text}")
+            self._take()
+            return inner
+        if token in ("0", "1", "1'b0", "1'b1", "1'B0", "1'B1"):
+            const = int(token[-1])
+            return lambda v: const
+        if re.match(r"[A-Za-z_]", token):
+            self.pins.append(token)
+            return lambda v: v[token]
+        raise ValueError(f"Unsupported COND expression: {self.text}")
+
+class IopathArc:
+    """Delay arc from a cell input pin to its output pin, optionally guarded by a COND."""
+    def __init__(self, in_pin: str, out_pin: str, rise: Optional[DelayTriple], fall: Optional[DelayTriple], cond: Optional[str] = None):
+        self.in_pin = in_pin
+        self.out_pin = out_pin
+        self.rise = rise
+        self.fall = fall
+        self.cond_text = cond
+        self.cond: Optional[CondExpr] = None
+        if cond is not None:
+            try:
+                self.cond = CondExpr(cond)
+            except ValueError:
+                # conditions we can't evaluate never match during simulation,
+                # but they still bound the delay for static timing
+                self.cond = None
+
+    def __repr__(self):
+        cond = f"COND {self.cond_text} " if self.cond_text else ""
+        return f"IOPATH({cond}{self.in_pin}->{self.out_pin}, rise={self.rise}, fall={self.fall})"
+
+class SdfData:
+    """Delays from an SDF file, indexed by instance name and by interconnect endpoints."""
+    def __init__(self):
+        self.design: Optional[str] = None
+        self.timescale_ps: float = 1000.0
+        self.celltypes: Dict[str, str] = {}                 # instance -> cell type
+        self.iopaths: Dict[str, List[IopathArc]] = {}       # instance -> arcs
+        self.interconnects: Dict[Tuple[str, str], Tuple[Optional[DelayTriple], Optional[DelayTriple]]] = {}  # (src pin, dst pin) -> (rise, fall)
+
+    def __repr__(self):
+        return f"SdfData({self.design}, instances={len(self.iopaths)}, interconnects={len(self.interconnects)})"
+
+    def get_arcs(self, instance: str, in_pin: Optional[str] = None) -> List[IopathArc]:
+        """All IOPATH arcs of an instance, optionally only those starting at in_pin."""
+        arcs = self.iopaths.get(instance, [])
+        if in_pin is None:
+            return arcs
+        return [arc for arc in arcs if arc.in_pin == in_pin]
+
+    def get_interconnect(self, src: str, dst: str) -> Tuple[Optional[DelayTriple], Optional[DelayTriple]]:
+        """(rise, fall) interconnect delay between two pins, e.g. ("U7/Q", "U6/DIN3")."""
+        return self.interconnects.get((src, dst), (None, None))
+
+def select_delay(triple: Optional[DelayTriple], corner: str = "typ") -> Optional[float]:
+    """Pick the min, typ or max value out of a delay triple."""
+    if triple is None:
+        return None
+    return triple[CORNERS[corner]]
+
+##################################################
+#                    PARSING                     #
+##################################################
+
+_SDF_TOKEN_RE = re.compile(r'\s*(\(|\)|"[^"]*"|[^\s()"]+)')
+
+def _parse_timescale(values: List[str]) -> float:
+    text = "".join(values)
+    match = re.match(r"([0-9.]+)?\s*(fs|ps|ns|us|ms|s)", text)
+    if match is None:
+        return 1000.0
+    scale = float(match.group(1)) if match.group(1) else 1.0
+    unit = {"fs": 1e-3, "ps": 1.0, "ns": 1e3, "us": 1e6, "ms": 1e9, "s": 1e12}[match.group(2)]
+    return scale * unit
+
+def _parse_triple(group: List, timescale_ps: float) -> Optional[DelayTriple]:
+    """Parse a delay value like (0.1:0.2:0.3) or (0.2). Returns None for an empty ()."""
+    if len(group) == 0:
+        return None
+    values = group[0].split(":")
+    if len(values) == 1:
+        values = values * 3
+    parsed = [float(v) * timescale_ps if v != "" else None for v in values]
+    # fill missing entries (e.g. "::0.3") with whatever is present
+    present = [v for v in parsed if v is not None]
+    if not present:
+        return None
+    return tuple(v if v is not None else present[0] for v in parsed)
+
+def _parse_rise_fall(groups: List, timescale_ps: float):
+    values = [_parse_triple(g, timescale_ps) for g in groups if isinstance(g, list)]
+    if len(values) == 0:
+        return None, None
+    if len(values) == 1:
+        return values[0], values[0]
+    return values[0], values[1]
+
+def _port_name(spec) -> str:
+    """Port spec is either a bare name or (posedge NAME)/(negedge NAME)."""
+    if isinstance(spec, list):
+        return spec[-1]
+    return spec
+
+def _strip_escapes(name: str) -> str:
+    return name.replace("\\", "")
+
+def _parse_delay_entries(entries: List, instance: str, sdf: SdfData) -> None:
+    for entry in entries:
+        if not isinstance(entry, list) or not entry:
+            continue
+        keyword = entry[0]
+        if keyword == "COND":
+            # (COND expr (IOPATH ...)), expr may span several tokens
+            cond_tokens = [t for t in entry[1:] if not isinstance(t, list)]
+            groups = [g for g in entry[1:] if isinstance(g, list)]
+            iopath = groups[-1]
+            # parenthesized condition pieces end up as groups too
+            cond_text = " ".join(cond_tokens + [_flatten(g) for g in groups[:-1]])
+            _parse_iopath(iopath, instance, sdf, cond=cond_text)
+        elif keyword == "IOPATH":
+            _parse_iopath(entry, instance, sdf)
+        elif keyword == "INTERCONNECT":
+            src, dst = _strip_escapes(entry[1]), _strip_escapes(entry[2])
+            if instance:
+                src, dst = f"{instance}/{src}", f"{instance}/{dst}"
+            sdf.interconnects[(src, dst)] = _parse_rise_fall(entry[3:], sdf.timescale_ps)
+
+def _flatten(group) -> str:
+    if isinstance(group, list):
+        return "(" + " ".join(_flatten(g) for g in group) + ")"
+    return group
+
+def _parse_iopath(entry: List, instance: str, sdf: SdfData, cond: Optional[str] = None) -> None:
+    in_pin = _port_name(entry[1])
+    out_pin = _port_name(entry[2])
+    rise, fall = _parse_rise_fall(entry[3:], sdf.timescale_ps)
+    sdf.iopaths.setdefault(instance, []).append(IopathArc(in_pin, out_pin, rise, fall, cond))
+
+class _SdfStream:
+    """
+    Builds nested groups from a token stream, handing every delay entry (IOPATH, COND,
+    INTERCONNECT) to the index as soon as it closes, so only the entry being read is ever
+    held as a tree, however large the file.
+    """
+    def __init__(self, sdf: SdfData):
+        self.sdf = sdf
+        self.stack: List[List] = [[]]
+        self.instance = ""
+        self.celltype: Optional[str] = None
+
+    def feed(self, line: str) -> None:
+        stack = self.stack
+        for match in _SDF_TOKEN_RE.finditer(line):
+            token = match.group(1)
+            if token == "(":
+                stack.append([])
+            elif token == ")":
+                group = stack.pop()
+                if not self._consume(group):
+                    stack[-1].append(group)
+            elif token:
+                stack[-1].append(token)
+
+    def _consume(self, group: List) -> bool:
+        """Index a group that just closed. Returns False if it must be kept in its parent."""
+        parent = self.stack[-1]
+        parent_keyword = parent[0] if parent and isinstance(parent[0], str) else None
+        keyword = group[0] if group and isinstance(group[0], str) else None
+        if parent_keyword in ("ABSOLUTE", "INCREMENT"):
+            # ABSOLUTE and INCREMENT are treated the same, there is no prior annotation to add to
+            _parse_delay_entries([group], self.instance, self.sdf)
+            return True
+        if parent_keyword == "CELL":
+            if keyword == "CELLTYPE" and len(group) > 1:
+                self.celltype = group[1].strip('"')
+            elif keyword == "INSTANCE":
+                self.instance = _strip_escapes(group[1]) if len(group) > 1 else ""
+            # DELAY entries are already indexed, TIMINGCHECK etc. don't matter for combinational fault propagation
+            return True
+        if parent_keyword == "DELAYFILE":
+            match keyword:
+                case "DESIGN":
+                    self.sdf.design = group[1].strip('"')
+                case "TIMESCALE":
+                    self.sdf.timescale_ps = _parse_timescale(group[1:])
+                case "CELL":
+                    if self.instance and self.celltype:
+                        self.sdf.celltypes[self.instance] = self.celltype
+                    self.instance = ""
+                    self.celltype = None
+            return True
+        return False
+
+def parse_sdf_string(text: str) -> SdfData:
+    sdf = SdfData()
+    stream = _SdfStream(sdf)
+    for line in text.splitlines():
+        stream.feed(line)
+    return sdf
+
+def parse_sdf(sdf_filename: str) -> SdfData:
+    """Read an SDF file line by line into an SdfData index."""
+    sdf = SdfData()
+    stream = _SdfStream(sdf)
+    with open(sdf_filename, "r") as f:
+        for line in f:
+            stream.feed(line)
+    return sdf
+
+##################################################
+#                    CACHING                     #
+##################################################
+
+# bump whenever parsing changes what ends up in an SdfData, so cached files are re-parsed
+SDF_PARSER_VERSION = 1
+SDF_CACHE_DIR = "generated/sdf_cache"
+SDF_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+def sdf_to_tables(sdf: SdfData):
+    """SdfData as plain tuples and dicts (compiled COND expressions can't be pickled)."""
+    iopaths = {instance: [(arc.in_pin, arc.out_pin, arc.rise, arc.fall, arc.cond_text) for arc in arcs]
+               for (instance, arcs) in sdf.iopaths.items()}
+    return (sdf.design, sdf.timescale_ps, sdf.celltypes, iopaths, sdf.interconnects)
+
+def sdf_from_tables(tables) -> SdfData:
+    design, timescale_ps, celltypes, iopaths, interconnects = tables
+    sdf = SdfData()
+    sdf.design = design
+    sdf.timescale_ps = timescale_ps
+    sdf.celltypes = celltypes
+    sdf.interconnects = interconnects
+    sdf.iopaths = {instance: [IopathArc(*arc) for arc in arcs] for (instance, arcs) in iopaths.items()}
+    return sdf
+
+# SdfData already loaded by this process, by (path, size, mtime)
+_loaded_sdf: Dict[Tuple[str, int, float], SdfData] = {}
+
+def load_sdf(sdf_filename: str, use_cache: bool = True) -> SdfData:
+    """
+    parse_sdf, but each file is only read once per process, and with use_cache the index is
+    kept in an on-disk cache keyed by the file contents for later runs.
+    """
+    stat = os.stat(sdf_filename)
+    memo_key = (os.path.abspath(sdf_filename), stat.st_size, stat.st_mtime)
+    if memo_key in _loaded_sdf:
+        return _loaded_sdf[memo_key]
+    if use_cache:
+        # imported here, so the parser itself stays free of cache plumbing
+        from disk_cache import DiskCache
+        cache = DiskCache(SDF_CACHE_DIR, SDF_CACHE_MAX_BYTES, SDF_PARSER_VERSION)
+        path = cache.entry_path(sdf_filename)
+        tables = cache.read(path)
+        if tables is not None:
+            sdf = sdf_from_tables(tables)
+        else:
+            sdf = parse_sdf(sdf_filename)
+            cache.write(path, sdf_to_tables(sdf))
+    else:
+        sdf = parse_sdf(sdf_filename)
+    _loaded_sdf[memo_key] = sdf
+    return sdf
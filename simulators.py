@@ -0,0 +1,135 @@
+"""
+Verilog simulators the compiled-testbench backends run on.
+
+A Simulator compiles the generated testbench (in its dialect, see
+gen_testbench.TESTBENCH_DIALECTS) together with the gate library and the netlist
+into an executable in a simv cache directory, and builds the command line of
+one run of it. analyze_faults does everything else (caching, plusargs, shards,
+fault logs) the same way for all of them.
+
+  vcs       Synopsys VCS, forcing nets through the DPI functions of net_force.c
+  iverilog  Icarus Verilog (iverilog + vvp), forcing nets through the VPI system
+            tasks of net_force_vpi.c, which wraps the same functions
+
+Both compile against the Verilog gate library GATE_LIB unless use_gate_library
+(nathan.py -l) names another one. A failed compile step raises CompileError
+with the end of its output; the whole output is kept in compile.log next to the
+compiled testbench.
+
+Adding a simulator means subclassing Simulator and registering it in SIMULATORS.
+"""
+import os
+import shutil
+import subprocess
+from typing import Dict, List, Optional
+
+VCS = "vcs"
+VCS_FLAGS = "-sverilog -xprop=tmerge +vc -Mupdate -line \
+             -full64 -kdb -lca -nc -debug_access+all+reverse +warn=noTFIPC \
+             +warn=noDEBUG_DEP +warn=noENUMASSIGN +warn=noLCA_FEATURES_ENABLED \
+             -timescale=1ps/1ps +vpi +sdfverbose  +transport_path_delays +pulse_e/0 +pulse_r/0 +transport_int_delays +pulse_int_e/0 +pulse_int_r/0"
+# default gate library, see use_gate_library
+GATE_LIB = "/usr/caen/misc/class/eecs470/lib/verilog/lec25dscc25.v"
+
+IVERILOG = "iverilog"
+IVERILOG_VPI = "iverilog-vpi"
+VVP = "vvp"
+# SystemVerilog subset of the iverilog testbench dialect, specify blocks of the gate library kept for $sdf_annotate
+IVERILOG_FLAGS = ["-g2012", "-gspecify", "-Ttyp"]
+# VPI module with $load_nets, $force_net, $release_net and $get_net_value, built next to the compiled testbench
+VPI_MODULE = "net_force"
+VPI_SRC = "net_force_vpi.c"
+# return types of its system functions, for the iverilog compile
+VPI_SFT = "net_force.sft"
+
+# compile log of every build, in its cache directory
+COMPILE_LOG = "compile.log"
+# lines of a failed compile's output shown in CompileError
+COMPILE_ERROR_LINES = 20
+
+class CompileError(Exception):
+    """A compile step of a testbench failed."""
+
+def run_compile_step(command: List[str], log_filename: str, cwd: Optional[str] = None) -> None:
+    """Run one compile command, appending its output to log_filename (CompileError if it fails)."""
+    result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+    with open(log_filename, "a") as log:
+        log.write(f"$ {' '.join(command)}\n{result.stdout}{result.stderr}")
+    if result.returncode != 0:
+        output = (result.stdout + result.stderr).strip().splitlines()[-COMPILE_ERROR_LINES:]
+        raise CompileError("\n".join([f"{command[0]} failed with exit code {result.returncode} (full output in {log_filename}):", *output]))
+
+class Simulator:
+    """A simulator of the generated testbench (subclasses implement compile and command)."""
+    name = ""
+    dialect = ""       # gen_testbench dialect of its testbench
+    executable = ""    # file name of the compiled testbench in its cache directory
+    tools: List[str] = []
+
+    def __init__(self, gate_library: str = GATE_LIB):
+        self.gate_library = gate_library
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name})"
+
+    def missing_tools(self) -> List[str]:
+        """Programs this simulator needs that are not on PATH."""
+        return [tool for tool in self.tools if shutil.which(tool) is None]
+
+    def cache_inputs(self) -> List[str]:
+        """Flags and source files (besides the netlist and SDF) that the compiled testbench depends on."""
+        raise NotImplementedError
+
+    def compile(self, cache_dir: str, testbench_filename: str, netlist_filename: str) -> None:
+        """Compile the testbench, gate library and netlist into cache_dir/executable (CompileError if a step fails)."""
+        raise NotImplementedError
+
+    def command(self, executable: str, plusargs: List[str], seed: int) -> List[str]:
+        """Command line of one run of a compiled testbench, with its inputs drawn from seed."""
+        raise NotImplementedError
+
+class VcsSimulator(Simulator):
+    name = "vcs"
+    dialect = "vcs"
+    executable = "simv"
+    tools = [VCS]
+
+    def cache_inputs(self) -> List[str]:
+        return [VCS_FLAGS, self.gate_library, "net_force.c"]
+
+    def compile(self, cache_dir: str, testbench_filename: str, netlist_filename: str) -> None:
+        simv = os.path.join(cache_dir, self.executable)
+        run_compile_step([VCS, *VCS_FLAGS.split(), f"-Mdir={cache_dir}/csrc", self.gate_library, "net_force.c", testbench_filename,
+                          netlist_filename, "-o", simv], os.path.join(cache_dir, COMPILE_LOG))
+
+    def command(self, executable: str, plusargs: List[str], seed: int) -> List[str]:
+        # +ntb_random_seed drives std::randomize of the inputs
+        return [executable, *plusargs, f"+ntb_random_seed={seed}"]
+
+class IcarusSimulator(Simulator):
+    name = "iverilog"
+    dialect = "iverilog"
+    executable = "simv.vvp"
+    tools = [IVERILOG, IVERILOG_VPI, VVP]
+
+    def cache_inputs(self) -> List[str]:
+        return [" ".join(IVERILOG_FLAGS), self.gate_library, "net_force.c", VPI_SRC, VPI_SFT]
+
+    def compile(self, cache_dir: str, testbench_filename: str, netlist_filename: str) -> None:
+        log_filename = os.path.join(cache_dir, COMPILE_LOG)
+        # iverilog-vpi writes <name>.vpi to its working directory
+        run_compile_step([IVERILOG_VPI, f"--name={VPI_MODULE}", os.path.abspath(VPI_SRC)], log_filename, cwd=cache_dir)
+        # the testbench goes first: its `timescale 1ps/1ps carries over to the gate library and netlist
+        run_compile_step([IVERILOG, *IVERILOG_FLAGS, "-o", os.path.join(cache_dir, self.executable), VPI_SFT,
+                          testbench_filename, self.gate_library, netlist_filename], log_filename)
+
+    def command(self, executable: str, plusargs: List[str], seed: int) -> List[str]:
+        # -n: $stop ends the run instead of entering the interactive prompt
+        return [VVP, "-n", "-M", os.path.dirname(executable), "-m", VPI_MODULE, executable, *plusargs, f"+input_seed={seed}"]
+
+SIMULATORS: Dict[str, Simulator] = {simulator.name: simulator for simulator in [VcsSimulator(), IcarusSimulator()]}
+
+def use_gate_library(filename: str) -> None:
+    """Compile the testbenches of all simulators against filename instead of GATE_LIB."""
+    for simulator in SIMULATORS.values():
+        simulator.gate_library = filename
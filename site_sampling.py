@@ -0,0 +1,206 @@
+"""
+Stratified and importance sampling of fault sites.
+
+The testbench draws fault sites uniformly, so sites that are rare in the netlist
+(deep carry-chain nodes, wires with little slack, ...) get few trials.
+SiteSampler groups the fault sites into strata by structural and timing
+features, optionally crossed with bins of the fault start time, gives every
+stratum a fixed number of trials and, within a stratum, draws sites uniformly or
+in proportion to an importance weight. Start times are uniform within their bin
+and pulse widths are drawn as in fault_sampling.
+
+Every trial carries the weight p(site, start) / (n_h * q(site, start)), where p
+is the uniform probability, n_h the number of trials of its stratum and q the
+draw probability within the stratum. The weighted sum of a counter's
+indicator is then an unbiased estimate of the rate a uniform campaign measures,
+and its variance is estimated stratum by stratum.
+
+Features (numeric ones are split into quantile bins, wires that reach no output
+get a bin of their own):
+  output_distance  most gates between the wire and a primary output
+  output_delay     longest path delay from the wire to a primary output
+  slack            setup slack of the wire
+  fanout           number of gate inputs the wire drives
+  cone_size        number of output bits in the fan-out cone of the wire (see cone_index)
+  gate_type        cell type of the driving gate
+"""
+import numpy as np
+from typing import List, Optional
+
+from nathan_parser import Netlist
+from nathan_types import TimingInfo, WeightedRates
+from compiled_netlist import compile_netlist
+from cone_index import cone_index
+from fault_sampling import FaultList, sample_faults
+from fault_log import OUTCOME_BITS
+from timing_engine import TimingAnalysis
+from sdf_parser import SdfData
+
+FEATURES = ["output_distance", "output_delay", "slack", "fanout", "cone_size", "gate_type"]
+# features an importance weight can be derived from (larger value, more trials)
+IMPORTANCE_FEATURES = ["output_distance", "output_delay", "fanout", "cone_size"]
+# "proportional" gives each stratum its share of the sites (never worse than uniform sampling),
+# "equal" the same number of trials (more trials for rare strata)
+ALLOCATIONS = ["proportional", "equal"]
+DEFAULT_FEATURE_BINS = 4
+MIN_STRATUM_TRIALS = 2
+
+class StratifiedSample:
+    """Fault list drawn by SiteSampler, with the stratum and weight of every trial."""
+    def __init__(self, faults: FaultList, strata: np.ndarray, weights: np.ndarray, stratum_share: np.ndarray):
+        self.faults = faults
+        self.strata = strata                # stratum of each trial
+        self.weights = weights              # p(site) / (n_h * q(site)), sums to 1 in expectation
+        self.stratum_share = stratum_share  # fraction of the fault sites in each stratum
+
+    def __len__(self):
+        return len(self.faults)
+
+    def estimate(self, outcomes: np.ndarray) -> WeightedRates:
+        """Weighted rates of the four counters from the outcome bits (fault_log.OUTCOME_BITS) of every trial."""
+        num_strata = len(self.stratum_share)
+        trials = np.bincount(self.strata, minlength=num_strata)
+        # contribution of a trial to its stratum mean, rescaled to the stratum
+        scale = self.weights * trials[self.strata] / self.stratum_share[self.strata]
+        rates, stderr = {}, {}
+        for (name, bit) in OUTCOME_BITS:
+            values = scale * ((outcomes & bit) != 0)
+            sums = np.bincount(self.strata, weights=values, minlength=num_strata)
+            squares = np.bincount(self.strata, weights=values * values, minlength=num_strata)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = np.where(trials > 0, sums / trials, 0.0)
+                variances = np.where(trials > 1, (squares - trials * means * means) / (trials - 1), 0.0)
+                variance = np.sum(np.where(trials > 0, self.stratum_share ** 2 * np.maximum(variances, 0) / trials, 0.0))
+            rates[name] = float(np.sum(self.stratum_share * means))
+            stderr[name] = float(np.sqrt(variance))
+        return WeightedRates(rates, stderr, len(self))
+
+class SiteSampler:
+    """Splits the fault sites of a netlist into strata by the chosen features and samples trials from them."""
+    def __init__(self, netlist: Netlist, timing_info: TimingInfo, sdf: Optional[SdfData] = None, features: List[str] = FEATURES,
+                 bins: int = DEFAULT_FEATURE_BINS, start_bins: int = 1, analysis: Optional[TimingAnalysis] = None):
+        for feature in features:
+            if feature not in FEATURES:
+                raise ValueError(f"Unknown stratification feature {feature} (expected one of {', '.join(FEATURES)})")
+        self.netlist = netlist
+        self.timing_info = timing_info
+        self.features = list(features)
+        self.compiled = compile_netlist(netlist)
+        self.analysis = analysis if analysis is not None else TimingAnalysis(netlist, sdf, timing_info)
+        self.sites = self.compiled.fault_sites
+
+        columns = [self._binned_feature(feature, bins) for feature in self.features]
+        if columns:
+            _, self.site_stratum = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+            self.site_stratum = self.site_stratum.reshape(-1)
+        else:
+            self.site_stratum = np.zeros(len(self.sites), dtype=np.int64)
+        self.stratum_sizes = np.bincount(self.site_stratum)
+        # fault_start is stratified too, into start_bins equal intervals of the clock period
+        period = int(timing_info.clock_period_ps)
+        self.start_edges = np.unique(np.round(np.linspace(0, period, min(start_bins, period) + 1)).astype(np.int64))
+
+    @property
+    def num_strata(self) -> int:
+        return len(self.stratum_sizes)
+
+    def feature_values(self, feature: str) -> np.ndarray:
+        """Value of a feature for every fault site (nan for timing features of wires that reach no output)."""
+        compiled, analysis, sites = self.compiled, self.analysis, self.sites
+        reachable = analysis.output_distance[sites] >= 0
+        if feature == "output_distance":
+            return np.where(reachable, analysis.output_distance[sites], np.nan)
+        if feature == "output_delay":
+            return np.where(reachable, analysis.to_output_max[sites], np.nan)
+        if feature == "slack":
+            return np.where(reachable, analysis.slack[sites], np.nan)
+        if feature == "fanout":
+            return compiled.fanout_counts()[sites].astype(np.float64)
+        if feature == "cone_size":
+            return np.where(reachable, cone_index(self.netlist).cone_sizes()[sites], np.nan)
+        drivers = compiled.wire_driver[sites]
+        return np.where(drivers >= 0, compiled.gate_type[np.maximum(drivers, 0)], -1).astype(np.float64)
+
+    def _binned_feature(self, feature: str, bins: int) -> np.ndarray:
+        values = self.feature_values(feature)
+        if feature == "gate_type":
+            return values.astype(np.int64)
+        known = ~np.isnan(values)
+        if not known.any():
+            return np.zeros(len(values), dtype=np.int64)
+        edges = np.unique(np.quantile(values[known], np.linspace(0, 1, bins + 1)[1:-1]))
+        return np.where(known, np.searchsorted(edges, np.nan_to_num(values), side="right"), len(edges) + 1)
+
+    def importance(self, feature: str) -> np.ndarray:
+        """Per-site weight 1 + value / mean value of a feature (1 where it is undefined)."""
+        if feature not in IMPORTANCE_FEATURES:
+            raise ValueError(f"Unknown importance feature {feature} (expected one of {', '.join(IMPORTANCE_FEATURES)})")
+        values = np.nan_to_num(self.feature_values(feature), nan=0.0)
+        values = np.maximum(values, 0)
+        mean = values.mean() if len(values) and values.mean() > 0 else 1.0
+        return 1 + values / mean
+
+    def stratum_shares(self) -> np.ndarray:
+        """Probability of each (site stratum, start bin) stratum under uniform sampling."""
+        bin_share = np.diff(self.start_edges) / self.start_edges[-1]
+        return np.outer(self.stratum_sizes / self.stratum_sizes.sum(), bin_share).reshape(-1)
+
+    def allocate(self, num_faults: int, allocation: str = "proportional") -> np.ndarray:
+        """
+        Trials per stratum (largest remainder). Every stratum gets at least MIN_STRATUM_TRIALS,
+        one to keep the estimate unbiased and one more to estimate its variance.
+        """
+        if allocation not in ALLOCATIONS:
+            raise ValueError(f"Unknown allocation {allocation} (expected one of {', '.join(ALLOCATIONS)})")
+        shares = self.stratum_shares()
+        num_strata = len(shares)
+        reserved = MIN_STRATUM_TRIALS * num_strata
+        if num_faults < reserved:
+            raise ValueError(f"{num_faults} faults cannot give {num_strata} strata {MIN_STRATUM_TRIALS} trials each")
+        share = shares if allocation == "proportional" else np.full(num_strata, 1 / num_strata)
+        # the minimum per stratum first, the rest by share
+        quota = share * (num_faults - reserved)
+        trials = np.floor(quota).astype(np.int64)
+        remainder = num_faults - reserved - trials.sum()
+        trials[np.argsort(trials - quota, kind="stable")[:remainder]] += 1
+        return trials + MIN_STRATUM_TRIALS
+
+    def sample(self, num_faults: int, rng: np.random.Generator, allocation: str = "proportional",
+               importance: Optional[str] = None) -> StratifiedSample:
+        trials = self.allocate(num_faults, allocation)
+        site_weight = self.importance(importance) if importance is not None else np.ones(len(self.sites))
+        num_sites = len(self.sites)
+        num_bins = len(self.start_edges) - 1
+        period = self.start_edges[-1]
+
+        sites = np.zeros(num_faults, dtype=np.int64)
+        starts = np.zeros(num_faults, dtype=np.int64)
+        weights = np.zeros(num_faults)
+        strata = np.repeat(np.arange(len(trials)), trials)
+        offsets = np.concatenate([[0], np.cumsum(trials)])
+        for stratum in range(len(trials)):
+            site_stratum, start_bin = divmod(stratum, num_bins)
+            members = np.flatnonzero(self.site_stratum == site_stratum)
+            q = site_weight[members] / site_weight[members].sum()
+            picks = rng.choice(len(members), size=trials[stratum], p=q)
+            lo, hi = self.start_edges[start_bin], self.start_edges[start_bin + 1]
+            span = slice(offsets[stratum], offsets[stratum + 1])
+            sites[span] = members[picks]
+            starts[span] = rng.integers(lo, hi, size=trials[stratum])
+            # uniform probability of the site and start over their probability in this sample
+            weights[span] = ((hi - lo) / (num_sites * period)) / (trials[stratum] * q[picks])
+
+        # interleave the strata, so shards of the list see all of them
+        order = rng.permutation(num_faults)
+        faults = sample_faults(num_faults, num_sites, self.timing_info, rng)
+        faults.sites = sites[order]
+        faults.starts = starts[order]
+        return StratifiedSample(faults, strata[order], weights[order], self.stratum_shares())
+
+    def report(self, sample: StratifiedSample) -> str:
+        trials = np.bincount(sample.strata, minlength=len(sample.stratum_share))
+        return f"\n-----  stratified sampling ({', '.join(self.features) or 'no features'}) -----\n" \
+               f"strata                : {self.num_strata} over {len(self.sites)} fault sites, " \
+               f"{len(self.start_edges) - 1} fault start bins\n" \
+               f"trials per stratum    : {trials.min()} to {trials.max()}\n" \
+               f"largest trial weight  : {sample.weights.max() * len(sample):.2f} (1.00 = uniform)"
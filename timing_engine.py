@@ -0,0 +1,214 @@
+"""
+Levelized static timing analysis over a compiled netlist.
+
+Each fanin edge (wire -> gate pin) gets an early (min) and late (max) delay:
+the INTERCONNECT delay into the pin plus the IOPATH delay from the pin to the
+gate output. All rise/fall values and all COND arcs of the pin are considered,
+so the late delay is the worst case and the early delay the best case. By
+default the early delay is taken from the min and the late delay from the max
+value of the SDF triples, so the bounds hold at every corner (the simulators
+run at typ). Gates without SDF data get the default unit delay.
+
+Two passes over the levels, each touching every edge once, give:
+  - arrival_min/arrival_max: earliest/latest arrival at each wire from the primary inputs
+  - to_output_min/to_output_max: shortest/longest delay from each wire to any primary output
+  - output_distance: most gates between each wire and a primary output
+Required times and slack come from TimingInfo (clock period, setup and hold).
+"""
+import argparse
+import numpy as np
+from typing import Optional
+
+from nathan_parser import Netlist, parse_netlist
+from nathan_types import TimingInfo
+from compiled_netlist import CompiledNetlist, compile_netlist, WIRE_OUTPUT
+from sdf_parser import SdfData, load_sdf, select_delay
+import profiling
+
+class TimingAnalysis:
+    """Arrival, required and slack times for every wire of a netlist, in picoseconds."""
+    def __init__(self, netlist: Netlist, sdf: Optional[SdfData] = None, timing_info: Optional[TimingInfo] = None,
+                 early_corner: str = "min", late_corner: str = "max", default_delay_ps: float = 1):
+        self.netlist = netlist
+        self.compiled: CompiledNetlist = compile_netlist(netlist)
+        self.sdf = sdf
+        self.timing_info = timing_info
+        self.early_corner = early_corner
+        self.late_corner = late_corner
+        self.default_delay_ps = default_delay_ps
+
+        compiled = self.compiled
+        with profiling.stage("timing_analysis"):
+            self.edge_gate = np.repeat(np.arange(compiled.num_gates, dtype=np.int64), np.diff(compiled.fanin_ptr))
+            self.edge_min, self.edge_max = self._edge_delays()
+            self._forward()
+            self._backward()
+
+    def _edge_delays(self):
+        compiled = self.compiled
+        num_edges = len(compiled.fanin_wires)
+        edge_min = np.full(num_edges, self.default_delay_ps, dtype=np.float64)
+        edge_max = np.full(num_edges, self.default_delay_ps, dtype=np.float64)
+        if self.sdf is None:
+            return edge_min, edge_max
+
+        for gate_idx in range(compiled.num_gates):
+            gate_name = compiled.gate_names[gate_idx]
+            arcs = self.sdf.get_arcs(gate_name)
+            model = compiled.cell_models[compiled.gate_type[gate_idx]]
+            # fanin is in cell pin order, or in the gate's own input order for cells without a model (see CompiledNetlist)
+            pins = model.pins if model is not None else self.netlist.gates[gate_name].input_pins
+            lo, hi = compiled.fanin_ptr[gate_idx], compiled.fanin_ptr[gate_idx + 1]
+            for pin_idx, edge in enumerate(range(lo, hi)):
+                pin = pins[pin_idx]
+                pin_arcs = [arc for arc in arcs if arc.in_pin == pin]
+                early = [select_delay(d, self.early_corner) for arc in pin_arcs for d in (arc.rise, arc.fall) if d is not None]
+                late = [select_delay(d, self.late_corner) for arc in pin_arcs for d in (arc.rise, arc.fall) if d is not None]
+                # interconnect into the pin
+                wire_idx = compiled.fanin_wires[edge]
+                driver = compiled.wire_driver[wire_idx]
+                src = f"{compiled.gate_names[driver]}/Q" if driver >= 0 else compiled.verilog_name(wire_idx)
+                ic_rise, ic_fall = self.sdf.get_interconnect(src, f"{gate_name}/{pin}")
+                ic_early = [select_delay(d, self.early_corner) for d in (ic_rise, ic_fall) if d is not None]
+                ic_late = [select_delay(d, self.late_corner) for d in (ic_rise, ic_fall) if d is not None]
+                edge_min[edge] = (min(early) if early else self.default_delay_ps) + (min(ic_early) if ic_early else 0)
+                edge_max[edge] = (max(late) if late else self.default_delay_ps) + (max(ic_late) if ic_late else 0)
+        return edge_min, edge_max
+
+    def _level_edges(self, level: int) -> slice:
+        compiled = self.compiled
+        first_gate, last_gate = compiled.level_ptr[level], compiled.level_ptr[level + 1]
+        return slice(compiled.fanin_ptr[first_gate], compiled.fanin_ptr[last_gate])
+
+    def _forward(self) -> None:
+        """Arrival times from the primary inputs (and undriven wires), all launched at t = 0."""
+        compiled = self.compiled
+        driven = compiled.wire_driver >= 0
+        self.arrival_max = np.where(driven, -np.inf, 0.0)
+        self.arrival_min = np.where(driven, np.inf, 0.0)
+        edge_out = compiled.gate_output[self.edge_gate]
+        for level in range(compiled.num_levels):
+            edges = self._level_edges(level)
+            sources = compiled.fanin_wires[edges]
+            sinks = edge_out[edges]
+            keep = sinks >= 0
+            np.maximum.at(self.arrival_max, sinks[keep], (self.arrival_max[sources] + self.edge_max[edges])[keep])
+            np.minimum.at(self.arrival_min, sinks[keep], (self.arrival_min[sources] + self.edge_min[edges])[keep])
+
+    def _backward(self) -> None:
+        """Path delays from every wire to the primary outputs; -inf/inf where no output is reachable."""
+        compiled = self.compiled
+        is_output = (compiled.wire_flags & WIRE_OUTPUT) != 0
+        self.to_output_max = np.where(is_output, 0.0, -np.inf)
+        self.to_output_min = np.where(is_output, 0.0, np.inf)
+        self.output_distance = np.where(is_output, 0, -1).astype(np.int64)
+        edge_out = compiled.gate_output[self.edge_gate]
+        for level in reversed(range(compiled.num_levels)):
+            edges = self._level_edges(level)
+            sources = compiled.fanin_wires[edges]
+            sinks = edge_out[edges]
+            keep = sinks >= 0
+            sources, sinks = sources[keep], sinks[keep]
+            reachable = self.output_distance[sinks] >= 0
+            np.maximum.at(self.to_output_max, sources, self.to_output_max[sinks] + self.edge_max[edges][keep])
+            np.minimum.at(self.to_output_min, sources, self.to_output_min[sinks] + self.edge_min[edges][keep])
+            np.maximum.at(self.output_distance, sources[reachable], self.output_distance[sinks[reachable]] + 1)
+
+    ##################################################
+    #                 REQUIRED / SLACK               #
+    ##################################################
+
+    def _capture_time(self) -> float:
+        """Latest allowed output arrival: the setup point, or the critical path delay without a clock."""
+        if self.timing_info is not None:
+            return float(self.timing_info.clock_period_ps - self.timing_info.setup_time_ps)
+        return self.critical_path_delay()
+
+    @property
+    def required_max(self) -> np.ndarray:
+        """Latest arrival at each wire that still meets setup at every output it reaches."""
+        return self._capture_time() - self.to_output_max
+
+    @property
+    def slack(self) -> np.ndarray:
+        """Setup slack of each wire (inf where no output is reachable)."""
+        with np.errstate(invalid="ignore"):
+            slack = self.required_max - self.arrival_max
+        return np.where(np.isfinite(self.to_output_max), slack, np.inf)
+
+    @property
+    def hold_slack(self) -> np.ndarray:
+        """Hold slack of each wire against the capturing edge at t = 0 (inf where no output is reachable)."""
+        hold = float(self.timing_info.hold_time_ps) if self.timing_info is not None else 0.0
+        slack = self.arrival_min + self.to_output_min - hold
+        return np.where(np.isfinite(self.to_output_min), slack, np.inf)
+
+    def critical_path_delay(self) -> float:
+        outputs = self.compiled.output_wires
+        return float(self.arrival_max[outputs].max()) if len(outputs) else 0.0
+
+    ##################################################
+    #                     QUERIES                    #
+    ##################################################
+
+    def latest_output_arrival(self, wire_name: str, launch_time: float = 0) -> float:
+        """Latest time a transition on wire_name at launch_time can reach any primary output (-inf if none)."""
+        return launch_time + self.to_output_max[self.compiled.wire_index[wire_name]]
+
+    def earliest_output_arrival(self, wire_name: str, launch_time: float = 0) -> float:
+        """Earliest time a transition on wire_name at launch_time can reach any primary output (inf if none)."""
+        return launch_time + self.to_output_min[self.compiled.wire_index[wire_name]]
+
+    def annotate(self) -> None:
+        """Fill in output_delay/output_distance on the GraphWire/GraphGate objects (0 where no output is reachable)."""
+        compiled = self.compiled
+        for wire_idx, name in enumerate(compiled.wire_names):
+            wire = self.netlist.wires[name]
+            reachable = self.output_distance[wire_idx] >= 0
+            wire.output_distance = int(self.output_distance[wire_idx]) if reachable else 0
+            wire.output_delay = int(round(self.to_output_max[wire_idx])) if reachable else 0
+        for gate_idx, name in enumerate(compiled.gate_names):
+            gate = self.netlist.gates[name]
+            out = compiled.gate_output[gate_idx]
+            lo, hi = compiled.fanin_ptr[gate_idx], compiled.fanin_ptr[gate_idx + 1]
+            if out < 0 or self.output_distance[out] < 0 or lo == hi:
+                gate.output_distance = 0
+                gate.output_delay = 0
+                continue
+            gate.output_distance = int(self.output_distance[out])
+            # delay from the gate's inputs, through the gate, to the furthest output
+            gate.output_delay = int(round(self.to_output_max[out] + self.edge_max[lo:hi].max()))
+
+    def report(self, num_paths: int = 10) -> str:
+        compiled = self.compiled
+        lines = [f"critical path delay : {self.critical_path_delay():.1f} ps"]
+        slack = self.slack
+        order = np.argsort(slack)[:num_paths]
+        lines.append(f"{'wire':<24} {'arrival':>10} {'to output':>10} {'slack':>10}")
+        for wire_idx in order:
+            if not np.isfinite(slack[wire_idx]):
+                break
+            lines.append(f"{compiled.wire_names[wire_idx]:<24} {self.arrival_max[wire_idx]:>10.1f} "
+                         f"{self.to_output_max[wire_idx]:>10.1f} {slack[wire_idx]:>10.1f}")
+        return "\n".join(lines)
+
+def analyze_timing(netlist: Netlist, sdf_filename: Optional[str] = None, timing_info: Optional[TimingInfo] = None, **kwargs) -> TimingAnalysis:
+    sdf = load_sdf(sdf_filename) if sdf_filename else None
+    return TimingAnalysis(netlist, sdf, timing_info, **kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Static timing analysis of a netlist")
+    parser.add_argument('input_file', metavar='FILE', help='Specify the input netlist')
+    parser.add_argument('-s', '--sdf', metavar='FILE', required=False, help='Specify module timing information in Standard Data Format (SDF)')
+    parser.add_argument('-p', '--period', metavar='PERIOD', required=False, type=float, help='Specify the clock period in nanoseconds (ns)')
+    parser.add_argument('-st', '--setup_time', metavar='TIME', required=False, type=float, default=0, help='Specify the register setup time in nanoseconds (ns)')
+    parser.add_argument('-ht', '--hold_time', metavar='TIME', required=False, type=float, default=0, help='Specify the register hold time in nanoseconds (ns)')
+    args = parser.parse_args()
+
+    timing_info = TimingInfo(args.period, args.setup_time, args.hold_time) if args.period else None
+    for module_name, netlist in parse_netlist(args.input_file):
+        print(f"{module_name}:")
+        print(analyze_timing(netlist, args.sdf, timing_info).report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Analytical timing pre-classification of sampled faults.
+
+A pulse injected on wire w at fault_start for fault_width can only change the
+outputs between fault_start + (shortest path delay from w to an output) and
+fault_start + fault_width + (longest path delay). The path delays come from the
+static timing engine. If the window starts after the testbench stops watching
+(next edge + T_HD), the pulse has no width, or w reaches no output at all, the
+outputs never diverge while they are watched: the outcome is logic-masked, and
+the fault is tallied without simulation.
+
+If the whole window lies between the end of the hold window of the injection
+edge and the start of the setup window of the next edge, the fault can never be
+captured (UNCAPTURED), but whether the outputs diverge at all, i.e. timing- or
+logic-masked, depends on the inputs of the trial. Those faults are simulated
+like the ambiguous ones, so -ps never changes the counters, only the number of
+simulated trials.
+"""
+import numpy as np
+from typing import Optional
+
+from nathan_parser import Netlist
+from nathan_types import TimingInfo, FaultCounts
+from compiled_netlist import compile_netlist
+from fault_sampling import FaultList
+from timing_engine import TimingAnalysis
+from sdf_parser import SdfData
+
+# classification codes
+AMBIGUOUS = 0
+UNCAPTURED = 1    # timing- or logic-masked, decided by simulation
+LOGIC_MASKED = 2  # decided without simulation
+
+class TimingPrescreen:
+    """Classifies sampled faults against the setup/hold windows using per-wire path delay bounds."""
+    def __init__(self, netlist: Netlist, timing_info: TimingInfo, sdf: Optional[SdfData] = None, analysis: Optional[TimingAnalysis] = None):
+        self.netlist = netlist
+        self.timing_info = timing_info
+        self.compiled = compile_netlist(netlist)
+        self.analysis = analysis if analysis is not None else TimingAnalysis(netlist, sdf, timing_info)
+
+        sites = self.compiled.fault_sites
+        # the simulator rounds every arc and interconnect delay to 1ps, allow that much per gate on the path
+        margin = np.maximum(self.analysis.output_distance[sites], 0) + 1
+        self.reachable = np.isfinite(self.analysis.to_output_max[sites])
+        self.delay_min = np.where(self.reachable, np.floor(self.analysis.to_output_min[sites]) - margin, 0)
+        self.delay_max = np.where(self.reachable, np.ceil(self.analysis.to_output_max[sites]) + margin, 0)
+
+    def classify(self, faults: FaultList) -> np.ndarray:
+        """AMBIGUOUS, UNCAPTURED or LOGIC_MASKED for every fault (times relative to the injection edge)."""
+        period = int(self.timing_info.clock_period_ps)
+        t_su = int(self.timing_info.setup_time_ps)
+        t_hd = int(self.timing_info.hold_time_ps)
+
+        first_change = faults.starts + self.delay_min[faults.sites]
+        last_change = faults.starts + faults.widths + self.delay_max[faults.sites]
+
+        codes = np.full(len(faults), AMBIGUOUS, dtype=np.int8)
+        # settles after the hold window and before the setup window opens
+        codes[(first_change > t_hd) & (last_change <= period - t_su)] = UNCAPTURED
+        # nothing can happen while the outputs are being watched
+        unseen = ~self.reachable[faults.sites] | (faults.widths <= 0) | (first_change > period + t_hd)
+        codes[unseen] = LOGIC_MASKED
+        return codes
+
+def screened_counts(codes: np.ndarray) -> FaultCounts:
+    """Counters for the faults the screen decided (only LOGIC_MASKED ones, the rest are simulated)."""
+    masked_logic = int(np.count_nonzero(codes == LOGIC_MASKED))
+    return FaultCounts(masked_logic=masked_logic, num_faults=masked_logic)
+
+def prescreen_report(codes: np.ndarray) -> str:
+    total = len(codes)
+    screened = int(np.count_nonzero(codes == LOGIC_MASKED))
+    fraction = screened / total if total else 0.0
+    return f"\n-----  timing pre‑screen ({total} faults) -----\n" \
+           f"resolved as logic‑masked  : {screened}\n" \
+           f"never captured (simulated): {int(np.count_nonzero(codes == UNCAPTURED))}\n" \
+           f"simulations avoided       : {screened} ({100 * fraction:.1f}%)"
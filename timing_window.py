@@ -0,0 +1,163 @@
+"""
+Vectorized Monte Carlo bounds on the outcome rates from the latching windows
+(nathan.py --timing_window).
+
+A pulse on wire w at fault_start for fault_width can only disturb the outputs
+within the span [first, last] = [fault_start + shortest path delay, fault_start
++ fault_width + longest path delay], with the per-wire path delays of the static
+timing engine (the SDF) widened by the rounding margin of timing_prescreen. How
+the outputs differ within the span depends on the paths and inputs the trial
+takes, so each trial is given every outcome that some disturbance inside its
+span leads to, judged the way the testbench judges it (event_sim.classify_fault)
+relative to the injection edge at 0 and the capturing edge at the period P:
+
+  setup/hold violation  it differs during the hold window [1, T_HD] of the
+                        injection edge, or changes in [P - T_SU, P + T_HD]
+  observed (latched)    it diverges without a violation and still differs at
+                        P - T_SU or later, i.e. it spans the capture window
+  timing-masked         it diverges without a violation and settles before
+                        P - T_SU
+  logic-masked          it does not diverge while the testbench watches, up to
+                        P + T_HD
+
+A pulse with zero width, on a wire with no path to an output, or whose span lies
+outside [1, P + T_HD] can only be logic-masked. Over all trials, the fraction
+that can only take an outcome and the fraction that can take it bound its rate
+from below and above, as long as every reachable pulse propagates. Logic
+masking by the other inputs is not modeled (run -lm for that side): it turns
+trials of the other outcomes into logic-masked ones, so a campaign gives at most
+the upper bounds of the timing-masked, violation and observed rates and at least
+the lower bound of the logic-masked rate.
+
+Trials are drawn like the testbench draws them (fault_sampling.sample_faults),
+CHUNK_SAMPLES at a time, so millions of them take seconds and bounded memory.
+"""
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from nathan_parser import Netlist
+from nathan_types import TimingInfo, COUNTER_LABELS
+from compiled_netlist import compile_netlist
+from fault_sampling import sample_faults
+from fault_log import OUTCOME_BITS
+from timing_engine import TimingAnalysis
+from sdf_parser import SdfData
+
+# trials classified at once
+CHUNK_SAMPLES = 1 << 20
+
+# outcome columns of the per-wire counts, in counter order
+MASKED_TIMING, META_HIT, MASKED_LOGIC, OBSERVED = range(4)
+
+class WindowEstimate:
+    """Per fault site: trials, and how many of them can take or can only take each outcome."""
+    def __init__(self, site_names: List[str], site_trials: np.ndarray, possible: np.ndarray, certain: np.ndarray,
+                 elapsed_s: float):
+        self.site_names = site_names    # Verilog name of every fault site
+        self.site_trials = site_trials  # (fault sites,)
+        self.possible = possible        # (fault sites, 4) in OUTCOME_BITS order, trials that can take the outcome
+        self.certain = certain          # (fault sites, 4), trials that can only take the outcome
+        self.elapsed_s = elapsed_s
+
+    @property
+    def num_faults(self) -> int:
+        return int(self.site_trials.sum())
+
+    def bounds(self) -> Dict[str, Tuple[float, float]]:
+        """Lower and upper bound of the fraction of trials behind each counter."""
+        trials = max(self.num_faults, 1)
+        return {name: (float(self.certain[:, column].sum() / trials), float(self.possible[:, column].sum() / trials))
+                for (column, (name, _)) in enumerate(OUTCOME_BITS)}
+
+    @property
+    def rates(self) -> Dict[str, float]:
+        """The bound a campaign keeps to: upper for timing-masked, violations and observed, lower for logic-masked."""
+        return {name: lower if name == "masked_logic" else upper for (name, (lower, upper)) in self.bounds().items()}
+
+    def site_upper_rates(self) -> np.ndarray:
+        """Per fault site: the fraction of its trials that can take each outcome (nan for sites without trials)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.possible / self.site_trials[:, None]
+
+    def report(self, num_wires: int = 10) -> str:
+        rates = self.site_upper_rates()
+        # most vulnerable wires first: can be captured or go metastable
+        vulnerable = np.nan_to_num(np.maximum(rates[:, META_HIT], rates[:, OBSERVED]), nan=-1.0)
+        per_second = self.num_faults / self.elapsed_s if self.elapsed_s > 0 else float("inf")
+        lines = [f"\n-----  timing-window model ({self.num_faults} trials, {self.elapsed_s:.2f} s, {per_second:.3g} trials/sec) -----",
+                 f"{'most vulnerable wires':<24} {'trials':>8} {'timing':>8} {'meta':>8} {'logic':>8} {'observed':>8}  (at most)"]
+        for pos in np.argsort(-vulnerable, kind="stable")[:num_wires].tolist():
+            row = " ".join(f"{rates[pos, column]:>8.3f}" for column in range(len(OUTCOME_BITS)))
+            lines.append(f"{self.site_names[pos]:<24} {int(self.site_trials[pos]):>8} {row}")
+        lines.append(f"\n-----  timing-window model rates, if every pulse propagates ({self.num_faults} trials) -----")
+        bounds = self.bounds()
+        for (name, label) in COUNTER_LABELS:
+            lower, upper = bounds[name]
+            lines.append(f"{label}: {100 * lower:6.2f}% to {100 * upper:6.2f}%")
+        lines.append("Logic masking by the other inputs is not modeled: a campaign gives at most the upper bounds of 1), 2)"
+                     " and 4), and at least the lower bound of 3).")
+        return "\n".join(lines)
+
+class TimingWindowModel:
+    """Bounds the outcomes of (site, start, width) trials against the setup/hold windows from per-wire path delays."""
+    def __init__(self, netlist: Netlist, timing_info: TimingInfo, sdf: Optional[SdfData] = None, analysis: Optional[TimingAnalysis] = None):
+        self.netlist = netlist
+        self.timing_info = timing_info
+        self.compiled = compile_netlist(netlist)
+        self.analysis = analysis if analysis is not None else TimingAnalysis(netlist, sdf, timing_info)
+
+        sites = self.compiled.fault_sites
+        # the simulator rounds every arc and interconnect delay to 1ps, allow that much per gate on the path
+        margin = np.maximum(self.analysis.output_distance[sites], 0) + 1
+        self.reachable = np.isfinite(self.analysis.to_output_max[sites])
+        self.delay_min = np.where(self.reachable, np.floor(self.analysis.to_output_min[sites]) - margin, 0)
+        self.delay_max = np.where(self.reachable, np.ceil(self.analysis.to_output_max[sites]) + margin, 0)
+
+    def classify(self, sites: np.ndarray, starts: np.ndarray, widths: np.ndarray) -> np.ndarray:
+        """
+        (trials, 4) booleans in OUTCOME_BITS order: the outcomes a disturbance of the outputs
+        within [start + shortest delay, start + width + longest delay] can lead to.
+        """
+        period = int(self.timing_info.clock_period_ps)
+        t_su = int(self.timing_info.setup_time_ps)
+        t_hd = int(self.timing_info.hold_time_ps)
+        first = starts + self.delay_min[sites]
+        last = starts + widths + self.delay_max[sites]
+
+        setup_open, hold_close = period - t_su, period + t_hd
+        # differs in the hold window of the injection edge, or changes in the setup/hold window of the next one
+        meta = ((first <= t_hd) & (last >= 1)) | ((first <= hold_close) & (last >= setup_open))
+        # differs only between the two windows
+        timing = (first < setup_open) & (last > t_hd) & (t_hd + 1 < setup_open)
+        # differs, without changing, from before setup_open (or from the edge itself) to the end of the hold window
+        observed = ((np.maximum(first, t_hd + 1) <= setup_open) & (last >= period - 1)) \
+            | ((np.maximum(first, t_hd + 1) <= period) & (last >= hold_close))
+        # differs only outside [1, hold_close]
+        logic = (first < 1) | (last > hold_close)
+
+        dead = ~self.reachable[sites] | (widths <= 0) | (first > hold_close) | (last < 1)
+        outcomes = np.stack([timing, meta, logic, observed], axis=1)
+        outcomes[dead] = False
+        outcomes[dead, MASKED_LOGIC] = True
+        return outcomes
+
+    def run(self, num_samples: int, rng: Optional[np.random.Generator] = None) -> WindowEstimate:
+        """Draw and bound num_samples trials, CHUNK_SAMPLES at a time."""
+        rng = rng if rng is not None else np.random.default_rng()
+        num_sites = len(self.compiled.fault_sites)
+        columns = len(OUTCOME_BITS)
+        site_trials = np.zeros(num_sites, dtype=np.int64)
+        possible = np.zeros(num_sites * columns, dtype=np.int64)
+        certain = np.zeros(num_sites * columns, dtype=np.int64)
+        start = time.perf_counter()
+        for offset in range(0, num_samples, CHUNK_SAMPLES):
+            faults = sample_faults(min(CHUNK_SAMPLES, num_samples - offset), num_sites, self.timing_info, rng)
+            outcomes = self.classify(faults.sites, faults.starts, faults.widths)
+            cells = faults.sites[:, None] * columns + np.arange(columns)
+            site_trials += np.bincount(faults.sites, minlength=num_sites)
+            possible += np.bincount(cells[outcomes], minlength=num_sites * columns)
+            certain += np.bincount(cells[outcomes & (outcomes.sum(axis=1) == 1)[:, None]], minlength=num_sites * columns)
+        site_names = [self.compiled.verilog_name(site) for site in self.compiled.fault_sites]
+        return WindowEstimate(site_names, site_trials, possible.reshape(num_sites, columns), certain.reshape(num_sites, columns),
+                              time.perf_counter() - start)